@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+"""قياس تكلفة معالجة النص العربي لكل خلية في تقرير PDF قبل وبعد ذاكرة المعالجة.
+
+    python benchmarks/bench_arabic.py [عدد الخلايا]
+"""
+import os
+import sys
+import time
+import random
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import payroll_pdf
+
+
+def legacy_transliterate(text):
+    # نسخة التحويل القديمة كما كانت (القواميس تُبنى مع كل استدعاء + replace و +=)
+    common_names = dict(payroll_pdf.COMMON_NAMES)
+    if text in common_names:
+        return common_names[text]
+    for arabic, english in common_names.items():
+        if arabic in text:
+            text = text.replace(arabic, english)
+    arabic_to_latin = {chr(k): v for k, v in payroll_pdf._ARABIC_TO_LATIN.items()}
+    transliterated = ''
+    for char in text:
+        if char in arabic_to_latin:
+            transliterated += arabic_to_latin[char]
+        else:
+            transliterated += char
+    return transliterated
+
+
+def legacy_process(text):
+    if not isinstance(text, str):
+        text = str(text)
+    has_arabic = any('\u0600' <= char <= '\u06FF' for char in text)
+    if has_arabic and payroll_pdf.HAS_ARABIC_SUPPORT:
+        return payroll_pdf.get_display(payroll_pdf.arabic_reshaper.reshape(text))
+    elif has_arabic:
+        return legacy_transliterate(text)
+    return text
+
+
+def make_cells(count, seed=1):
+    """خلايا تشبه التقرير: أسماء تتكرر كثيرًا + أرقام"""
+    rnd = random.Random(seed)
+    first = ["أحمد", "محمد", "خالد", "محمود", "سارة", "يوسف", "عمر", "مصطفى", "حسن", "علي"]
+    last = ["إبراهيم", "عبد الله", "السيد", "حسين", "فتحي", "رمضان", "شعبان", "عادل"]
+    names = [f"{f} {l}" for f in first for l in last]
+    cells = []
+    for _ in range(count // 4):
+        salary = rnd.choice([4800, 5000, 5400, 5900, 6100, 7000])
+        transport = rnd.choice([0, 50, 100, 150])
+        cells += [rnd.choice(names), str(salary), str(transport), str(salary + transport)]
+    return cells
+
+
+def timed(fn, cells):
+    started = time.perf_counter()
+    for cell in cells:
+        fn(cell)
+    return (time.perf_counter() - started) / len(cells) * 1e6
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    cells = make_cells(count)
+    print(f"خلايا: {len(cells)}  مكتبات العربية: {payroll_pdf.HAS_ARABIC_SUPPORT}")
+    before = timed(legacy_process, cells)
+    uncached = timed(payroll_pdf._shape_text.__wrapped__, cells)
+    payroll_pdf.clear_shaping_cache()
+    cached = timed(payroll_pdf.process_arabic_text, cells)
+    print(f"قبل (التنفيذ القديم):       {before:8.2f} µs/خلية")
+    print(f"بعد بدون ذاكرة:             {uncached:8.2f} µs/خلية")
+    print(f"بعد مع ذاكرة LRU:           {cached:8.2f} µs/خلية")
+    print(f"ذاكرة المعالجة: {payroll_pdf.shaping_cache_stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+"""مرتب يوم الأوردر من سجل رواتب طويل: bisect في الذاكرة (core.SalaryHistory) مقابل استعلام لكل سطر
+على فهرس salary_history (النتيجتان متطابقتان).
+
+    python benchmarks/bench_history.py [--pairs 6000] [--changes 120] [--lookups 200000]
+"""
+import os
+import sys
+import time
+import random
+import sqlite3
+import argparse
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import payroll_core as core
+
+AREAS = 30
+LOOKUP_SQL = ("SELECT salary FROM salary_history WHERE area_id=? AND employee_id=? AND effective_from<=? "
+              "ORDER BY effective_from DESC LIMIT 1")
+
+
+def make_history(pairs, changes, seed=1):
+    """صفوف (منطقة, موظف, من تاريخ, مرتب) بترتيب core.salary_history: تعديل كل ~10 أيام لكل زوج"""
+    rnd = random.Random(seed)
+    start = date(2015, 1, 1)
+    rows = []
+    for n in range(pairs):
+        area_id, employee_id = n % AREAS + 1, n // AREAS + 1
+        day = start
+        for _ in range(changes):
+            rows.append((area_id, employee_id, day.isoformat(), rnd.randrange(300000, 900000)))
+            day += timedelta(days=rnd.randrange(1, 20))
+    rows.sort()
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="قياس البحث عن المرتب الساري في تاريخ")
+    parser.add_argument("--pairs", type=int, default=6000, help="عدد أزواج (موظف، منطقة)")
+    parser.add_argument("--changes", type=int, default=120, help="عدد التعديلات لكل زوج")
+    parser.add_argument("--lookups", type=int, default=200000, help="عدد سطور الأوردرات")
+    args = parser.parse_args(argv)
+    rows = make_history(args.pairs, args.changes)
+    rnd = random.Random(2)
+    lookups = []
+    for _ in range(args.lookups):
+        n = rnd.randrange(args.pairs)
+        day = date(2014, 6, 1) + timedelta(days=rnd.randrange(args.changes * 12))
+        lookups.append((n // AREAS + 1, n % AREAS + 1, day.isoformat() + "T10:30:00"))
+    print(f"{len(rows):,} سطر في السجل، {len(lookups):,} بحث")
+
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE salary_history(area_id INTEGER, employee_id INTEGER, effective_from TEXT, "
+                 "salary INTEGER, PRIMARY KEY(area_id, employee_id, effective_from)) WITHOUT ROWID")
+    conn.executemany("INSERT INTO salary_history VALUES(?,?,?,?)", rows)
+    started = time.perf_counter()
+    sql = []
+    for employee_id, area_id, day in lookups:
+        row = conn.execute(LOOKUP_SQL, (area_id, employee_id, day[:10])).fetchone()
+        sql.append(row[0] if row else None)
+    sql_ms = (time.perf_counter() - started) * 1000
+    print(f"SQL لكل سطر  {sql_ms:10.1f} ms")
+
+    started = time.perf_counter()
+    history = core.SalaryHistory(rows)
+    load_ms = (time.perf_counter() - started) * 1000
+    started = time.perf_counter()
+    memory = [history.salary_at(employee_id, area_id, day) for employee_id, area_id, day in lookups]
+    bisect_ms = (time.perf_counter() - started) * 1000
+    print(f"bisect       {bisect_ms:10.1f} ms  ({sql_ms / bisect_ms:.1f}x) + تحميل {load_ms:.1f} ms  "
+          f"النتائج متطابقة: {memory == sql}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+"""مقارنة جمع المبالغ كـ REAL بالجنيه (التخزين القديم) مع INTEGER بالقرش (التخزين الحالي):
+الدقة والسرعة في SUM داخل SQLite وفي الجمع داخل Python.
+
+    python benchmarks/bench_money.py [عدد الصفوف]
+"""
+import os
+import sys
+import time
+import random
+import sqlite3
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import payroll_core as core
+
+REPEAT = 5
+
+
+def make_amounts(count, seed=1):
+    """مبالغ بالقرش تشبه سطور الأوردرات (مرتب + انتقالات بكسور القرش)"""
+    rnd = random.Random(seed)
+    salaries = [480000, 500000, 540000, 590000, 610000, 700000, 540035, 499999]
+    return [rnd.choice(salaries) + rnd.randrange(0, 20000) for _ in range(count)]
+
+
+def build_db(amounts):
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE lines_real(total REAL NOT NULL)")
+    conn.execute("CREATE TABLE lines_int(total INTEGER NOT NULL)")
+    conn.executemany("INSERT INTO lines_real VALUES(?)", ((a / core.PIASTRES,) for a in amounts))
+    conn.executemany("INSERT INTO lines_int VALUES(?)", ((a,) for a in amounts))
+    conn.commit()
+    return conn
+
+
+def timed(fn):
+    best = None
+    for _ in range(REPEAT):
+        started = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best * 1000
+
+
+def py_float_sum(values):
+    # مثل الجمع القديم في update_preview: total += ...
+    total = 0
+    for v in values:
+        total += v
+    return total
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 2000000
+    amounts = make_amounts(count)
+    exact = sum(amounts)
+    conn = build_db(amounts)
+    print(f"صفوف: {count:,}  SQLite {sqlite3.sqlite_version}  الإجمالي الصحيح: {core.format_money(exact)}")
+
+    real_sum, real_ms = timed(lambda: conn.execute("SELECT SUM(total) FROM lines_real").fetchone()[0])
+    int_sum, int_ms = timed(lambda: conn.execute("SELECT SUM(total) FROM lines_int").fetchone()[0])
+    print(f"SQL SUM على REAL:     {real_ms:8.1f} ms  = {real_sum!r}  فرق {round(real_sum * core.PIASTRES) - exact:+d} قرش"
+          f"{'' if real_sum * core.PIASTRES == exact else '  (غير مطابق بالضبط)'}")
+    print(f"SQL SUM على INTEGER:  {int_ms:8.1f} ms  = {core.format_money(int_sum)}  "
+          f"{'مطابق' if int_sum == exact else 'غير مطابق'}")
+
+    floats = [a / core.PIASTRES for a in amounts]
+    py_float, py_float_ms = timed(lambda: py_float_sum(floats))
+    py_int, py_int_ms = timed(lambda: py_float_sum(amounts))
+    print(f"Python += على float:  {py_float_ms:8.1f} ms  = {py_float!r}")
+    print(f"Python += على int:    {py_int_ms:8.1f} ms  = {core.format_money(py_int)}")
+    print(f"زمن SUM على REAL / زمن SUM على INTEGER = {real_ms / int_ms:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+# -*- coding: utf-8 -*-
+"""قياس زمن الاستعلامات خلف كل شاشة (تحديث القوائم، اختيار الموظفين، عرض التقرير،
+حفظ أوردر، تصدير PDF) على قاعدة بيانات مولدة بـ synth.py، مع حفظ النتائج JSON
+ومقارنتها بنتائج إصدار سابق.
+
+    python benchmarks/bench_payroll.py --orders 50000 --json new.json --compare old.json
+
+بدون --db تُولد القاعدة في مجلد مؤقت؛ مع --db تُستخدم القاعدة إن وُجدت (حفظ الأوردر يضيف لها أوردرات).
+الخروج بالرمز 1 إذا كان أي قياس أبطأ من المقارنة بأكثر من --threshold.
+"""
+import os
+import sys
+import json
+import time
+import sqlite3
+import argparse
+import platform
+import statistics
+import subprocess
+import tempfile
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import payroll_db
+import payroll_core as core
+import payroll_pdf
+import payroll_system as gui
+import synth
+
+# الصفوف التي يحملها LazyTree أول مرة (page_size * 3)
+FIRST_ROWS = 300
+ORDER_LINES = 8
+
+
+def _first_page(source):
+    return source.count(), source.first(FIRST_ROWS)
+
+
+def _context():
+    """منطقة بأكبر عدد رواتب وأوردر بأكبر عدد سطور ليكون القياس على أسوأ حالة معتادة"""
+    area_id = payroll_db.query("SELECT area_id FROM employee_area_salary GROUP BY area_id "
+                               "ORDER BY COUNT(*) DESC LIMIT 1")[0][0]
+    order_id = payroll_db.query("SELECT order_id FROM order_employees GROUP BY order_id "
+                                "ORDER BY COUNT(*) DESC LIMIT 1")[0][0]
+    lines = [{'id': emp_id, 'salary': salary, 'transport': 1000}
+             for emp_id, _, salary in core.area_salaries(area_id)[:ORDER_LINES]]
+    return area_id, order_id, lines
+
+
+def _pick_employees(area_id):
+    index = gui.NameIndex(core.area_salaries(area_id))
+    return index.search("محم")
+
+
+def scenarios():
+    """(الاسم, الدالة) لكل عملية تقيسها الشاشات"""
+    area_id, order_id, lines = _context()
+    items = [
+        ("employees.refresh", lambda: _first_page(gui.employees_source())),
+        ("areas.refresh", lambda: _first_page(gui.areas_source())),
+        ("mapping.refresh", lambda: (core.list_employees(), core.list_areas(), _first_page(gui.mapping_source()))),
+        ("add_order.refresh", core.list_areas),
+        ("add_order.pick_employees", lambda: _pick_employees(area_id)),
+        ("add_order.save_order", lambda: core.create_order(area_id, "قياس", lines)),
+        ("reports.refresh", core.search_orders),
+        ("reports.search", lambda: core.search_orders("النصر", area_id)),
+        ("reports.show_report", lambda: (_first_page(gui.order_lines_source(order_id)), core.order_total(order_id))),
+        ("summary.refresh", lambda: core.payroll_summary("month", "employee")),
+    ]
+    if payroll_pdf.HAS_PDF:
+        items.append(("reports.export_pdf", lambda: payroll_pdf.render_order_pdf(order_id)))
+    return items
+
+
+def measure(fn, repeat):
+    fn()  # تسخين: ذاكرة SQLite والخطوط
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - started) * 1000)
+    return {"runs": repeat, "min_ms": round(min(times), 3), "median_ms": round(statistics.median(times), 3),
+            "max_ms": round(max(times), 3)}
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline, threshold):
+    """طباعة النسبة لكل قياس مقابل المقارنة. يرجع أسماء القياسات الأبطأ من الحد"""
+    slower = []
+    print(f"\n{'القياس':<28}{'السابق':>10}{'الحالي':>10}{'النسبة':>8}")
+    for name, result in results.items():
+        old = baseline.get("results", {}).get(name)
+        if old is None:
+            print(f"{name:<28}{'-':>10}{result['median_ms']:>10.2f}")
+            continue
+        ratio = result["median_ms"] / old["median_ms"] if old["median_ms"] else 1.0
+        mark = " ⚠️" if ratio > threshold else ""
+        print(f"{name:<28}{old['median_ms']:>10.2f}{result['median_ms']:>10.2f}{ratio:>7.2f}x{mark}")
+        if ratio > threshold:
+            slower.append(name)
+    return slower
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="قياس أداء شاشات المرتبات")
+    parser.add_argument("--db", help="قاعدة موجودة أو مسار لتوليدها")
+    parser.add_argument("--regenerate", action="store_true", help="إعادة توليد القاعدة حتى لو كانت موجودة")
+    synth.add_arguments(parser)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--json", help="حفظ النتائج في ملف JSON")
+    parser.add_argument("--compare", help="ملف JSON من إصدار سابق للمقارنة")
+    parser.add_argument("--threshold", type=float, default=1.25, help="أقصى نسبة بطء مسموحة")
+    args = parser.parse_args(argv)
+
+    json_path = args.json and os.path.abspath(args.json)
+    compare_path = args.compare and os.path.abspath(args.compare)
+    path = os.path.abspath(args.db or os.path.join(tempfile.mkdtemp(prefix="payroll-bench-"), "bench.db"))
+    if args.regenerate or not os.path.exists(path):
+        started = time.perf_counter()
+        synth.generate_from_args(path, args, progress=lambda done, total: print(f"\rتوليد {done:,} سطر...", end="", flush=True))
+        print(f"\nتم التوليد في {time.perf_counter() - started:.1f} ثانية")
+    else:
+        payroll_db.configure(path)
+        core.init_db()
+    # التقارير تُكتب بجوار القاعدة
+    os.chdir(os.path.dirname(path))
+    core.ensure_dirs()
+
+    counts = synth.table_counts()
+    print("  " + "  ".join(f"{table}={count:,}" for table, count in counts.items()))
+    results = {}
+    for name, fn in scenarios():
+        results[name] = measure(fn, args.repeat)
+        r = results[name]
+        print(f"{name:<28}{r['median_ms']:>10.2f} ms  (أقل {r['min_ms']:.2f} / أقصى {r['max_ms']:.2f})")
+
+    report = {
+        "meta": {
+            "commit": _git_commit(),
+            "time": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "schema_version": payroll_db.schema_version(payroll_db.get_conn()),
+            "db": path,
+            "counts": counts,
+            "repeat": args.repeat,
+        },
+        "results": results,
+    }
+    if json_path:
+        with open(json_path, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"النتائج في: {json_path}")
+    slower = []
+    if compare_path:
+        with open(compare_path, encoding="utf-8") as f:
+            slower = compare(results, json.load(f), args.threshold)
+    payroll_db.close_all()
+    return 1 if slower else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
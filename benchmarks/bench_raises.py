@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+"""حساب زيادة جماعية على مصفوفة رواتب كبيرة: numpy مقابل نفس الحساب بـ Python (النتيجتان متطابقتان).
+
+    python benchmarks/bench_raises.py [--rows 1000000] [--areas 200]
+"""
+import os
+import sys
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import payroll_raises as raises
+from payroll_raises import SalaryMatrix
+
+REPEAT = 3
+
+
+def make_matrix(count, areas, seed=1):
+    """صفوف (id, موظف, منطقة, مرتب, سطور) مرتبة بالمنطقة ثم الموظف مثل SalaryMatrix.load"""
+    rnd = random.Random(seed)
+    per_area = count // areas
+    rows = []
+    for area_id in range(1, areas + 1):
+        for employee_id in range(1, per_area + 1):
+            rows.append((len(rows) + 1, employee_id, area_id, rnd.randrange(300000, 900000), rnd.randrange(0, 40)))
+    return SalaryMatrix(rows)
+
+
+def best_of(fn):
+    best = None
+    for _ in range(REPEAT):
+        started = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best * 1000
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="قياس حساب الزيادات الجماعية")
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--areas", type=int, default=200)
+    args = parser.parse_args(argv)
+    matrix = make_matrix(args.rows, args.areas)
+    area_ids = list(range(1, args.areas + 1, 2))
+    print(f"{len(matrix):,} مرتب، زيادة 7.5% + 50 جنيه على {len(area_ids)} منطقة")
+    python, python_ms = best_of(lambda: raises._compute_python(matrix, 750, 5000, area_ids, None))
+    print(f"Python   {python_ms:10.1f} ms")
+    if not raises.HAS_NUMPY:
+        print("numpy غير مثبت")
+        return
+    vector, vector_ms = best_of(lambda: raises._compute_numpy(matrix, 750, 5000, area_ids, None))
+    same = vector.areas == python.areas and vector.changes == python.changes
+    print(f"numpy    {vector_ms:10.1f} ms  ({python_ms / vector_ms:.1f}x)  النتائج متطابقة: {same}")
+
+
+if __name__ == "__main__":
+    main()
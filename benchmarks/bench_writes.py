@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+"""مقارنة حفظ الأوردرات بـ commit لكل أوردر (الطريقة المباشرة) مع طابور الكتابة المجمعة
+من عدة خيوط في نفس الوقت (مثل عدة أجهزة حجز على الخادم). الاثنان synchronous=FULL.
+
+    python benchmarks/bench_writes.py [--orders 2000] [--threads 8] [--db bench.db]
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import payroll_db
+import payroll_core as core
+from payroll_writer import GroupCommitQueue
+import synth
+
+
+def _order_lines():
+    area_id = payroll_db.query("SELECT area_id FROM employee_area_salary GROUP BY area_id "
+                               "ORDER BY COUNT(*) DESC LIMIT 1")[0][0]
+    return area_id, [{'id': emp_id, 'salary': salary, 'transport': 500}
+                     for emp_id, _, salary in core.area_salaries(area_id)[:8]]
+
+
+def _in_threads(threads, count, fn):
+    """fn() count مرة موزعة على عدد threads من الخيوط. يرجع الزمن بالثواني"""
+    per_thread = [count // threads + (1 if i < count % threads else 0) for i in range(threads)]
+
+    def work(n):
+        for _ in range(n):
+            fn()
+        payroll_db.close_thread()
+
+    workers = [threading.Thread(target=work, args=(n,)) for n in per_thread]
+    started = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return time.perf_counter() - started
+
+
+def direct(count, threads, area_id, lines):
+    """كل خيط باتصاله ومعاملته لكل أوردر (تتنافس على قفل الكتابة)"""
+    def save():
+        payroll_db.get_conn().execute("PRAGMA synchronous=FULL")
+        core.create_order(area_id, "قياس", lines)
+    return _in_threads(threads, count, save), None
+
+
+def grouped(count, threads, area_id, lines):
+    writes = GroupCommitQueue()
+    seconds = _in_threads(threads, count, lambda: writes.call(core.create_order, area_id, "قياس", lines))
+    writes.stop()
+    return seconds, writes.stats()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="قياس حفظ الأوردرات: commit لكل أوردر مقابل الكتابة المجمعة")
+    parser.add_argument("--db", help="قاعدة موجودة (تُضاف لها أوردرات)")
+    parser.add_argument("--orders", type=int, default=2000)
+    parser.add_argument("--threads", type=int, default=8)
+    args = parser.parse_args(argv)
+    path = os.path.abspath(args.db or os.path.join(tempfile.mkdtemp(prefix="payroll-bench-"), "writes.db"))
+    if not os.path.exists(path):
+        synth.generate(path, employees=500, orders=2000)
+    payroll_db.configure(path)
+    core.init_db()
+    area_id, lines = _order_lines()
+    print(f"{args.orders:,} أوردر ({len(lines)} سطر لكل أوردر) من {args.threads} خيط - {path}")
+    for name, fn in (("commit لكل أوردر", direct), ("كتابة مجمعة", grouped)):
+        seconds, stats = fn(args.orders, args.threads, area_id, lines)
+        line = f"{name:<18}{seconds:8.2f} ثانية  {args.orders / seconds:10,.0f} أوردر/ثانية"
+        if stats:
+            line += (f"  commits {stats['commits']:,} (متوسط {stats['avg_batch']})  "
+                     f"إقرار p50 {stats['ack_ms_p50']:.1f} / p95 {stats['ack_ms_p95']:.1f} ms")
+        print(line)
+    payroll_db.close_all()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+"""توليد قاعدة بيانات تجريبية بأحجام حقيقية (موظفون ومناطق ورواتب وأوردرات بأسماء عربية)
+لقياس الأداء. نفس البذرة تعطي نفس البيانات.
+
+    python benchmarks/synth.py bench.db --employees 2000 --areas 30 --orders 50000 --lines 8
+"""
+import os
+import sys
+import time
+import random
+import argparse
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import payroll_db
+import payroll_core as core
+from payroll_db import transaction
+
+FIRST_NAMES = ["أحمد", "محمد", "محمود", "مصطفى", "خالد", "عمر", "يوسف", "حسن", "حسين", "علي",
+               "إبراهيم", "إسماعيل", "طارق", "كريم", "هاني", "سامح", "وليد", "ياسر", "شريف", "عادل",
+               "سارة", "مريم", "فاطمة", "نور", "هدى", "منى", "ريهام", "دينا", "آية", "إيمان"]
+FAMILY_NAMES = ["عبد الله", "السيد", "فتحي", "رمضان", "شعبان", "عبد الرحمن", "سليمان", "الشافعي",
+                "منصور", "النجار", "الحداد", "عطية", "جمعة", "زكي", "بدوي", "حجازي", "الجمال",
+                "عبد العزيز", "فرج", "سالم"]
+CITIES = ["الغردقة", "القاهرة", "الإسكندرية", "الجيزة", "المنصورة", "طنطا", "أسيوط", "سوهاج",
+          "الأقصر", "أسوان", "بورسعيد", "الإسماعيلية", "السويس", "دمياط", "الزقازيق", "بنها",
+          "الفيوم", "بني سويف", "المنيا", "قنا", "مرسى مطروح", "شرم الشيخ", "دهب", "العريش"]
+STREETS = ["شارع النصر", "شارع الجمهورية", "شارع التحرير", "شارع البحر", "شارع الجيش",
+           "شارع السلام", "طريق الكورنيش", "شارع المدارس", "شارع الشهداء", "ميدان المحطة"]
+
+# عدد سطور الأوردرات في كل معاملة
+CHUNK_LINES = 20000
+
+
+def employee_names(count, rnd):
+    """أسماء ثلاثية فريدة؛ بعد نفاد التوافيق يُضاف رقم"""
+    combos = [f"{a} {b} {c}" for a in FIRST_NAMES for b in FIRST_NAMES[:20] for c in FAMILY_NAMES]
+    rnd.shuffle(combos)
+    return [combos[i % len(combos)] + (f" {i // len(combos) + 1}" if i >= len(combos) else "")
+            for i in range(count)]
+
+
+def area_names(count):
+    return [CITIES[i % len(CITIES)] + (f" - حي {i // len(CITIES)}" if i >= len(CITIES) else "")
+            for i in range(count)]
+
+
+def _salary(rnd):
+    # من 4000 إلى 8000 جنيه بفروق 50 جنيه
+    return rnd.randrange(80, 161) * 50 * core.PIASTRES
+
+
+def _transport(rnd):
+    # نصف السطور بدون انتقالات والباقي حتى 50 جنيه بفروق ربع جنيه
+    return 0 if rnd.random() < 0.5 else rnd.randrange(1, 201) * 25
+
+
+def generate(path, employees=2000, areas=30, mappings=3, orders=50000, lines=8, days=365, seed=1, progress=None):
+    """إنشاء قاعدة جديدة في path وملؤها. mappings = عدد مناطق كل موظف،
+    lines = متوسط سطور الأوردر. progress(سطور مكتوبة, الإجمالي التقريبي) بعد كل دفعة.
+    يرجع عدد الصفوف في كل جدول"""
+    rnd = random.Random(seed)
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+    payroll_db.configure(path)
+    core.init_db()
+    with transaction() as c:
+        c.executemany("INSERT OR IGNORE INTO employees(name) VALUES(?)", [(n,) for n in employee_names(employees, rnd)])
+        c.executemany("INSERT OR IGNORE INTO areas(name) VALUES(?)", [(n,) for n in area_names(areas)])
+        emp_ids = [row[0] for row in c.execute("SELECT id FROM employees")]
+        area_ids = [row[0] for row in c.execute("SELECT id FROM areas")]
+        c.execute("DELETE FROM employee_area_salary")
+        c.execute("DELETE FROM salary_history")
+        salary_rows = []
+        for emp_id in emp_ids:
+            for area_id in rnd.sample(area_ids, min(mappings, len(area_ids))):
+                salary_rows.append((emp_id, area_id, _salary(rnd)))
+        c.executemany("INSERT INTO employee_area_salary(employee_id,area_id,salary) VALUES(?,?,?)", salary_rows)
+        payroll_db.backfill_salary_history(c)
+
+    by_area = {area_id: [] for area_id in area_ids}
+    for emp_id, area_id, salary in salary_rows:
+        by_area[area_id].append((emp_id, salary))
+    default = core.DEFAULT_SALARY
+    start = datetime.now().replace(microsecond=0) - timedelta(days=days)
+    step = days * 86400 / max(orders, 1)
+    with transaction() as c:
+        c.execute("SELECT COALESCE(MAX(id), 0) FROM orders")
+        next_id = c.fetchone()[0] + 1
+    written = 0
+    order_rows, line_rows = [], []
+    for n in range(orders):
+        order_id = next_id + n
+        area_id = rnd.choice(area_ids)
+        created_at = start + timedelta(seconds=int(n * step + rnd.random() * step))
+        address = f"{rnd.choice(STREETS)} رقم {rnd.randrange(1, 300)}"
+        order_rows.append((order_id, area_id, address, created_at.isoformat()))
+        staff = by_area[area_id] or [(emp_id, default) for emp_id in emp_ids]
+        count = min(len(staff), max(1, int(rnd.triangular(1, 2 * lines - 1, lines))))
+        for emp_id, salary in rnd.sample(staff, count):
+            transport = _transport(rnd)
+            line_rows.append((order_id, emp_id, salary, transport, core.line_total(salary, transport)))
+        if len(line_rows) >= CHUNK_LINES or n == orders - 1:
+            with transaction() as c:
+                c.executemany("INSERT INTO orders(id,area_id,address,created_at) VALUES(?,?,?,?)", order_rows)
+                c.executemany("INSERT INTO order_employees(order_id,employee_id,salary,transport,total) "
+                              "VALUES(?,?,?,?,?)", line_rows)
+            written += len(line_rows)
+            order_rows, line_rows = [], []
+            if progress:
+                progress(written, orders * lines)
+    return table_counts()
+
+
+def table_counts():
+    tables = ("employees", "areas", "employee_area_salary", "salary_history", "orders", "order_employees", "payroll_daily")
+    return {table: payroll_db.query(f"SELECT COUNT(*) FROM {table}")[0][0] for table in tables}
+
+
+def add_arguments(parser):
+    parser.add_argument("--employees", type=int, default=2000)
+    parser.add_argument("--areas", type=int, default=30)
+    parser.add_argument("--mappings", type=int, default=3, help="عدد مناطق كل موظف")
+    parser.add_argument("--orders", type=int, default=50000)
+    parser.add_argument("--lines", type=int, default=8, help="متوسط سطور الأوردر")
+    parser.add_argument("--days", type=int, default=365, help="الأوردرات موزعة على آخر N يوم")
+    parser.add_argument("--seed", type=int, default=1)
+
+
+def generate_from_args(path, args, progress=None):
+    return generate(path, args.employees, args.areas, args.mappings, args.orders, args.lines,
+                    args.days, args.seed, progress)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="توليد قاعدة بيانات تجريبية للقياس")
+    parser.add_argument("path")
+    add_arguments(parser)
+    args = parser.parse_args(argv)
+    started = time.perf_counter()
+    counts = generate_from_args(args.path, args,
+                                progress=lambda done, total: print(f"\r{done:,} سطر...", end="", flush=True))
+    print(f"\nتم في {time.perf_counter() - started:.1f} ثانية")
+    for table, count in counts.items():
+        print(f"  {table}: {count:,}")
+    payroll_db.close_all()
+
+
+if __name__ == "__main__":
+    main()
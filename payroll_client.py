@@ -0,0 +1,314 @@
+# -*- coding: utf-8 -*-
+"""وضع العميل: نفس دوال payroll_core التي تستخدمها الواجهة لكن عبر خادم payroll_server،
+فتعمل عدة أجهزة على قاعدة واحدة بدون أقفال SQLite على مجلد مشترك.
+الأخطاء ترجع بنفس أنواعها (sqlite3.IntegrityError للتكرار، ValueError للمدخلات)."""
+import os
+import json
+import sqlite3
+import threading
+import http.client
+from urllib.parse import urlsplit, urlencode
+
+import payroll_core as core
+import payroll_events as events
+from payroll_core import REPORTS_DIR
+
+TOKEN_ENV = "PAYROLL_TOKEN"
+TOKEN_HEADER = "x-payroll-token"
+DEFAULT_PORT = 8765
+TIMEOUT = 30
+# انتظار الأحداث على الخادم (أقل من TIMEOUT) والانتظار قبل إعادة المحاولة بعد انقطاع
+POLL_SECONDS = 25
+RETRY_SECONDS = 3
+
+
+class ServerError(Exception):
+    """خطأ داخل الخادم أو تعذر الاتصال به"""
+
+
+def _rows(rows):
+    return [tuple(row) for row in rows]
+
+
+def _iso(value):
+    return value.isoformat() if value else None
+
+
+class Client:
+    def __init__(self, url, token=None, timeout=TIMEOUT):
+        parts = urlsplit(url if "://" in url else "http://" + url)
+        self.url = f"http://{parts.hostname}:{parts.port or DEFAULT_PORT}"
+        self.host = parts.hostname
+        self.port = parts.port or DEFAULT_PORT
+        self.token = token
+        self.timeout = timeout
+        # اتصال keep-alive لكل خيط (خيط قاعدة البيانات، خيط التصدير، خيط الأحداث)
+        self._local = threading.local()
+
+    # ----------------------------- HTTP -----------------------------
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            self._local.conn = conn
+            self._local.used = False
+        return conn
+
+    def _drop(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    def request(self, method, path, params=None, body=None):
+        """يرجع (الرد, المحتوى) أو يرفع الخطأ المقابل لحالة الخادم"""
+        if params:
+            query = urlencode({k: v for k, v in params.items() if v is not None and v != ""})
+            if query:
+                path += "?" + query
+        headers = {"Content-Type": "application/json"}
+        if self.token:
+            headers[TOKEN_HEADER] = self.token.encode("utf-8")
+        data = json.dumps(body, ensure_ascii=False).encode("utf-8") if body is not None else None
+        while True:
+            conn = self._conn()
+            reused = self._local.used
+            try:
+                conn.request(method, path, data, headers)
+                response = conn.getresponse()
+                content = response.read()
+                break
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError) as e:
+                self._drop()
+                # اتصال keep-alive قديم أغلقه الخادم: محاولة واحدة باتصال جديد
+                if not reused:
+                    raise ServerError(f"تعذر الاتصال بالخادم {self.url}: {e}")
+            except (OSError, http.client.HTTPException) as e:
+                self._drop()
+                raise ServerError(f"تعذر الاتصال بالخادم {self.url}: {e}")
+        self._local.used = True
+        if response.getheader("Connection", "").lower() == "close":
+            self._drop()
+        if response.status >= 400:
+            try:
+                message = json.loads(content)["error"]
+            except (ValueError, KeyError):
+                message = content.decode("utf-8", "replace") or response.reason
+            if response.status == 409:
+                raise sqlite3.IntegrityError(message)
+            if response.status in (400, 404):
+                raise ValueError(message)
+            raise ServerError(message)
+        return response, content
+
+    def _json(self, method, path, params=None, body=None):
+        return json.loads(self.request(method, path, params, body)[1])
+
+    def _file(self, path, params, fname):
+        """تنزيل تقرير PDF إلى fname (أو بنفس اسمه على الخادم داخل REPORTS_DIR)"""
+        response, content = self.request("GET", path, params)
+        if fname is None:
+            disposition = response.getheader("Content-Disposition", "")
+            name = disposition.partition('filename="')[2].rstrip('"') or "report.pdf"
+            fname = f"{REPORTS_DIR}/{os.path.basename(name)}"
+        os.makedirs(os.path.dirname(fname) or ".", exist_ok=True)
+        with open(fname, "wb") as f:
+            f.write(content)
+        rows = response.getheader("X-Rows")
+        return fname, int(rows) if rows else None
+
+    def info(self):
+        return self._json("GET", "/info")
+
+    def stats(self):
+        """أرقام طابور الكتابة على الخادم (انظر GroupCommitQueue.stats)"""
+        return self._json("GET", "/stats")
+
+    # ----------------------------- Employees & areas -----------------------------
+    def list_employees(self):
+        return _rows(self._json("GET", "/employees"))
+
+    def add_employee(self, name):
+        return self._json("POST", "/employees", body={"name": name})["id"]
+
+    def rename_employee(self, employee_id, name):
+        self._json("PUT", f"/employees/{employee_id}", body={"name": name})
+
+    def delete_employee(self, employee_id):
+        self._json("DELETE", f"/employees/{employee_id}")
+
+    def list_areas(self):
+        return _rows(self._json("GET", "/areas"))
+
+    def add_area(self, name):
+        return self._json("POST", "/areas", body={"name": name})["id"]
+
+    def set_area_default_salary(self, area_id, salary):
+        self._json("PUT", f"/areas/{area_id}/default_salary", body={"salary": salary})
+
+    def area_default_salary(self, area_id):
+        return self._json("GET", f"/areas/{area_id}/default_salary")["salary"]
+
+    def delete_area(self, area_id):
+        self._json("DELETE", f"/areas/{area_id}")
+
+    # ----------------------------- Salary map -----------------------------
+    def set_salary(self, employee_id, area_id, salary, effective_from=None):
+        return self._json("POST", "/salaries", body={"employee_id": employee_id, "area_id": area_id,
+                                                     "salary": salary, "effective_from": _iso(effective_from)})["id"]
+
+    def delete_salary(self, mapping_id):
+        self._json("DELETE", f"/salaries/{mapping_id}")
+
+    def salary_history(self, area_id=None, employee_id=None):
+        return _rows(self._json("GET", "/salaries/history", {"area_id": area_id, "employee_id": employee_id}))
+
+    def area_salaries(self, area_id, day=None):
+        return _rows(self._json("GET", f"/areas/{area_id}/salaries", {"day": _iso(day)}))
+
+    # ----------------------------- Salary raises (payroll_raises) -----------------------------
+    def preview_raise(self, percent=0, amount=0, area_ids=None, employee_ids=None, date_from=None, date_to=None):
+        result = self._json("POST", "/raises/preview", body={
+            "percent": percent, "amount": amount, "area_ids": area_ids, "employee_ids": employee_ids,
+            "from": _iso(date_from), "to": _iso(date_to)})
+        return _rows(result["rows"]), tuple(result["totals"])
+
+    def apply_raise(self, percent=0, amount=0, area_ids=None, employee_ids=None, effective_from=None, note=""):
+        result = self._json("POST", "/raises", body={
+            "percent": percent, "amount": amount, "area_ids": area_ids, "employee_ids": employee_ids,
+            "effective_from": _iso(effective_from), "note": note})
+        return result["id"], result["rows"], result["applied"]
+
+    # ----------------------------- Orders & reports -----------------------------
+    def create_order(self, area_id, address, lines, created_at=None):
+        result = self._json("POST", "/orders", body={
+            "area_id": area_id, "address": address, "created_at": created_at,
+            "lines": [{'id': emp['id'], 'salary': emp['salary'], 'transport': emp['transport']} for emp in lines]})
+        return result["id"], result["total"]
+
+    def order_report(self, order_id):
+        try:
+            result = self._json("GET", f"/orders/{order_id}")
+        except ValueError:
+            return None
+        return tuple(result["header"]), tuple(result["totals"]), iter(_rows(result["lines"]))
+
+    def order_total(self, order_id):
+        return self._json("GET", f"/orders/{order_id}/total")["total"]
+
+    def search_orders(self, text="", area_id=None, date_from=None, date_to=None, limit=core.ORDER_SEARCH_LIMIT):
+        return _rows(self._json("GET", "/orders", {"text": text.strip(), "area_id": area_id, "from": _iso(date_from),
+                                                   "to": _iso(date_to), "limit": limit}))
+
+    def payroll_summary(self, period="month", group="employee", date_from=None, date_to=None, area_id=None,
+                        employee_id=None):
+        return _rows(self._json("GET", "/summary", {"period": period, "group": group, "from": _iso(date_from),
+                                                    "to": _iso(date_to), "area_id": area_id,
+                                                    "employee_id": employee_id}))
+
+    def source(self, name, *args):
+        return RemoteSource(self, name, args)
+
+    # ----------------------------- PDF (تُرسم على الخادم) -----------------------------
+    def render_order_pdf(self, order_id, font_name=None):
+        return self._file(f"/orders/{order_id}/pdf", None, None)[0]
+
+    def render_period_pdf(self, date_from=None, date_to=None, area_id=None, employee_id=None,
+                          fname=None, font_name=None, progress=None):
+        fname, rows = self._file("/statement", {"from": _iso(date_from), "to": _iso(date_to), "area_id": area_id,
+                                                "employee_id": employee_id}, fname)
+        if progress:
+            progress(rows)
+        return fname, rows
+
+    def select_order_ids(self, id_from=None, id_to=None, date_from=None, date_to=None):
+        return self._json("GET", "/orders/ids", {"from_id": id_from, "to_id": id_to, "from": _iso(date_from),
+                                                 "to": _iso(date_to)})
+
+    def export_orders(self, order_ids, workers=None, progress=None, cancelled=None):
+        """مثل payroll_pdf.export_orders لكن كل ملف يُرسم على الخادم ويُنزل"""
+        results = []
+        for order_id in order_ids:
+            if cancelled is not None and cancelled.is_set():
+                break
+            try:
+                results.append((order_id, self.render_order_pdf(order_id), None))
+            except (ValueError, ServerError, OSError) as e:
+                results.append((order_id, None, str(e)))
+            if progress:
+                progress(len(results), len(order_ids))
+        return results
+
+    # ----------------------------- Events -----------------------------
+    def poll_events(self, since, server=None, timeout=POLL_SECONDS):
+        """الأحداث بعد رقم since من تشغيل الخادم server (ينتظر حتى timeout إن لم يوجد جديد)"""
+        return self._json("GET", "/events", {"since": since, "server": server, "timeout": timeout})
+
+
+class RemoteSource:
+    """مصدر صفوف مرقّم (نفس واجهة core.SqlSource) يقرأ كل صفحة من الخادم"""
+    in_memory = False
+
+    def __init__(self, client, name, args):
+        # التعريف المحلي للمفتاح والترتيب فقط؛ لا يلمس قاعدة البيانات
+        local = core.source(name, *args)
+        self.client = client
+        self.name = name
+        self.args = list(args)
+        self.key_index = local.key_index
+        self.descending = local.descending
+
+    def key(self, row):
+        return tuple(row[i] for i in self.key_index)
+
+    def _page(self, op, **body):
+        return self.client._json("POST", f"/sources/{self.name}", body=dict(body, op=op, args=self.args))
+
+    def count(self):
+        return self._page("count")
+
+    def first(self, limit):
+        return _rows(self._page("first", limit=limit))
+
+    def after(self, key, limit):
+        return _rows(self._page("after", key=list(key), limit=limit))
+
+    def before(self, key, limit):
+        return _rows(self._page("before", key=list(key), limit=limit))
+
+    def slice(self, offset, limit):
+        return _rows(self._page("slice", offset=offset, limit=limit))
+
+
+class EventListener(threading.Thread):
+    """يستقبل تغييرات كل الأجهزة من الخادم وينشرها محليًا فتطبقها التبويبات كما لو كانت محلية.
+    on_missed() إذا فاتت أحداث (انقطاع طويل أو إعادة تشغيل الخادم) لإعادة تحميل القوائم"""
+    def __init__(self, client, on_missed=None):
+        super().__init__(name="server-events", daemon=True)
+        self.client = Client(client.url, client.token, POLL_SECONDS + TIMEOUT)
+        self.on_missed = on_missed
+        self.stopped = threading.Event()
+
+    def stop(self):
+        self.stopped.set()
+
+    def run(self):
+        since, server, offline = -1, None, False
+        while not self.stopped.is_set():
+            try:
+                reply = self.client.poll_events(since, server)
+            except (ServerError, ValueError) as e:
+                if not offline:
+                    print(f"⚠️ انقطع الاتصال بالخادم: {e}")
+                    offline = True
+                self.stopped.wait(RETRY_SECONDS)
+                continue
+            if self.stopped.is_set():
+                break
+            if reply["missed"]:
+                if self.on_missed:
+                    self.on_missed()
+            else:
+                for topic, data in reply["events"]:
+                    events.publish(topic, **data)
+            since, server, offline = reply["seq"], reply["server"], False
@@ -0,0 +1,716 @@
+# -*- coding: utf-8 -*-
+"""منطق المرتبات بدون واجهة: الموظفون، المناطق، الرواتب، الأوردرات والتقارير.
+تستخدمه تبويبات البرنامج، ويمكن تشغيله من سطر الأوامر: python -m payroll_core --help"""
+import os
+import sys
+import argparse
+from bisect import bisect_right
+from itertools import groupby
+from operator import itemgetter
+from datetime import datetime, date, timedelta
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+
+import payroll_db
+import payroll_events as events
+import payroll_profile as profile
+from payroll_db import get_conn, query, transaction
+
+REPORTS_DIR = "reports"
+
+# كل المبالغ (المرتبات، الانتقالات، الإجماليات) مخزنة ومحسوبة بالقرش كأعداد صحيحة،
+# وتتحول من/إلى الجنيه فقط عند الإدخال والعرض
+PIASTRES = 100
+# النسب (الزيادات الجماعية) بأجزاء المائة من 1% (750 = 7.5%) فتبقى أعدادًا صحيحة أيضًا
+PERCENT_SCALE = 100
+
+# المرتب المقترح عند عدم وجود رواتب مسجلة للمنطقة ولم يُحدد لها مرتب افتراضي (areas.default_salary)
+DEFAULT_SALARY = 5000 * PIASTRES
+
+# ============================= Money =============================
+def to_piastres(amount):
+    """مبلغ بالجنيه (نص أو رقم) إلى قروش صحيحة بدون أخطاء float.
+    ValueError إذا لم يكن رقمًا"""
+    try:
+        value = Decimal(str(amount).strip() or "0")
+    except InvalidOperation:
+        raise ValueError(f"مبلغ غير صالح: {amount}")
+    if not value.is_finite():
+        raise ValueError(f"مبلغ غير صالح: {amount}")
+    return int((value * PIASTRES).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+def parse_percent(text):
+    """نسبة مثل 7.5 إلى أجزاء المائة (750). ValueError إذا لم تكن رقمًا"""
+    try:
+        value = Decimal(str(text).strip() or "0")
+    except InvalidOperation:
+        raise ValueError(f"نسبة غير صالحة: {text}")
+    if not value.is_finite():
+        raise ValueError(f"نسبة غير صالحة: {text}")
+    return int((value * PERCENT_SCALE).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+def format_percent(percent):
+    return f"{Decimal(percent) / PERCENT_SCALE:f}%"
+
+def money_sql(column):
+    """تعبير SQL يعرض مبلغًا بالقرش (غير سالب) كنص بالجنيه مثل format_money"""
+    return f"printf('%d.%02d', {column}/{PIASTRES}, {column}%{PIASTRES})"
+
+def format_money(piastres):
+    """قروش إلى نص بالجنيه مثل 5400.50"""
+    piastres = int(piastres)
+    sign = "-" if piastres < 0 else ""
+    pounds, rest = divmod(abs(piastres), PIASTRES)
+    return f"{sign}{pounds}.{rest:02d}"
+
+# ============================= Database =============================
+def ensure_dirs():
+    os.makedirs(os.path.dirname(payroll_db.DB_PATH) or ".", exist_ok=True)
+    os.makedirs(REPORTS_DIR, exist_ok=True)
+
+def init_db():
+    if not os.path.exists(payroll_db.DB_PATH):
+        print("إنشاء قاعدة بيانات جديدة...")
+    else:
+        print("استخدام قاعدة البيانات الموجودة...")
+    
+    with transaction() as c:
+        _create_schema(c)
+        payroll_db.migrate(c)
+        _seed_demo_data(c)
+    print("تم إنشاء قاعدة البيانات بنجاح!")
+
+def _create_schema(c):
+    # Employees
+    c.execute("""
+    CREATE TABLE IF NOT EXISTS employees(
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL UNIQUE
+    )""")
+    
+    # Areas
+    c.execute("""
+    CREATE TABLE IF NOT EXISTS areas(
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL UNIQUE
+    )""")
+    
+    # Salary per (employee × area)
+    c.execute("""
+    CREATE TABLE IF NOT EXISTS employee_area_salary(
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        employee_id INTEGER NOT NULL,
+        area_id INTEGER NOT NULL,
+        salary INTEGER NOT NULL,
+        UNIQUE(employee_id, area_id),
+        FOREIGN KEY(employee_id) REFERENCES employees(id),
+        FOREIGN KEY(area_id) REFERENCES areas(id)
+    )""")
+    
+    # Orders
+    c.execute("""
+    CREATE TABLE IF NOT EXISTS orders(
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        area_id INTEGER NOT NULL,
+        address TEXT,
+        created_at TEXT NOT NULL,
+        FOREIGN KEY(area_id) REFERENCES areas(id)
+    )""")
+    
+    # Order details (employees in each order)
+    c.execute("""
+    CREATE TABLE IF NOT EXISTS order_employees(
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        order_id INTEGER NOT NULL,
+        employee_id INTEGER NOT NULL,
+        salary INTEGER NOT NULL,
+        transport INTEGER NOT NULL DEFAULT 0,
+        total INTEGER NOT NULL,
+        FOREIGN KEY(order_id) REFERENCES orders(id),
+        FOREIGN KEY(employee_id) REFERENCES employees(id)
+    )""")
+
+def _seed_demo_data(c):
+    # بعد الترحيلات حتى تُكتب الرواتب بالقرش مباشرة
+    c.execute("SELECT COUNT(*) FROM employees")
+    if c.fetchone()[0] == 0:
+        print("إضافة بيانات تجريبية...")
+        employees = [("أحمد",), ("محمد",), ("خالد",), ("محمود",), ("سارة",)]
+        c.executemany("INSERT INTO employees(name) VALUES(?)", employees)
+        
+        areas = [("الغردقة",), ("القاهرة",), ("الإسكندرية",)]
+        c.executemany("INSERT INTO areas(name) VALUES(?)", areas)
+        
+        # رواتب تجريبية
+        c.execute("SELECT id,name FROM employees")
+        emp_map = {name: emp_id for emp_id, name in c.fetchall()}
+        c.execute("SELECT id,name FROM areas")
+        area_map = {name: area_id for area_id, name in c.fetchall()}
+        
+        salary_data = [
+            (emp_map["أحمد"], area_map["الغردقة"], 5000),
+            (emp_map["محمد"], area_map["الغردقة"], 5400),
+            (emp_map["خالد"], area_map["الغردقة"], 4800),
+            (emp_map["محمود"], area_map["القاهرة"], 6100),
+            (emp_map["سارة"], area_map["الإسكندرية"], 5900),
+            (emp_map["أحمد"], area_map["القاهرة"], 7000),
+        ]
+        c.executemany("INSERT INTO employee_area_salary(employee_id, area_id, salary) VALUES (?,?,?)",
+                      [(emp_id, area_id, salary * PIASTRES) for emp_id, area_id, salary in salary_data])
+        payroll_db.backfill_salary_history(c)
+    else:
+        print("البيانات التجريبية موجودة بالفعل...")
+
+# ============================= Employees =============================
+def list_employees():
+    return query("SELECT id,name FROM employees ORDER BY name")
+
+def add_employee(name):
+    """إضافة موظف وإرجاع رقمه (sqlite3.IntegrityError إذا كان الاسم موجودًا)"""
+    name = _require_name(name)
+    with transaction() as c:
+        c.execute("INSERT INTO employees(name) VALUES(?)", (name,))
+    events.publish(events.EMPLOYEE_ADDED, employee_id=c.lastrowid, name=name)
+    return c.lastrowid
+
+def rename_employee(employee_id, name):
+    name = _require_name(name)
+    with transaction() as c:
+        c.execute("UPDATE employees SET name=? WHERE id=?", (name, employee_id))
+    events.publish(events.EMPLOYEE_RENAMED, employee_id=employee_id, name=name)
+
+def delete_employee(employee_id):
+    with transaction() as c:
+        c.execute("DELETE FROM employees WHERE id=?", (employee_id,))
+    events.publish(events.EMPLOYEE_DELETED, employee_id=employee_id)
+
+def _require_name(name):
+    name = (name or "").strip()
+    if not name:
+        raise ValueError("الاسم مطلوب")
+    return name
+
+# ============================= Areas =============================
+def list_areas():
+    return query("SELECT id,name FROM areas ORDER BY name")
+
+def add_area(name):
+    name = _require_name(name)
+    with transaction() as c:
+        c.execute("INSERT INTO areas(name) VALUES(?)", (name,))
+    events.publish(events.AREA_ADDED, area_id=c.lastrowid, name=name)
+    return c.lastrowid
+
+def set_area_default_salary(area_id, salary):
+    """المرتب الافتراضي لموظفي المنطقة بالقرش (None = DEFAULT_SALARY)"""
+    with transaction() as c:
+        c.execute("UPDATE areas SET default_salary=? WHERE id=?", (salary, area_id))
+    events.publish(events.AREA_DEFAULT_SALARY, area_id=area_id, default_salary=salary)
+
+def area_default_salary(area_id):
+    rows = query("SELECT COALESCE(default_salary, ?) FROM areas WHERE id=?", (DEFAULT_SALARY, area_id))
+    return rows[0][0] if rows else DEFAULT_SALARY
+
+def delete_area(area_id):
+    with transaction() as c:
+        c.execute("DELETE FROM areas WHERE id=?", (area_id,))
+    events.publish(events.AREA_DELETED, area_id=area_id)
+
+# ============================= Salary map =============================
+# كل تعديل يُسجل في salary_history بتاريخ سريانه، و employee_area_salary = المرتب الحالي
+def _today():
+    return date.today().isoformat()
+
+def set_salary(employee_id, area_id, salary, effective_from=None):
+    """تسجيل/تعديل مرتب موظف في منطقة (بالقرش) من تاريخ effective_from (الافتراضي اليوم، حتى
+    لأول مرتب فلا يظهر الموظف في أوردرات سابقة إلا بتاريخ صريح). التاريخ الأقدم من آخر تعديل
+    يُضاف للسجل فقط (تصحيح مرتب فترة سابقة). يرجع رقم سطر المرتب الحالي"""
+    if effective_from is not None and effective_from > date.today():
+        raise ValueError("تاريخ السريان لا يكون في المستقبل (للتعديل اللاحق استخدم الزيادة الجماعية)")
+    with transaction() as c:
+        c.execute("SELECT MAX(effective_from) FROM salary_history WHERE area_id=? AND employee_id=?", (area_id, employee_id))
+        latest = c.fetchone()[0]
+        since = effective_from.isoformat() if effective_from else _today()
+        c.execute("INSERT OR REPLACE INTO salary_history(area_id, employee_id, effective_from, salary) VALUES(?,?,?,?)",
+                  (area_id, employee_id, since, salary))
+        c.execute("SELECT id FROM employee_area_salary WHERE employee_id=? AND area_id=?", (employee_id, area_id))
+        old = c.fetchone()
+        current = latest is None or since >= latest
+        if current:
+            c.execute("INSERT OR REPLACE INTO employee_area_salary(employee_id, area_id, salary) VALUES(?,?,?)", (employee_id, area_id, salary))
+            mapping_id = c.lastrowid
+            c.execute("SELECT e.name,a.name FROM employees e, areas a WHERE e.id=? AND a.id=?", (employee_id, area_id))
+            employee, area = c.fetchone()
+    if not current:
+        events.publish(events.SALARY_HISTORY, employee_id=employee_id, area_id=area_id, effective_from=since)
+        return old[0] if old else None
+    events.publish(events.MAPPING_SAVED, mapping_id=mapping_id, employee_id=employee_id, area_id=area_id,
+                   salary=salary, employee=employee, area=area, replaced_id=old[0] if old else None)
+    return mapping_id
+
+def delete_salary(mapping_id):
+    """إلغاء ربط الموظف بالمنطقة من اليوم (السجل يحتفظ بمرتباته السابقة)"""
+    with transaction() as c:
+        c.execute("SELECT employee_id,area_id FROM employee_area_salary WHERE id=?", (mapping_id,))
+        row = c.fetchone()
+        if row is None:
+            return
+        c.execute("DELETE FROM employee_area_salary WHERE id=?", (mapping_id,))
+        c.execute("INSERT OR REPLACE INTO salary_history(area_id, employee_id, effective_from, salary) VALUES(?,?,?,NULL)",
+                  (row[1], row[0], _today()))
+    events.publish(events.MAPPING_DELETED, mapping_id=mapping_id, employee_id=row[0], area_id=row[1])
+
+def salary_history(area_id=None, employee_id=None):
+    """سجل الرواتب (area_id, employee_id, effective_from, salary) مرتبًا بهذا الترتيب
+    (salary NULL = انتهى الربط من هذا التاريخ)"""
+    conds, params = [], []
+    if area_id is not None:
+        conds.append("area_id=?")
+        params.append(area_id)
+    if employee_id is not None:
+        conds.append("employee_id=?")
+        params.append(employee_id)
+    where = " WHERE " + " AND ".join(conds) if conds else ""
+    return query("SELECT area_id,employee_id,effective_from,salary FROM salary_history"
+                 f"{where} ORDER BY area_id,employee_id,effective_from", params)
+
+class SalaryHistory:
+    """سجل الرواتب في الذاكرة: لكل (موظف، منطقة) تواريخ السريان مرتبة وبجانبها المرتبات،
+    فمرتب أي يوم = bisect في تواريخ هذا الزوج فقط، O(log n) مهما طال السجل.
+    rows بترتيب salary_history()
+
+    قاعدة مرتب سطر الأوردر (الاختيار في الواجهة وسطر الأوامر والاستيراد): مرتب الموظف الساري يومها،
+    وإذا لم يكن لأي موظف مرتب ساري في المنطقة يومها فالمرتب الافتراضي للمنطقة لكل الموظفين،
+    وإلا فالموظف غير متاح في المنطقة يومها"""
+    def __init__(self, rows):
+        self.pairs = {}
+        self.areas = {}
+        for (area_id, employee_id), group in groupby(rows, key=itemgetter(0, 1)):
+            group = list(group)
+            self.pairs[employee_id, area_id] = ([row[2] for row in group], [row[3] for row in group])
+            self.areas.setdefault(area_id, []).append(employee_id)
+
+    def salary_at(self, employee_id, area_id, day):
+        """مرتب الموظف في المنطقة يوم day (date أو نص ISO بتاريخ أو تاريخ ووقت) أو None"""
+        entry = self.pairs.get((employee_id, area_id))
+        if entry is None:
+            return None
+        dates, salaries = entry
+        i = bisect_right(dates, str(day)[:10]) - 1
+        return salaries[i] if i >= 0 else None
+
+    def staffed(self, area_id, day):
+        """هل لأي موظف مرتب ساري في المنطقة يوم day"""
+        return any(self.salary_at(emp_id, area_id, day) is not None for emp_id in self.areas.get(area_id, ()))
+
+    def rate(self, employee_id, area_id, day, default_salary):
+        """مرتب سطر أوردر حسب القاعدة أعلاه أو None. default_salary(area_id) يُستدعى عند الحاجة فقط"""
+        salary = self.salary_at(employee_id, area_id, day)
+        if salary is None and not self.staffed(area_id, day):
+            salary = default_salary(area_id)
+        return salary
+
+    def area_salaries(self, area_id, day, employees, default):
+        """صفوف area_salaries ليوم day من السجل في الذاكرة. employees = list_employees()"""
+        if not self.staffed(area_id, day):
+            return [(emp_id, emp_name, default) for emp_id, emp_name in employees]
+        rows = []
+        for emp_id, emp_name in employees:
+            salary = self.salary_at(emp_id, area_id, day)
+            if salary is not None:
+                rows.append((emp_id, emp_name, salary))
+        return rows
+
+def area_salaries(area_id, day=None):
+    """الموظفون المتاحون لمنطقة مع مرتب كل منهم: (id, name, salary). day = المرتبات السارية يوم معين
+    (None = الحالية). إذا لم تُسجل رواتب للمنطقة يرجع كل الموظفين بالمرتب الافتراضي للمنطقة
+    (انظر SalaryHistory)"""
+    if day is not None:
+        return SalaryHistory(salary_history(area_id)).area_salaries(area_id, day, list_employees(),
+                                                                    area_default_salary(area_id))
+    rows = query("SELECT e.id,e.name,mas.salary FROM employees e JOIN employee_area_salary mas ON mas.employee_id=e.id WHERE mas.area_id=?", (area_id,))
+    if not rows:
+        default = area_default_salary(area_id)
+        rows = [(emp_id, emp_name, default) for emp_id, emp_name in list_employees()]
+    return rows
+
+# ============================= Orders =============================
+def line_total(salary, transport):
+    return salary + transport
+
+def create_order(area_id, address, lines, created_at=None):
+    """حفظ أوردر بسطوره في معاملة واحدة. lines: [{'id', 'salary', 'transport'}, ...] بالقرش
+    يرجع (رقم الأوردر, الإجمالي بالقرش)"""
+    if not lines:
+        raise ValueError("اختر موظفين")
+    address = (address or "").strip()
+    created_at = created_at or datetime.now().isoformat()
+    rows = [(emp['id'], emp['salary'], emp['transport'], line_total(emp['salary'], emp['transport'])) for emp in lines]
+    with transaction() as c:
+        c.execute("INSERT INTO orders(area_id,address,created_at) VALUES(?,?,?)", (area_id, address, created_at))
+        order_id = c.lastrowid
+        c.executemany("INSERT INTO order_employees(order_id,employee_id,salary,transport,total) VALUES(?,?,?,?,?)",
+                      [(order_id,) + row for row in rows])
+        # الإجمالي حسبته triggers السطور في نفس المعاملة
+        c.execute("SELECT a.name,o.total_amount FROM orders o JOIN areas a ON a.id=o.area_id WHERE o.id=?", (order_id,))
+        area, total_amount = c.fetchone()
+    events.publish(events.ORDER_ADDED, order_id=order_id, area_id=area_id, area=area,
+                   address=address, created_at=created_at)
+    return order_id, total_amount
+
+# ============================= Reports =============================
+ORDER_SEARCH_LIMIT = 50
+
+# كل صف: رأس الأوردر + إجماليات السطور (SUM() OVER) + سطر واحد، فالتقرير كله في رحلة واحدة للقاعدة.
+# LEFT JOIN حتى يرجع الأوردر بدون سطور في صف واحد سطره NULL
+ORDER_REPORT_SQL = (
+    "SELECT a.name,o.address,o.created_at,o.total_amount,SUM(oe.salary) OVER (),SUM(oe.transport) OVER (),"
+    "COUNT(oe.id) OVER (),e.name,oe.salary,oe.transport,oe.total FROM orders o JOIN areas a ON a.id=o.area_id "
+    "LEFT JOIN order_employees oe ON oe.order_id=o.id LEFT JOIN employees e ON e.id=oe.employee_id "
+    "WHERE o.id=?")
+
+def order_report(order_id):
+    """تقرير أوردر من استعلام واحد. يرجع None أو (الرأس, الإجماليات, السطور):
+    الرأس (المنطقة, العنوان, التاريخ)، الإجماليات (المرتبات, الانتقالات, الإجمالي, عدد السطور)،
+    والسطور (الموظف, المرتب, بدل الانتقالات, الإجمالي) تُقرأ تدريجيًا من الـ cursor"""
+    cursor = get_conn().execute(ORDER_REPORT_SQL, (order_id,))
+    first = cursor.fetchone()
+    if first is None:
+        return None
+    area, address, created_at, total_amount, salary, transport, count = first[:7]
+    totals = (salary or 0, transport or 0, total_amount, count)
+    return (area, address, created_at), totals, _report_lines(first, cursor)
+
+def _report_lines(first, cursor):
+    if first[7] is None:
+        return
+    yield first[7:]
+    for row in cursor:
+        yield row[7:]
+
+def period_lines(date_from=None, date_to=None, area_id=None, employee_id=None):
+    """سطور كل الأوردرات في فترة بترتيب التاريخ كـ cursor (بدون تحميلها في الذاكرة):
+    (التاريخ, رقم الأوردر, الموظف, المنطقة, المرتب, بدل الانتقالات, الإجمالي)"""
+    conds, params = [], []
+    if date_from:
+        conds.append("o.created_at>=?")
+        params.append(date_from.isoformat())
+    if date_to:
+        conds.append("o.created_at<?")
+        params.append((date_to + timedelta(days=1)).isoformat())
+    if area_id is not None:
+        conds.append("o.area_id=?")
+        params.append(area_id)
+    if employee_id is not None:
+        conds.append("oe.employee_id=?")
+        params.append(employee_id)
+    where = " WHERE " + " AND ".join(conds) if conds else ""
+    return get_conn().execute(
+        "SELECT substr(o.created_at,1,10),o.id,e.name,a.name,oe.salary,oe.transport,oe.total "
+        "FROM orders o JOIN order_employees oe ON oe.order_id=o.id "
+        "JOIN employees e ON e.id=oe.employee_id JOIN areas a ON a.id=o.area_id"
+        f"{where} ORDER BY o.created_at,o.id", params)
+
+def order_total(order_id):
+    """الإجمالي المخزن في الأوردر (بدون قراءة سطوره)"""
+    rows = query("SELECT total_amount FROM orders WHERE id=?", (order_id,))
+    return rows[0][0] if rows else 0
+
+def search_orders(text="", area_id=None, date_from=None, date_to=None, limit=ORDER_SEARCH_LIMIT):
+    """أول N أوردر مطابق (الأحدث أولًا) برقم الأوردر أو جزء من العنوان أو المنطقة أو الفترة:
+    (رقم, المنطقة, العنوان, التاريخ, الإجمالي)"""
+    conds, params = [], []
+    text = text.strip()
+    if text:
+        # فهرس trigram يحتاج 3 أحرف على الأقل
+        if len(text) >= 3 and payroll_db.has_table("orders_fts"):
+            match = "o.id IN (SELECT rowid FROM orders_fts WHERE orders_fts MATCH ?)"
+            pattern = '"' + text.replace('"', '""') + '"'
+        else:
+            match = "o.address LIKE ?"
+            pattern = f"%{text}%"
+        if text.isdigit():
+            conds.append(f"(o.id=? OR {match})")
+            params += [int(text), pattern]
+        else:
+            conds.append(match)
+            params.append(pattern)
+    if area_id is not None:
+        conds.append("o.area_id=?")
+        params.append(area_id)
+    if date_from:
+        conds.append("o.created_at>=?")
+        params.append(date_from.isoformat())
+    if date_to:
+        conds.append("o.created_at<?")
+        params.append((date_to + timedelta(days=1)).isoformat())
+    where = " WHERE " + " AND ".join(conds) if conds else ""
+    return query("SELECT o.id,a.name,o.address,o.created_at,o.total_amount FROM orders o JOIN areas a ON a.id=o.area_id"
+                 f"{where} ORDER BY o.id DESC LIMIT ?", (*params, limit))
+
+# ============================= Payroll periods =============================
+# مفتاح الفترة من عمود اليوم في جدول الملخص (الأسبوع يبدأ الاثنين)
+PERIODS = {
+    "day": "p.day",
+    "week": "date(p.day, '-' || ((CAST(strftime('%w', p.day) AS INTEGER) + 6) % 7) || ' days')",
+    "month": "substr(p.day, 1, 7)",
+}
+SUMMARY_GROUPS = {
+    "employee": ("employees", "p.employee_id"),
+    "area": ("areas", "p.area_id"),
+}
+
+def payroll_summary(period="month", group="employee", date_from=None, date_to=None, area_id=None, employee_id=None):
+    """مستحقات كل موظف (أو منطقة) في كل فترة من جدول payroll_daily بدون المرور على سطور الأوردرات:
+    (الفترة, الرقم, الاسم, عدد السطور, المرتبات, الانتقالات, الإجمالي) والمبالغ بالقرش"""
+    if period not in PERIODS:
+        raise ValueError(f"فترة غير معروفة: {period}")
+    if group not in SUMMARY_GROUPS:
+        raise ValueError(f"تجميع غير معروف: {group}")
+    table, column = SUMMARY_GROUPS[group]
+    conds, params = [], []
+    if date_from:
+        conds.append("p.day>=?")
+        params.append(date_from.isoformat())
+    if date_to:
+        conds.append("p.day<=?")
+        params.append(date_to.isoformat())
+    if area_id is not None:
+        conds.append("p.area_id=?")
+        params.append(area_id)
+    if employee_id is not None:
+        conds.append("p.employee_id=?")
+        params.append(employee_id)
+    where = " WHERE " + " AND ".join(conds) if conds else ""
+    return query(f"SELECT {PERIODS[period]} AS period,{column},COALESCE(g.name,'#'||{column}),"
+                 "SUM(p.lines),SUM(p.salary),SUM(p.transport),SUM(p.total) "
+                 f"FROM payroll_daily p LEFT JOIN {table} g ON g.id={column}{where} "
+                 f"GROUP BY period,{column} ORDER BY period,3", params)
+
+# ============================= Paged sources =============================
+# القوائم الطويلة في الواجهة تقرأ صفحة بصفحة؛ التعريفات هنا حتى يستخدمها الخادم والواجهة معًا
+class SqlSource:
+    """مصدر صفوف من استعلام SQL مع ترقيم بالمفتاح (keyset) بدلًا من تحميل كل الصفوف.
+    keys: أعمدة الترتيب (فريدة معًا)، key_index: مواضعها داخل الصف المُرجع"""
+    in_memory = False
+
+    def __init__(self, select, keys, key_index, where="", params=(), descending=False):
+        self.select = select
+        self.keys = keys
+        self.key_index = key_index
+        self.where = where
+        self.params = tuple(params)
+        self.descending = descending
+
+    def key(self, row):
+        return tuple(row[i] for i in self.key_index)
+
+    def _where(self, cond=None):
+        clauses = [f"({w})" for w in (self.where, cond) if w]
+        return " WHERE " + " AND ".join(clauses) if clauses else ""
+
+    def _sql(self, cond=None, reverse=False):
+        direction = "DESC" if self.descending != reverse else "ASC"
+        order = ", ".join(f"{k} {direction}" for k in self.keys)
+        return f"{self.select}{self._where(cond)} ORDER BY {order} LIMIT ?"
+
+    def _cmp(self, forward):
+        op = ">" if forward != self.descending else "<"
+        marks = ", ".join("?" * len(self.keys))
+        return f"({', '.join(self.keys)}) {op} ({marks})"
+
+    def count(self):
+        return query(f"SELECT COUNT(*) FROM ({self.select}{self._where()})", self.params)[0][0]
+
+    def first(self, limit):
+        return query(self._sql(), (*self.params, limit))
+
+    def after(self, key, limit):
+        return query(self._sql(self._cmp(True)), (*self.params, *key, limit))
+
+    def before(self, key, limit):
+        rows = query(self._sql(self._cmp(False), reverse=True), (*self.params, *key, limit))
+        rows.reverse()
+        return rows
+
+    def slice(self, offset, limit):
+        # للقفز البعيد بشريط التمرير فقط
+        return query(self._sql() + " OFFSET ?", (*self.params, limit, offset))
+
+
+MAPPING_SELECT = (f"SELECT mas.id,e.name,a.name,{money_sql('mas.salary')},mas.area_id,mas.employee_id FROM employee_area_salary mas "
+                  "JOIN employees e ON e.id=mas.employee_id JOIN areas a ON a.id=mas.area_id")
+
+def _employees_source():
+    return SqlSource("SELECT id,name FROM employees", ["id"], (0,), descending=True)
+
+def _areas_source():
+    return SqlSource(f"SELECT id,name,COALESCE({money_sql('default_salary')},'') FROM areas",
+                     ["id"], (0,), descending=True)
+
+def _mapping_source():
+    # الترتيب بالمنطقة ثم الموظف عبر فهرس (area_id, employee_id) حتى لا تحتاج كل صفحة لفرز الجدول كله
+    return SqlSource(MAPPING_SELECT, ["mas.area_id", "mas.employee_id"], (4, 5))
+
+def _order_lines_source(order_id):
+    return SqlSource(
+        f"SELECT e.name,{money_sql('oe.salary')},{money_sql('oe.transport')},{money_sql('oe.total')},"
+        "oe.id,oe.employee_id FROM order_employees oe JOIN employees e ON e.id=oe.employee_id",
+        ["oe.id"], (4,), where="oe.order_id=?", params=(order_id,))
+
+SOURCES = {
+    "employees": _employees_source,
+    "areas": _areas_source,
+    "mapping": _mapping_source,
+    "order_lines": _order_lines_source,
+}
+
+def source(name, *args):
+    """مصدر الصفوف المرقّم لقائمة بالاسم (انظر SOURCES)"""
+    if name not in SOURCES:
+        raise ValueError(f"قائمة غير معروفة: {name}")
+    return SOURCES[name](*args)
+
+# ============================= CLI =============================
+def _id_by_name(table, name):
+    rows = query(f"SELECT id FROM {table} WHERE name=?", (name,))
+    if not rows:
+        raise SystemExit(f"❌ غير موجود: {name}")
+    return rows[0][0]
+
+def _cmd_employees(args):
+    for name in args.add or ():
+        print(f"✅ {name}: {add_employee(name)}")
+    if not args.add:
+        for emp_id, name in list_employees():
+            print(f"{emp_id}\t{name}")
+
+def _cmd_areas(args):
+    for name in args.add or ():
+        print(f"✅ {name}: {add_area(name)}")
+    if not args.add:
+        for area_id, name in list_areas():
+            print(f"{area_id}\t{name}")
+
+def _cmd_default_salary(args):
+    set_area_default_salary(_id_by_name("areas", args.area), args.salary)
+    print("✅ تم الحفظ")
+
+def _cmd_salary(args):
+    set_salary(_id_by_name("employees", args.employee), _id_by_name("areas", args.area), args.salary, args.date_from)
+    print("✅ تم الحفظ")
+
+def _cmd_history(args):
+    area_id = _id_by_name("areas", args.area) if args.area else None
+    names = dict(list_areas())
+    for area_id, _, since, salary in salary_history(area_id, _id_by_name("employees", args.employee)):
+        since = "البداية" if since == payroll_db.HISTORY_START else since
+        print(f"{names.get(area_id, area_id)}\t{since}\t{format_money(salary) if salary is not None else 'انتهى'}")
+
+def _cmd_order(args):
+    area_id = _id_by_name("areas", args.area)
+    salaries = {emp_id: salary for emp_id, _, salary in area_salaries(area_id, args.date)}
+    lines = []
+    for item in args.employees:
+        # الصيغة: الاسم أو الاسم:بدل_الانتقالات
+        name, _, transport = item.partition(":")
+        emp_id = _id_by_name("employees", name)
+        if emp_id not in salaries:
+            raise SystemExit(f"❌ لا يوجد مرتب لـ {name} في {args.area} {args.date or 'اليوم'}")
+        lines.append({'id': emp_id, 'salary': salaries[emp_id], 'transport': to_piastres(transport)})
+    created_at = datetime.combine(args.date, datetime.now().time()).isoformat() if args.date else None
+    order_id, total = create_order(area_id, args.address, lines, created_at)
+    print(f"✅ الأوردر رقم {order_id} - الإجمالي {format_money(total)}")
+
+def _cmd_report(args):
+    report = order_report(args.order_id)
+    if report is None:
+        raise SystemExit(f"❌ الأوردر {args.order_id} غير موجود")
+    header, (salary, transport, total, _), lines = report
+    print("\t".join(str(v) for v in header))
+    for name, *amounts in lines:
+        print("\t".join([name] + [format_money(v) for v in amounts]))
+    print(f"الإجمالي\t{format_money(salary)}\t{format_money(transport)}\t{format_money(total)}")
+
+def _cmd_search(args):
+    area_id = _id_by_name("areas", args.area) if args.area else None
+    for *order, total_amount in search_orders(args.text, area_id, args.date_from, args.date_to, args.limit):
+        print("\t".join(str(v) for v in order) + f"\t{format_money(total_amount)}")
+
+def _cmd_summary(args):
+    area_id = _id_by_name("areas", args.area) if args.area else None
+    employee_id = _id_by_name("employees", args.employee) if args.employee else None
+    grand = 0
+    for period, _, name, lines, salary, transport, total in payroll_summary(
+            args.period, args.by, args.date_from, args.date_to, area_id, employee_id):
+        print(f"{period}\t{name}\t{lines}\t{format_money(salary)}\t{format_money(transport)}\t{format_money(total)}")
+        grand += total
+    print(f"الإجمالي\t{format_money(grand)}")
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="payroll_core", description="عمليات المرتبات من سطر الأوامر")
+    parser.add_argument("--db", help="مسار قاعدة البيانات")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("init", help="إنشاء/ترحيل قاعدة البيانات").set_defaults(fn=lambda args: None)
+    p = sub.add_parser("employees", help="عرض أو إضافة موظفين")
+    p.add_argument("--add", nargs="+", metavar="NAME")
+    p.set_defaults(fn=_cmd_employees)
+    p = sub.add_parser("areas", help="عرض أو إضافة مناطق")
+    p.add_argument("--add", nargs="+", metavar="NAME")
+    p.set_defaults(fn=_cmd_areas)
+    p = sub.add_parser("salary", help="تحديد مرتب موظف في منطقة")
+    p.add_argument("employee")
+    p.add_argument("area")
+    p.add_argument("salary", type=to_piastres)
+    p.add_argument("--from", dest="date_from", type=date.fromisoformat, help="تاريخ السريان (الافتراضي اليوم)")
+    p.set_defaults(fn=_cmd_salary)
+    p = sub.add_parser("history", help="سجل مرتبات موظف")
+    p.add_argument("employee")
+    p.add_argument("--area")
+    p.set_defaults(fn=_cmd_history)
+    p = sub.add_parser("default-salary", help="المرتب الافتراضي لمنطقة (بدون AMOUNT = الافتراضي العام)")
+    p.add_argument("area")
+    p.add_argument("salary", type=to_piastres, nargs="?")
+    p.set_defaults(fn=_cmd_default_salary)
+    p = sub.add_parser("order", help="إضافة أوردر")
+    p.add_argument("area")
+    p.add_argument("employees", nargs="+", metavar="NAME[:TRANSPORT]")
+    p.add_argument("--address", default="")
+    p.add_argument("--date", type=date.fromisoformat, help="تاريخ الأوردر (المرتبات السارية فيه)")
+    p.set_defaults(fn=_cmd_order)
+    p = sub.add_parser("report", help="تقرير أوردر")
+    p.add_argument("order_id", type=int)
+    p.set_defaults(fn=_cmd_report)
+    p = sub.add_parser("search", help="البحث في الأوردرات")
+    p.add_argument("text", nargs="?", default="")
+    p.add_argument("--area")
+    p.add_argument("--from", dest="date_from", type=date.fromisoformat)
+    p.add_argument("--to", dest="date_to", type=date.fromisoformat)
+    p.add_argument("--limit", type=int, default=ORDER_SEARCH_LIMIT)
+    p.set_defaults(fn=_cmd_search)
+    p = sub.add_parser("summary", help="مستحقات الموظفين/المناطق لكل فترة")
+    p.add_argument("--period", choices=sorted(PERIODS), default="month")
+    p.add_argument("--by", choices=sorted(SUMMARY_GROUPS), default="employee")
+    p.add_argument("--area")
+    p.add_argument("--employee")
+    p.add_argument("--from", dest="date_from", type=date.fromisoformat)
+    p.add_argument("--to", dest="date_to", type=date.fromisoformat)
+    p.set_defaults(fn=_cmd_summary)
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.db:
+        payroll_db.configure(args.db)
+    profile.configure_from_env()
+    ensure_dirs()
+    init_db()
+    try:
+        args.fn(args)
+    finally:
+        payroll_db.close_all()
+        if profile.enabled:
+            print(profile.summary())
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,462 @@
+# -*- coding: utf-8 -*-
+"""طبقة الاتصال بقاعدة البيانات: اتصال واحد مُهيأ لكل خيط بدلًا من فتح اتصال جديد مع كل عملية"""
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+import payroll_profile as profile
+
+DB_PATH = os.path.join("data", "payroll_new.db")
+
+# إعدادات الأداء لكل اتصال جديد
+PRAGMAS = [
+    ("journal_mode", "WAL"),
+    ("synchronous", "NORMAL"),
+    ("cache_size", -16000),       # حوالي 16 ميجا من الصفحات في الذاكرة
+    ("mmap_size", 268435456),     # 256 ميجا
+    ("temp_store", "MEMORY"),
+    ("busy_timeout", 5000),
+]
+
+# عدد الاستعلامات المُجهزة المحفوظة لكل اتصال
+STATEMENT_CACHE_SIZE = 256
+
+_local = threading.local()
+_lock = threading.Lock()
+_connections = []
+# يزيد مع configure/close_all: اتصالات الخيوط الأخرى لا تُغلق من خارجها (check_same_thread)،
+# فكل خيط يغلق اتصاله القديم ويفتح غيره على DB_PATH عند أول استخدام بعدها
+_generation = 0
+
+
+def configure(path):
+    """تغيير مسار قاعدة البيانات وإغلاق الاتصالات المفتوحة على المسار القديم"""
+    global DB_PATH
+    DB_PATH = path
+    close_all()
+
+
+def connect(path=None):
+    """فتح اتصال جديد مع تطبيق إعدادات الأداء"""
+    conn = sqlite3.connect(path or DB_PATH,
+                           cached_statements=STATEMENT_CACHE_SIZE,
+                           isolation_level=None)
+    for name, value in PRAGMAS:
+        conn.execute(f"PRAGMA {name}={value}")
+    return conn
+
+
+def get_conn():
+    """الاتصال الخاص بالخيط الحالي (يُفتح مرة واحدة ثم يُعاد استخدامه)"""
+    conn = getattr(_local, "conn", None)
+    if conn is not None and _local.pid == os.getpid() and _local.generation != _generation:
+        close_thread()
+        conn = None
+    # بعد fork لا يجب استخدام اتصال العملية الأم
+    if conn is None or _local.pid != os.getpid():
+        conn = connect()
+        _local.conn = conn
+        _local.pid = os.getpid()
+        _local.generation = _generation
+        with _lock:
+            _connections.append(conn)
+    # القياس قد يُشغل بعد فتح الاتصال، فيُربط سجل الاستعلامات هنا من داخل خيط الاتصال
+    if profile.enabled and getattr(_local, "traced", None) is not conn:
+        profile.trace(conn)
+        _local.traced = conn
+    return conn
+
+
+def query(sql, params=()):
+    """تنفيذ استعلام قراءة وإرجاع كل الصفوف"""
+    rows = get_conn().execute(sql, params).fetchall()
+    if profile.enabled:
+        profile.statement_done()
+        profile.count("rows_fetched", len(rows))
+    return rows
+
+
+@contextmanager
+def transaction():
+    """معاملة كتابة: commit عند النجاح و rollback عند أي خطأ.
+    المعاملات المتداخلة تنضم للمعاملة الخارجية."""
+    conn = get_conn()
+    if conn.in_transaction:
+        yield conn.cursor()
+        return
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        yield conn.cursor()
+        # فشل commit (SQLITE_BUSY، امتلاء القرص) يترك المعاملة مفتوحة فتنضم لها كل معاملة بعدها
+        # في هذا الخيط ولا تُحفظ أبدًا، لذلك يُلغى هو أيضًا
+        conn.commit()
+    except BaseException:
+        if conn.in_transaction:
+            conn.rollback()
+        profile.statement_done()
+        raise
+    profile.statement_done()
+
+
+# ============================= Migrations =============================
+def has_table(name):
+    return bool(query("SELECT 1 FROM sqlite_master WHERE name=?", (name,)))
+
+
+def _order_search_index(c):
+    """فهرس نصي (FTS5 trigram) على عناوين الأوردرات للبحث بأي جزء من العنوان"""
+    try:
+        c.execute("CREATE VIRTUAL TABLE IF NOT EXISTS orders_fts USING fts5("
+                  "address, content='orders', content_rowid='id', tokenize='trigram')")
+    except sqlite3.OperationalError as e:
+        print(f"⚠️ FTS5 غير متاح ({e}) - البحث في العناوين سيستخدم LIKE")
+        return
+    c.execute("""CREATE TRIGGER IF NOT EXISTS orders_fts_ai AFTER INSERT ON orders BEGIN
+        INSERT INTO orders_fts(rowid, address) VALUES (new.id, new.address);
+    END""")
+    c.execute("""CREATE TRIGGER IF NOT EXISTS orders_fts_ad AFTER DELETE ON orders BEGIN
+        INSERT INTO orders_fts(orders_fts, rowid, address) VALUES ('delete', old.id, old.address);
+    END""")
+    c.execute("""CREATE TRIGGER IF NOT EXISTS orders_fts_au AFTER UPDATE OF address ON orders BEGIN
+        INSERT INTO orders_fts(orders_fts, rowid, address) VALUES ('delete', old.id, old.address);
+        INSERT INTO orders_fts(rowid, address) VALUES (new.id, new.address);
+    END""")
+    c.execute("INSERT INTO orders_fts(orders_fts) VALUES ('rebuild')")
+
+
+# إضافة/طرح سطور أوردر كامل من الملخص (o = new أو old من جدول orders)
+_ADD_ORDER_LINES = """
+    INSERT INTO payroll_daily(day, employee_id, area_id, lines, salary, transport, total)
+    SELECT substr({o}.created_at, 1, 10), employee_id, {o}.area_id, COUNT(*), SUM(salary), SUM(transport), SUM(total)
+    FROM order_employees WHERE order_id={o}.id GROUP BY employee_id
+    ON CONFLICT(day, employee_id, area_id) DO UPDATE SET lines=lines+excluded.lines,
+        salary=salary+excluded.salary, transport=transport+excluded.transport, total=total+excluded.total;"""
+
+_SUB_ORDER_LINES = """
+    UPDATE payroll_daily SET
+        lines=lines-(SELECT COUNT(*) FROM order_employees oe WHERE oe.order_id={o}.id AND oe.employee_id=payroll_daily.employee_id),
+        salary=salary-(SELECT SUM(oe.salary) FROM order_employees oe WHERE oe.order_id={o}.id AND oe.employee_id=payroll_daily.employee_id),
+        transport=transport-(SELECT SUM(oe.transport) FROM order_employees oe WHERE oe.order_id={o}.id AND oe.employee_id=payroll_daily.employee_id),
+        total=total-(SELECT SUM(oe.total) FROM order_employees oe WHERE oe.order_id={o}.id AND oe.employee_id=payroll_daily.employee_id)
+    WHERE day=substr({o}.created_at, 1, 10) AND area_id={o}.area_id
+      AND employee_id IN (SELECT employee_id FROM order_employees WHERE order_id={o}.id);
+    DELETE FROM payroll_daily WHERE day=substr({o}.created_at, 1, 10) AND area_id={o}.area_id AND lines<=0;"""
+
+# إضافة/طرح سطر واحد (l = new أو old من جدول order_employees)
+_ADD_LINE = """
+    INSERT INTO payroll_daily(day, employee_id, area_id, lines, salary, transport, total)
+    SELECT substr(o.created_at, 1, 10), {l}.employee_id, o.area_id, 1, {l}.salary, {l}.transport, {l}.total
+    FROM orders o WHERE o.id={l}.order_id
+    ON CONFLICT(day, employee_id, area_id) DO UPDATE SET lines=lines+1,
+        salary=salary+excluded.salary, transport=transport+excluded.transport, total=total+excluded.total;"""
+
+_SUB_LINE = """
+    UPDATE payroll_daily SET lines=lines-1, salary=salary-{l}.salary,
+        transport=transport-{l}.transport, total=total-{l}.total
+    WHERE employee_id={l}.employee_id
+      AND (day, area_id)=(SELECT substr(created_at, 1, 10), area_id FROM orders WHERE id={l}.order_id);
+    DELETE FROM payroll_daily WHERE employee_id={l}.employee_id AND lines<=0;"""
+
+
+def _payroll_aggregates(c):
+    """ملخص يومي (يوم × موظف × منطقة) تحدّثه triggers مع كل إضافة/حذف/تعديل
+    حتى تُحسب مستحقات أي فترة من آلاف الصفوف بدلًا من ملايين سطور الأوردرات.
+    حذف أوردر قبل سطوره يطرحها كلها، فلا تُطرح مرة أخرى عند حذف السطور بعده"""
+    c.execute("""CREATE TABLE IF NOT EXISTS payroll_daily(
+        day TEXT NOT NULL,
+        employee_id INTEGER NOT NULL,
+        area_id INTEGER NOT NULL,
+        lines INTEGER NOT NULL,
+        salary INTEGER NOT NULL,
+        transport INTEGER NOT NULL,
+        total INTEGER NOT NULL,
+        PRIMARY KEY(day, employee_id, area_id)
+    ) WITHOUT ROWID""")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_payroll_daily_employee ON payroll_daily(employee_id, day)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_payroll_daily_area ON payroll_daily(area_id, day)")
+    triggers = [
+        ("payroll_daily_line_ai", "AFTER INSERT ON order_employees", _ADD_LINE.format(l="new")),
+        ("payroll_daily_line_ad", "AFTER DELETE ON order_employees", _SUB_LINE.format(l="old")),
+        ("payroll_daily_line_au", "AFTER UPDATE OF order_id, employee_id, salary, transport, total ON order_employees",
+         _SUB_LINE.format(l="old") + _ADD_LINE.format(l="new")),
+        ("payroll_daily_order_bd", "BEFORE DELETE ON orders", _SUB_ORDER_LINES.format(o="old")),
+        ("payroll_daily_order_au", "AFTER UPDATE OF area_id, created_at ON orders",
+         _SUB_ORDER_LINES.format(o="old") + _ADD_ORDER_LINES.format(o="new")),
+    ]
+    for name, event, body in triggers:
+        c.execute(f"CREATE TRIGGER IF NOT EXISTS {name} {event} BEGIN{body}\nEND")
+    c.execute("DELETE FROM payroll_daily")
+    c.execute("""INSERT INTO payroll_daily(day, employee_id, area_id, lines, salary, transport, total)
+        SELECT substr(o.created_at, 1, 10), oe.employee_id, o.area_id, COUNT(*), SUM(oe.salary), SUM(oe.transport), SUM(oe.total)
+        FROM order_employees oe JOIN orders o ON o.id=oe.order_id
+        GROUP BY 1, 2, 3""")
+
+
+# المبالغ كانت REAL بالجنيه فتظهر قيم مثل 5400.000000001 في المجاميع.
+# تُخزن الآن بالقرش كأعداد صحيحة؛ SQLite لا يغير نوع عمود فيُعاد بناء الجدول:
+# (الجدول, تعريفه الجديد باسم مؤقت, أعمدة النسخ)
+_PIASTRES = "CAST(ROUND({0}*100) AS INTEGER)"
+_MONEY_TABLES = [
+    ("areas", """CREATE TABLE areas_new(
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL UNIQUE,
+        default_salary INTEGER
+    )""", "id, name, " + _PIASTRES.format("default_salary")),
+    ("employee_area_salary", """CREATE TABLE employee_area_salary_new(
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        employee_id INTEGER NOT NULL,
+        area_id INTEGER NOT NULL,
+        salary INTEGER NOT NULL,
+        UNIQUE(employee_id, area_id),
+        FOREIGN KEY(employee_id) REFERENCES employees(id),
+        FOREIGN KEY(area_id) REFERENCES areas(id)
+    )""", "id, employee_id, area_id, " + _PIASTRES.format("salary")),
+    ("order_employees", """CREATE TABLE order_employees_new(
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        order_id INTEGER NOT NULL,
+        employee_id INTEGER NOT NULL,
+        salary INTEGER NOT NULL,
+        transport INTEGER NOT NULL DEFAULT 0,
+        total INTEGER NOT NULL,
+        FOREIGN KEY(order_id) REFERENCES orders(id),
+        FOREIGN KEY(employee_id) REFERENCES employees(id)
+    )""", "id, order_id, employee_id, {0}, {1}, {0}+{1}".format(_PIASTRES.format("salary"), _PIASTRES.format("transport"))),
+]
+
+
+def _money_to_piastres(c):
+    # triggers الملخص تشير لجداول سيُعاد بناؤها: تُحذف ثم يُعاد إنشاؤها مع الملخص بالقرش
+    for (name,) in c.execute("SELECT name FROM sqlite_master WHERE type='trigger' AND name LIKE 'payroll_daily_%'").fetchall():
+        c.execute(f"DROP TRIGGER {name}")
+    c.execute("DROP TABLE IF EXISTS payroll_daily")
+    for table, create, columns in _MONEY_TABLES:
+        c.execute(create)
+        c.execute(f"INSERT INTO {table}_new SELECT {columns} FROM {table}")
+        c.execute(f"DROP TABLE {table}")
+        c.execute(f"ALTER TABLE {table}_new RENAME TO {table}")
+    for statement in _INDEXES:
+        c.execute(statement)
+    _payroll_aggregates(c)
+
+
+# إجمالي كل أوردر مخزن في orders.total_amount وتحدّثه triggers داخل نفس معاملة السطور،
+# فقوائم الأوردرات بإجمالياتها لا تقرأ سطور الأوردرات
+_ORDER_TOTAL_TRIGGERS = [
+    ("order_total_line_ai", "AFTER INSERT ON order_employees",
+     "UPDATE orders SET total_amount=total_amount+new.total WHERE id=new.order_id;"),
+    ("order_total_line_ad", "AFTER DELETE ON order_employees",
+     "UPDATE orders SET total_amount=total_amount-old.total WHERE id=old.order_id;"),
+    ("order_total_line_au", "AFTER UPDATE OF order_id, total ON order_employees",
+     "UPDATE orders SET total_amount=total_amount-old.total WHERE id=old.order_id;\n"
+     "    UPDATE orders SET total_amount=total_amount+new.total WHERE id=new.order_id;"),
+]
+
+
+def _order_totals(c):
+    c.execute("ALTER TABLE orders ADD COLUMN total_amount INTEGER NOT NULL DEFAULT 0")
+    for name, event, body in _ORDER_TOTAL_TRIGGERS:
+        c.execute(f"CREATE TRIGGER IF NOT EXISTS {name} {event} BEGIN\n    {body}\nEND")
+    c.execute("UPDATE orders SET total_amount="
+              "(SELECT COALESCE(SUM(total), 0) FROM order_employees WHERE order_id=orders.id)")
+
+
+# الزيادات الجماعية (payroll_raises): القاعدة نفسها، وما تغير فعلًا في كل سطر عند تطبيقها.
+# percent بأجزاء المائة من 1% (750 = 7.5%)، و area_ids/employee_ids قوائم JSON (NULL = الكل)
+_SALARY_ADJUSTMENTS = [
+    """CREATE TABLE IF NOT EXISTS salary_adjustments(
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        created_at TEXT NOT NULL,
+        effective_from TEXT NOT NULL,
+        percent INTEGER NOT NULL DEFAULT 0,
+        amount INTEGER NOT NULL DEFAULT 0,
+        area_ids TEXT,
+        employee_ids TEXT,
+        note TEXT,
+        applied_at TEXT,
+        rows INTEGER
+    )""",
+    """CREATE TABLE IF NOT EXISTS salary_adjustment_lines(
+        adjustment_id INTEGER NOT NULL,
+        employee_id INTEGER NOT NULL,
+        area_id INTEGER NOT NULL,
+        old_salary INTEGER NOT NULL,
+        new_salary INTEGER NOT NULL,
+        FOREIGN KEY(adjustment_id) REFERENCES salary_adjustments(id)
+    )""",
+    "CREATE INDEX IF NOT EXISTS idx_salary_adjustment_lines ON salary_adjustment_lines(adjustment_id)",
+    # الزيادات المعلقة (بتاريخ سريان لم يأت بعد)
+    "CREATE INDEX IF NOT EXISTS idx_salary_adjustments_pending "
+    "ON salary_adjustments(effective_from) WHERE applied_at IS NULL",
+]
+
+# سجل الرواتب: كل مرتب (موظف × منطقة) بتاريخ سريانه، و salary NULL = انتهى ربط الموظف بالمنطقة
+# من هذا التاريخ. employee_area_salary يبقى المرتب الحالي (آخر سطر في السجل حتى اليوم).
+# المفتاح (المنطقة، الموظف، التاريخ) هو نفسه ترتيب البحث بالتاريخ فلا يحتاج فهرسًا آخر
+HISTORY_START = "0001-01-01"
+
+
+def _salary_history(c):
+    c.execute("""CREATE TABLE IF NOT EXISTS salary_history(
+        area_id INTEGER NOT NULL,
+        employee_id INTEGER NOT NULL,
+        effective_from TEXT NOT NULL,
+        salary INTEGER,
+        PRIMARY KEY(area_id, employee_id, effective_from),
+        FOREIGN KEY(employee_id) REFERENCES employees(id),
+        FOREIGN KEY(area_id) REFERENCES areas(id)
+    ) WITHOUT ROWID""")
+    backfill_salary_history(c)
+
+
+def backfill_salary_history(c):
+    """الرواتب الحالية التي ليس لها سجل (قبل الترحيل، أو المكتوبة مباشرة بـ SQL) تسري من البداية"""
+    c.execute("INSERT INTO salary_history(area_id, employee_id, effective_from, salary) "
+              "SELECT s.area_id, s.employee_id, ?, s.salary FROM employee_area_salary s WHERE NOT EXISTS "
+              "(SELECT 1 FROM salary_history h WHERE h.area_id=s.area_id AND h.employee_id=s.employee_id)",
+              (HISTORY_START,))
+
+
+_INDEXES = [
+    # سطور الأوردر: تغطي تقرير الأوردر وتصديره بدون الرجوع للجدول
+    "CREATE INDEX IF NOT EXISTS idx_order_employees_order "
+    "ON order_employees(order_id, employee_id, salary, transport, total)",
+    "CREATE INDEX IF NOT EXISTS idx_order_employees_employee ON order_employees(employee_id)",
+    # رواتب المنطقة عند اختيار الموظفين
+    "CREATE INDEX IF NOT EXISTS idx_employee_area_salary_area "
+    "ON employee_area_salary(area_id, employee_id, salary)",
+    "CREATE INDEX IF NOT EXISTS idx_orders_area_created ON orders(area_id, created_at)",
+    "CREATE INDEX IF NOT EXISTS idx_orders_created ON orders(created_at)",
+]
+
+# كل عنصر = (رقم الإصدار, خطوات). الخطوة أمر SQL أو دالة تستقبل الـ cursor.
+# الإصدار الحالي محفوظ في PRAGMA user_version
+MIGRATIONS = [
+    (1, _INDEXES),
+    (2, [_order_search_index]),
+    (3, [_payroll_aggregates]),
+    # المرتب المقترح لموظفي المنطقة عند عدم تسجيل رواتب لها (NULL = DEFAULT_SALARY)
+    (4, ["ALTER TABLE areas ADD COLUMN default_salary REAL"]),
+    (5, [_money_to_piastres]),
+    (6, [_order_totals]),
+    (7, _SALARY_ADJUSTMENTS),
+    (8, [_salary_history]),
+]
+
+
+def schema_version(c):
+    return c.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(c):
+    """تطبيق أي ترحيلات لم تُطبق بعد على القاعدة (داخل المعاملة الحالية)"""
+    version = schema_version(c)
+    for target, statements in MIGRATIONS:
+        if target <= version:
+            continue
+        print(f"ترحيل قاعدة البيانات إلى الإصدار {target}...")
+        for step in statements:
+            if callable(step):
+                step(c)
+            else:
+                c.execute(step)
+        c.execute(f"PRAGMA user_version={target}")
+        version = target
+    return version
+
+
+# ============================= Query plans =============================
+# الاستعلامات الساخنة: (الاسم, SQL, المعاملات, الجداول المسموح بمسحها بالكامل)
+HOT_QUERIES = [
+    ("order_lines",
+     "SELECT e.name,oe.salary,oe.transport,oe.total FROM order_employees oe "
+     "JOIN employees e ON e.id=oe.employee_id WHERE oe.order_id=?", (1,), ()),
+    # رأس الأوردر وسطوره وإجمالياته في استعلام واحد
+    ("order_report",
+     "SELECT a.name,o.address,o.created_at,o.total_amount,SUM(oe.salary) OVER (),SUM(oe.transport) OVER (),"
+     "COUNT(oe.id) OVER (),e.name,oe.salary,oe.transport,oe.total FROM orders o JOIN areas a ON a.id=o.area_id "
+     "LEFT JOIN order_employees oe ON oe.order_id=o.id LEFT JOIN employees e ON e.id=oe.employee_id "
+     "WHERE o.id=?", (1,), ()),
+    ("area_salaries",
+     "SELECT e.id,e.name,mas.salary FROM employees e JOIN employee_area_salary mas "
+     "ON mas.employee_id=e.id WHERE mas.area_id=?", (1,), ()),
+    # تاريخ رواتب منطقة مرتبًا كما يحتاجه SalaryHistory (بدون ترتيب مؤقت)
+    ("salary_history",
+     "SELECT area_id,employee_id,effective_from,salary FROM salary_history "
+     "WHERE area_id=? ORDER BY area_id,employee_id,effective_from", (1,), ()),
+    # قائمة الأوردرات تمر على orders بترتيب المفتاح الأساسي
+    ("orders_list",
+     "SELECT o.id,a.name,o.address,o.created_at,o.total_amount FROM orders o JOIN areas a ON a.id=o.area_id "
+     "ORDER BY o.id DESC", (), ("o",)),
+    ("payroll_summary",
+     "SELECT p.day,SUM(p.total) FROM payroll_daily p "
+     "WHERE p.employee_id=? AND p.day>=? AND p.day<? GROUP BY p.day", (1, "2024-01-01", "2024-02-01"), ()),
+]
+
+
+def explain(sql, params=()):
+    """خطة التنفيذ كقائمة نصوص (EXPLAIN QUERY PLAN)"""
+    return [row[3] for row in get_conn().execute("EXPLAIN QUERY PLAN " + sql, params)]
+
+
+def check_query_plans(queries=None):
+    """التأكد أن كل استعلام ساخن يستخدم فهرسًا.
+    يرجع قائمة (الاسم, الخطة, سليم؟)"""
+    results = []
+    for name, sql, params, allowed_scans in (queries or HOT_QUERIES):
+        plan = explain(sql, params)
+        ok = True
+        for step in plan:
+            if step.startswith("USE TEMP B-TREE"):
+                ok = False
+            elif step.startswith("SCAN "):
+                table = step.split()[1]
+                # "(subquery-N)" = صفوف co-routine (مثل دوال OVER) وخطواتها الداخلية تُفحص في سطورها
+                ok = ok and (table.startswith("(") or table in allowed_scans)
+        results.append((name, plan, ok))
+    return results
+
+
+def close_thread():
+    """إغلاق اتصال الخيط الحالي فقط (عند انتهاء خيط عامل)"""
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        return
+    _local.conn = None
+    with _lock:
+        if conn in _connections:
+            _connections.remove(conn)
+    conn.close()
+
+
+def close_all():
+    """إغلاق كل الاتصالات المفتوحة (عند الخروج من البرنامج أو تغيير المسار).
+    اتصال خيط آخر يغلقه خيطه عند استخدامه التالي"""
+    global _generation
+    with _lock:
+        _generation += 1
+        conns = list(_connections)
+    for conn in conns:
+        try:
+            conn.close()
+        except sqlite3.ProgrammingError:
+            # اتصال تابع لخيط آخر: يبقى في القائمة حتى يغلقه خيطه
+            continue
+        with _lock:
+            _connections.remove(conn)
+    _local.conn = None
+
+
+if __name__ == "__main__":
+    import sys
+    if len(sys.argv) > 1:
+        configure(sys.argv[1])
+    with transaction() as c:
+        migrate(c)
+    failed = 0
+    for name, plan, ok in check_query_plans():
+        print(("✅ " if ok else "❌ ") + name)
+        for step in plan:
+            print("    " + step)
+        failed += not ok
+    sys.exit(1 if failed else 0)
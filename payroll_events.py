@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+"""ناقل إشعارات التغييرات: عمليات الكتابة تنشر ما تغير، والتبويبات تطبق الفرق فقط بدلًا من إعادة التحميل الكامل"""
+import threading
+from contextlib import contextmanager
+
+EMPLOYEE_ADDED = "employee.added"        # employee_id, name
+EMPLOYEE_RENAMED = "employee.renamed"    # employee_id, name
+EMPLOYEE_DELETED = "employee.deleted"    # employee_id
+AREA_ADDED = "area.added"                # area_id, name
+AREA_DELETED = "area.deleted"            # area_id
+AREA_DEFAULT_SALARY = "area.default_salary"  # area_id, default_salary
+MAPPING_SAVED = "mapping.saved"          # mapping_id, employee_id, area_id, salary, employee, area, replaced_id
+MAPPING_DELETED = "mapping.deleted"      # mapping_id, employee_id, area_id
+SALARY_HISTORY = "salary.history"        # employee_id, area_id, effective_from (تصحيح مرتب فترة سابقة فقط)
+ORDER_ADDED = "order.added"              # order_id, area_id, area, address, created_at
+SALARIES_ADJUSTED = "salaries.adjusted"  # adjustment_id, rows, applied (False = معلقة حتى تاريخ السريان)
+
+# كل الموضوعات (الخادم ينقلها كلها للعملاء)
+TOPICS = (EMPLOYEE_ADDED, EMPLOYEE_RENAMED, EMPLOYEE_DELETED, AREA_ADDED, AREA_DELETED, AREA_DEFAULT_SALARY,
+          MAPPING_SAVED, MAPPING_DELETED, SALARY_HISTORY, ORDER_ADDED, SALARIES_ADJUSTED)
+
+_subscribers = {}
+_dispatcher = None
+_local = threading.local()
+
+
+def subscribe(topic, fn):
+    _subscribers.setdefault(topic, []).append(fn)
+
+
+def unsubscribe(topic, fn):
+    if fn in _subscribers.get(topic, ()):
+        _subscribers[topic].remove(fn)
+
+
+def set_dispatcher(fn):
+    """fn(callback) ينقل الأحداث المنشورة من خيوط أخرى إلى الخيط الرئيسي (حلقة Tk).
+    None = التوصيل المباشر في نفس الخيط"""
+    global _dispatcher
+    _dispatcher = fn
+
+
+@contextmanager
+def capture():
+    """تأجيل ما يُنشر في هذا الخيط: الأحداث تُجمع في القائمة المرجعة (topic, data) بدل توصيلها،
+    لنشرها بعد commit معاملة لم تنته بعد أو حذفها إذا أُلغيت"""
+    previous = getattr(_local, "captured", None)
+    _local.captured = captured = []
+    try:
+        yield captured
+    finally:
+        _local.captured = previous
+
+
+def publish(topic, **data):
+    """إبلاغ كل المشتركين بالتغيير (خطأ مشترك واحد لا يوقف الباقين)"""
+    captured = getattr(_local, "captured", None)
+    if captured is not None:
+        captured.append((topic, data))
+        return
+    if _dispatcher is not None and threading.current_thread() is not threading.main_thread():
+        _dispatcher(lambda: _deliver(topic, data))
+        return
+    _deliver(topic, data)
+
+
+def _deliver(topic, data):
+    for fn in list(_subscribers.get(topic, ())):
+        try:
+            fn(**data)
+        except Exception as e:
+            print(f"خطأ في معالجة الحدث {topic}: {e}")
@@ -0,0 +1,287 @@
+# -*- coding: utf-8 -*-
+"""تصدير سجل الأوردرات (سطر لكل موظف في كل أوردر) لملفات عمودية مضغوطة للتحليل،
+مقسمة بنمط Hive حسب الشهر والمنطقة:
+
+    export/month=2024-05/area_id=3/part-0000000001-000.parquet
+
+تُقرأ المجلد كله بـ pandas.read_parquet أو pyarrow.dataset أو duckdb (hive_partitioning).
+Parquet (zstd) يحتاج pyarrow (اختيارية، ليست في requirements.txt)، وبدونها تُكتب ملفات CSV
+مضغوطة (gzip) بنفس التقسيم مع تنبيه.
+المبالغ أعداد صحيحة بالقرش (÷100 للجنيه).
+
+التصدير تزايدي: رقم آخر أوردر مُصدّر محفوظ في _watermark.json داخل مجلد التصدير،
+وكل تشغيل يصدّر الأوردرات الأحدث منه فقط (--full لإعادة التصدير من البداية).
+
+    python payroll_export.py [--out data/export] [--format parquet|csv] [--full]
+"""
+import os
+import csv
+import sys
+import glob
+import gzip
+import json
+import time
+import shutil
+import argparse
+from array import array
+from datetime import datetime
+from itertools import groupby
+from operator import itemgetter
+
+import payroll_db
+import payroll_profile as profile
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    HAS_ARROW = True
+except ImportError:
+    HAS_ARROW = False
+
+EXPORT_DIR = os.path.join("data", "export")
+WATERMARK_FILE = "_watermark.json"
+# عدد الأوردرات في كل قراءة من القاعدة (الترتيب حسب الشهر/المنطقة داخل الدفعة فقط)
+CHUNK_ORDERS = 5000
+# يُكتب ملف للقسم عند وصوله لهذا العدد من السطور، وكل الأقسام عند تجاوز MAX_BUFFERED
+FILE_ROWS = 250000
+MAX_BUFFERED = 1000000
+COMPRESSION = "zstd"
+
+# الأعمدة بترتيب الاستعلام. الرقمية تُجمع في array('q') وتنتقل لـ Arrow بدون نسخ.
+# month و area_id في اسم المجلد فقط (أعمدة التقسيم)
+COLUMNS = [
+    ("line_id", "int"), ("order_id", "int"), ("created_at", "str"), ("area", "str"),
+    ("address", "str"), ("employee_id", "int"), ("employee", "str"),
+    ("salary", "int"), ("transport", "int"), ("total", "int"),
+]
+_MONTH, _AREA = len(COLUMNS), len(COLUMNS) + 1
+
+EXPORT_SQL = """
+    SELECT oe.id, o.id, o.created_at, a.name, o.address, oe.employee_id, e.name,
+           oe.salary, oe.transport, oe.total, substr(o.created_at, 1, 7), o.area_id
+    FROM orders o
+    JOIN order_employees oe ON oe.order_id = o.id
+    JOIN employees e ON e.id = oe.employee_id
+    JOIN areas a ON a.id = o.area_id
+    WHERE o.id > ? AND o.id <= ?
+    ORDER BY 11, 12, oe.id"""
+
+
+class ExportReport:
+    def __init__(self, since):
+        self.since = since
+        self.until = since
+        self.orders = 0
+        self.rows = 0
+        self.files = []
+        self.seconds = 0.0
+
+    def summary(self):
+        if not self.orders:
+            return f"لا توجد أوردرات جديدة بعد الأوردر رقم {self.since}"
+        rate = self.rows / self.seconds if self.seconds else 0.0
+        return (f"تم تصدير {self.orders:,} أوردر ({self.rows:,} سطر، الأوردرات {self.since + 1}-{self.until}) "
+                f"في {len(self.files)} ملف خلال {self.seconds:.2f} ثانية - {rate:,.0f} سطر/ثانية")
+
+
+class _Columns:
+    """سطور قسم واحد (شهر × منطقة) مخزنة عمودًا عمودًا"""
+    def __init__(self):
+        self.data = [array("q") if kind == "int" else [] for _, kind in COLUMNS]
+        self.rows = 0
+        self.files = 0
+
+    def extend(self, rows):
+        # zip(*rows) يقلب الصفوف لأعمدة، و extend يملأ المصفوفات دفعة واحدة
+        for target, values in zip(self.data, zip(*rows)):
+            target.extend(values)
+        self.rows += len(rows)
+
+    def clear(self):
+        self.data = [array("q") if kind == "int" else [] for _, kind in COLUMNS]
+        self.rows = 0
+
+
+# ============================= Writers =============================
+def _arrow_table(columns):
+    arrays = []
+    for (name, kind), values in zip(COLUMNS, columns.data):
+        if kind == "int":
+            # نفس ذاكرة المصفوفة كـ int64 بدون تحويل كل قيمة على حدة
+            arrays.append(pa.Array.from_buffers(pa.int64(), len(values), [None, pa.py_buffer(values)]))
+        else:
+            arrays.append(pa.array(values, type=pa.string()))
+    return pa.Table.from_arrays(arrays, names=[name for name, _ in COLUMNS])
+
+
+def _write_parquet(columns, path):
+    pq.write_table(_arrow_table(columns), path, compression=COMPRESSION)
+
+
+def _write_csv(columns, path):
+    with gzip.open(path, "wt", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow([name for name, _ in COLUMNS])
+        writer.writerows(zip(*columns.data))
+
+
+WRITERS = {"parquet": (".parquet", _write_parquet), "csv": (".csv.gz", _write_csv)}
+
+
+def _flush(out_dir, key, columns, run, fmt, report):
+    """كتابة سطور القسم لملف جديد (باسم مؤقت ثم إعادة تسمية حتى لا يُقرأ ملف ناقص)"""
+    if not columns.rows:
+        return
+    suffix, write = WRITERS[fmt]
+    month, area_id = key
+    folder = os.path.join(out_dir, f"month={month}", f"area_id={area_id}")
+    os.makedirs(folder, exist_ok=True)
+    path = os.path.join(folder, f"part-{run:010d}-{columns.files:03d}{suffix}")
+    write(columns, path + ".tmp")
+    os.replace(path + ".tmp", path)
+    columns.files += 1
+    columns.clear()
+    report.files.append(path)
+
+
+# ============================= Watermark =============================
+def read_watermark(out_dir):
+    """رقم آخر أوردر مُصدّر إلى out_dir (0 إذا لم يُصدّر شيء، None إذا كانت العلامة تالفة)"""
+    try:
+        with open(os.path.join(out_dir, WATERMARK_FILE), encoding="utf-8") as f:
+            return int(json.load(f)["order_id"])
+    except FileNotFoundError:
+        return 0
+    except (ValueError, KeyError, TypeError):
+        return None
+
+
+def _write_watermark(out_dir, report, fmt):
+    path = os.path.join(out_dir, WATERMARK_FILE)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump({"order_id": report.until, "format": fmt, "rows": report.rows,
+                   "exported_at": datetime.now().isoformat(timespec="seconds")}, f, ensure_ascii=False)
+    os.replace(path + ".tmp", path)
+
+
+def _remove_partial(out_dir, run):
+    """ملفات تشغيل سابق من نفس النقطة توقف قبل حفظ العلامة (ستُكتب من جديد)"""
+    for path in glob.glob(os.path.join(out_dir, "month=*", "area_id=*", f"part-{run:010d}-*")):
+        os.remove(path)
+
+
+def _check_out_dir(out_dir):
+    """out_dir يجب أن يكون مجلد تصدير سابق (فيه العلامة) أو جديدًا أو فيه أقسام تصدير فقط،
+    حتى لا يُكتب في (أو يُحذف من) مجلد آخر مثل data"""
+    if not os.path.isdir(out_dir) or os.path.exists(os.path.join(out_dir, WATERMARK_FILE)):
+        return
+    other = [name for name in os.listdir(out_dir) if not name.startswith(("month=", WATERMARK_FILE))]
+    if other:
+        raise ValueError(f"المجلد {out_dir} ليس مجلد تصدير (لا يوجد {WATERMARK_FILE}) ويحتوي ملفات أخرى، "
+                         "اختر مجلدًا فارغًا")
+
+
+def _clear(out_dir):
+    """حذف ما كتبه التصدير فقط: مجلدات الأقسام والعلامة"""
+    for path in glob.glob(os.path.join(out_dir, "month=*")):
+        shutil.rmtree(path)
+    for path in glob.glob(os.path.join(out_dir, WATERMARK_FILE + "*")):
+        os.remove(path)
+
+
+# ============================= Export =============================
+@profile.timed(name="export_orders")
+def export_orders(out_dir=EXPORT_DIR, fmt=None, full=False, chunk=CHUNK_ORDERS, progress=None):
+    """تصدير الأوردرات الأحدث من العلامة المحفوظة في out_dir. يرجع ExportReport.
+    كل القراءة من لقطة واحدة للقاعدة، والعلامة لا تتقدم إلا بعد كتابة كل الملفات"""
+    if fmt is None and not HAS_ARROW:
+        print("⚠️ مكتبة pyarrow غير مثبتة (pip install pyarrow): التصدير CSV مضغوط بدل Parquet")
+    fmt = fmt or ("parquet" if HAS_ARROW else "csv")
+    if fmt == "parquet" and not HAS_ARROW:
+        raise ValueError("تصدير Parquet يحتاج مكتبة pyarrow (pip install pyarrow) أو استخدم csv")
+    _check_out_dir(out_dir)
+    if not full and read_watermark(out_dir) is None:
+        print(f"⚠️ {WATERMARK_FILE} تالف: إعادة التصدير من البداية")
+        full = True
+    if full:
+        _clear(out_dir)
+    os.makedirs(out_dir, exist_ok=True)
+    since = read_watermark(out_dir)
+    report = ExportReport(since)
+    started = time.perf_counter()
+    _remove_partial(out_dir, since + 1)
+
+    conn = payroll_db.get_conn()
+    conn.execute("BEGIN")
+    try:
+        until = conn.execute("SELECT COALESCE(MAX(id), 0) FROM orders").fetchone()[0]
+        buffers, buffered, low = {}, 0, since
+        while low < until:
+            # نهاية الدفعة: رقم الأوردر رقم chunk بعد low (أو آخر أوردر)
+            high = conn.execute("SELECT id FROM orders WHERE id > ? AND id <= ? ORDER BY id LIMIT 1 OFFSET ?",
+                                (low, until, chunk - 1)).fetchone()
+            high = high[0] if high else until
+            rows = conn.execute(EXPORT_SQL, (low, high)).fetchall()
+            report.orders += conn.execute("SELECT COUNT(*) FROM orders WHERE id > ? AND id <= ?",
+                                          (low, high)).fetchone()[0]
+            # الصفوف مرتبة حسب (الشهر، المنطقة) فكل مجموعة تذهب لقسمها مرة واحدة
+            for key, group in groupby(rows, key=itemgetter(_MONTH, _AREA)):
+                columns = buffers.get(key)
+                if columns is None:
+                    columns = buffers[key] = _Columns()
+                group = list(group)
+                columns.extend(group)
+                buffered += len(group)
+                if columns.rows >= FILE_ROWS:
+                    buffered -= columns.rows
+                    _flush(out_dir, key, columns, since + 1, fmt, report)
+            report.rows += len(rows)
+            if buffered >= MAX_BUFFERED:
+                for key, columns in buffers.items():
+                    _flush(out_dir, key, columns, since + 1, fmt, report)
+                buffered = 0
+            low = high
+            if progress:
+                progress(report)
+        for key, columns in buffers.items():
+            _flush(out_dir, key, columns, since + 1, fmt, report)
+    finally:
+        conn.rollback()
+    report.until = until
+    if until > since:
+        _write_watermark(out_dir, report, fmt)
+    report.seconds = time.perf_counter() - started
+    profile.count("export_rows", report.rows)
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="تصدير سجل الأوردرات لملفات Parquet/CSV مقسمة حسب الشهر والمنطقة")
+    parser.add_argument("--db", help="مسار قاعدة البيانات")
+    parser.add_argument("--out", default=EXPORT_DIR, help="مجلد التصدير")
+    parser.add_argument("--format", choices=sorted(WRITERS), help="الافتراضي parquet إذا كانت pyarrow مثبتة")
+    parser.add_argument("--full", action="store_true", help="حذف أقسام التصدير السابق والتصدير من البداية")
+    parser.add_argument("--chunk", type=int, default=CHUNK_ORDERS, help="عدد الأوردرات في كل قراءة")
+    args = parser.parse_args(argv)
+    if args.db:
+        payroll_db.configure(args.db)
+    if not os.path.exists(payroll_db.DB_PATH):
+        print(f"❌ قاعدة البيانات غير موجودة: {payroll_db.DB_PATH}")
+        return 1
+    profile.configure_from_env()
+    try:
+        report = export_orders(args.out, args.format, args.full, args.chunk,
+                               progress=lambda r: print(f"\r{r.rows:,} سطر...", end="", flush=True))
+    except ValueError as e:
+        print(f"❌ {e}")
+        return 1
+    print("\n" + report.summary())
+    print(f"المجلد: {os.path.abspath(args.out)}")
+    payroll_db.close_all()
+    if profile.enabled:
+        print(profile.summary())
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
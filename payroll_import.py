@@ -0,0 +1,317 @@
+# -*- coding: utf-8 -*-
+"""استيراد أوردرات كثيرة من ملفات CSV أو Excel (ملفات التوزيع) على دفعات.
+
+كل صف = سطر موظف في أوردر، والأعمدة:
+    order      مرجع الأوردر في الملف (الصفوف المتتالية بنفس المرجع = أوردر واحد)
+    area       اسم المنطقة
+    address    العنوان (اختياري)
+    date       التاريخ YYYY-MM-DD أو YYYY-MM-DDTHH:MM (اختياري، الافتراضي الآن)
+    employee   اسم الموظف
+    transport  بدل الانتقالات بالجنيه (اختياري)
+    salary     المرتب بالجنيه (اختياري، الافتراضي مرتب الموظف في المنطقة الساري يوم الأوردر، أو
+               المرتب الافتراضي للمنطقة إذا لم يكن لأحد مرتب فيها يومها، كما في الواجهة)
+
+    python payroll_import.py orders.csv --rejects rejected.csv
+    python payroll_import.py orders.csv --server http://192.168.1.10:8765   (عبر خادم الشبكة)
+"""
+import os
+import csv
+import sys
+import time
+import argparse
+from datetime import datetime, date
+from concurrent.futures import ThreadPoolExecutor
+
+import payroll_db
+import payroll_core as core
+import payroll_events as events
+import payroll_profile as profile
+from payroll_db import transaction
+
+try:
+    import openpyxl
+    HAS_XLSX = True
+except ImportError:
+    HAS_XLSX = False
+
+COLUMNS = ("order", "area", "address", "date", "employee", "transport", "salary")
+
+# عدد سطور الموظفين في كل معاملة
+CHUNK_SIZE = 2000
+# عدد الطلبات المتزامنة عند الاستيراد عبر الخادم (الخادم يجمعها في commits قليلة)
+CONNECTIONS = 8
+
+
+class ImportReport:
+    """نتيجة الاستيراد: الأعداد والصفوف المرفوضة (رقم الصف, السبب, الصف)"""
+    def __init__(self):
+        self.orders = 0
+        self.lines = 0
+        self.rejected = []
+        self.seconds = 0.0
+
+    @property
+    def lines_per_second(self):
+        return self.lines / self.seconds if self.seconds else 0.0
+
+    def summary(self):
+        return (f"تم استيراد {self.orders} أوردر ({self.lines} سطر) في {self.seconds:.2f} ثانية "
+                f"- {self.lines_per_second:,.0f} سطر/ثانية - مرفوض {len(self.rejected)} صف")
+
+
+# ============================= Readers =============================
+def read_rows(path):
+    """قراءة الملف صفًا بصف (بدون تحميله كله): يرجع (رقم الصف, dict)"""
+    if path.lower().endswith((".xlsx", ".xlsm")):
+        return _read_xlsx(path)
+    return _read_csv(path)
+
+def _read_csv(path):
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        for line_no, row in enumerate(csv.DictReader(f), start=2):
+            yield line_no, {k.strip().lower(): (v or "").strip() for k, v in row.items() if k}
+
+def _read_xlsx(path):
+    if not HAS_XLSX:
+        raise RuntimeError("مكتبة openpyxl غير مثبتة - لا يمكن قراءة ملفات Excel")
+    wb = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = wb.active.iter_rows(values_only=True)
+        header = [str(h or "").strip().lower() for h in next(rows, ())]
+        for line_no, values in enumerate(rows, start=2):
+            yield line_no, {k: _cell_text(v) for k, v in zip(header, values) if k}
+    finally:
+        wb.close()
+
+def _cell_text(value):
+    if value is None:
+        return ""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, date):
+        return value.isoformat()
+    return str(value).strip()
+
+
+# ============================= Validation =============================
+def _parse_amount(text, default=None):
+    """مبلغ بالجنيه من الملف إلى قروش"""
+    if not text:
+        return default
+    value = core.to_piastres(text)
+    if value < 0:
+        raise ValueError
+    return value
+
+def _parse_created_at(text):
+    if not text:
+        return datetime.now().isoformat()
+    return datetime.fromisoformat(text).isoformat()
+
+
+class _Lookups:
+    """خرائط الأسماء والرواتب في الذاكرة لتجنب استعلام لكل صف (api = payroll_core أو عميل الخادم)"""
+    def __init__(self, api=core):
+        self.employees = {name: emp_id for emp_id, name in api.list_employees()}
+        self.areas = {name: area_id for area_id, name in api.list_areas()}
+        # مرتب كل سطر = المرتب الساري يوم الأوردر بنفس قاعدة الواجهة (انظر core.SalaryHistory)
+        self.salaries = core.SalaryHistory(api.salary_history())
+        self.api = api
+        self.defaults = {}
+
+    def default_salary(self, area_id):
+        if area_id not in self.defaults:
+            self.defaults[area_id] = self.api.area_default_salary(area_id)
+        return self.defaults[area_id]
+
+    def salary(self, emp_id, area_id, day):
+        return self.salaries.rate(emp_id, area_id, day, self.default_salary)
+
+
+def _validate_order(rows, lookups):
+    """التحقق من صفوف أوردر واحد. يرجع (الأوردر, السطور, المرفوض)"""
+    first = rows[0][1]
+    rejected = []
+    area_id = lookups.areas.get(first.get("area", ""))
+    try:
+        created_at = _parse_created_at(first.get("date", ""))
+    except ValueError:
+        created_at = None
+    lines = []
+    for line_no, row in rows:
+        if area_id is None:
+            rejected.append((line_no, f"منطقة غير معروفة: {first.get('area', '')}", row))
+            continue
+        if created_at is None:
+            rejected.append((line_no, f"تاريخ غير صالح: {first.get('date', '')}", row))
+            continue
+        if row.get("area", "") != first.get("area", ""):
+            rejected.append((line_no, "منطقة مختلفة داخل نفس الأوردر", row))
+            continue
+        emp_id = lookups.employees.get(row.get("employee", ""))
+        if emp_id is None:
+            rejected.append((line_no, f"موظف غير معروف: {row.get('employee', '')}", row))
+            continue
+        try:
+            transport = _parse_amount(row.get("transport", ""), 0)
+            salary = _parse_amount(row.get("salary", ""))
+        except ValueError:
+            rejected.append((line_no, "مبلغ غير صالح", row))
+            continue
+        if salary is None:
+            # خانة المرتب الفارغة = المرتب الساري يوم الأوردر
+            salary = lookups.salary(emp_id, area_id, created_at)
+        if salary is None:
+            rejected.append((line_no, "لا يوجد مرتب للموظف في هذه المنطقة يوم الأوردر", row))
+            continue
+        lines.append((emp_id, salary, transport, core.line_total(salary, transport)))
+    order = (area_id, first.get("address", ""), created_at)
+    return order, lines, rejected
+
+
+# ============================= Import =============================
+def _group_orders(rows, report):
+    """تجميع الصفوف المتتالية بنفس مرجع الأوردر"""
+    current_key, current = None, []
+    seen = set()
+    for line_no, row in rows:
+        key = row.get("order", "")
+        if not key:
+            report.rejected.append((line_no, "مرجع الأوردر فارغ", row))
+            continue
+        if key != current_key:
+            if current:
+                yield current
+            if key in seen:
+                report.rejected.append((line_no, f"مرجع أوردر مكرر في الملف: {key}", row))
+                current_key, current = None, []
+                continue
+            seen.add(key)
+            current_key, current = key, []
+        current.append((line_no, row))
+    if current:
+        yield current
+
+
+def _flush(orders, report, area_names):
+    """كتابة دفعة أوردرات في معاملة واحدة بـ executemany"""
+    if not orders:
+        return
+    with transaction() as c:
+        c.execute("SELECT MAX(COALESCE((SELECT seq FROM sqlite_sequence WHERE name='orders'), 0), "
+                  "COALESCE((SELECT MAX(id) FROM orders), 0))")
+        next_id = c.fetchone()[0] + 1
+        order_rows, line_rows = [], []
+        for offset, (order, lines, _) in enumerate(orders):
+            order_id = next_id + offset
+            order_rows.append((order_id,) + order)
+            line_rows.extend((order_id,) + line for line in lines)
+        c.executemany("INSERT INTO orders(id,area_id,address,created_at) VALUES(?,?,?,?)", order_rows)
+        c.executemany("INSERT INTO order_employees(order_id,employee_id,salary,transport,total) VALUES(?,?,?,?,?)", line_rows)
+    report.orders += len(order_rows)
+    report.lines += len(line_rows)
+    for order_id, area_id, address, created_at in order_rows:
+        events.publish(events.ORDER_ADDED, order_id=order_id, area_id=area_id, area=area_names[area_id],
+                       address=address, created_at=created_at)
+
+
+def _send(orders, report, client, pool):
+    """إرسال دفعة أوردرات للخادم على عدة اتصالات متوازية؛ كل أوردر يُحسب بعد إقرار الخادم بحفظه،
+    والأوردر الذي يرفضه الخادم تُسجل صفوفه في المرفوض"""
+    futures = []
+    for (area_id, address, created_at), lines, rows in orders:
+        items = [{'id': emp_id, 'salary': salary, 'transport': transport} for emp_id, salary, transport, _ in lines]
+        futures.append((lines, rows, pool.submit(client.create_order, area_id, address, items, created_at)))
+    for lines, rows, future in futures:
+        try:
+            future.result()
+        except Exception as e:
+            report.rejected.extend((line_no, f"رفضه الخادم: {e}", row) for line_no, row in rows)
+            continue
+        report.orders += 1
+        report.lines += len(lines)
+
+
+def import_orders(path, chunk_size=CHUNK_SIZE, progress=None, client=None, connections=CONNECTIONS):
+    """استيراد ملف أوردرات. الأوردر الذي به أي صف غير صالح يُرفض كله.
+    progress(report) يُستدعى بعد كل دفعة. client = payroll_client.Client للاستيراد عبر الخادم"""
+    report = ImportReport()
+    started = time.perf_counter()
+    lookups = _Lookups(client or core)
+    area_names = {area_id: name for name, area_id in lookups.areas.items()}
+    if client is None:
+        flush = lambda orders: _flush(orders, report, area_names)
+    else:
+        pool = ThreadPoolExecutor(connections, thread_name_prefix="import")
+        flush = lambda orders: _send(orders, report, client, pool)
+    pending, pending_lines = [], 0
+    for rows in _group_orders(read_rows(path), report):
+        order, lines, rejected = _validate_order(rows, lookups)
+        if rejected:
+            bad = {line_no for line_no, _, _ in rejected}
+            report.rejected.extend(rejected)
+            report.rejected.extend((line_no, "رُفض مع باقي الأوردر", row)
+                                   for line_no, row in rows if line_no not in bad)
+            continue
+        pending.append((order, lines, rows))
+        pending_lines += len(lines)
+        if pending_lines >= chunk_size:
+            flush(pending)
+            pending, pending_lines = [], 0
+            if progress:
+                progress(report)
+    flush(pending)
+    if client is not None:
+        pool.shutdown()
+    report.rejected.sort(key=lambda r: r[0])
+    report.seconds = time.perf_counter() - started
+    return report
+
+
+def write_rejects(report, path):
+    with open(path, "w", newline="", encoding="utf-8-sig") as f:
+        writer = csv.writer(f)
+        writer.writerow(("line", "reason") + COLUMNS)
+        for line_no, reason, row in report.rejected:
+            writer.writerow((line_no, reason) + tuple(row.get(col, "") for col in COLUMNS))
+
+
+# ============================= CLI =============================
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="استيراد أوردرات من CSV/Excel")
+    parser.add_argument("path")
+    parser.add_argument("--db", help="مسار قاعدة البيانات")
+    parser.add_argument("--chunk", type=int, default=CHUNK_SIZE, help="عدد السطور في كل معاملة")
+    parser.add_argument("--rejects", help="حفظ الصفوف المرفوضة في ملف CSV")
+    parser.add_argument("--server", help="عنوان خادم الشبكة بدل القاعدة المحلية")
+    parser.add_argument("--connections", type=int, default=CONNECTIONS, help="الطلبات المتزامنة مع الخادم")
+    args = parser.parse_args(argv)
+    if not os.path.exists(args.path):
+        print(f"❌ الملف غير موجود: {args.path}")
+        return 1
+    if args.db:
+        payroll_db.configure(args.db)
+    profile.configure_from_env()
+    client = None
+    if args.server:
+        import payroll_client
+        client = payroll_client.Client(args.server, os.environ.get(payroll_client.TOKEN_ENV))
+    else:
+        core.ensure_dirs()
+        core.init_db()
+    report = import_orders(args.path, args.chunk,
+                           progress=lambda r: print(f"\r{r.lines} سطر...", end="", flush=True),
+                           client=client, connections=args.connections)
+    print("\n" + report.summary())
+    for line_no, reason, _ in report.rejected[:20]:
+        print(f"  صف {line_no}: {reason}")
+    if args.rejects and report.rejected:
+        write_rejects(report, args.rejects)
+        print(f"الصفوف المرفوضة في: {args.rejects}")
+    payroll_db.close_all()
+    if profile.enabled:
+        print(profile.summary())
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,494 @@
+# -*- coding: utf-8 -*-
+"""تصدير تقارير PDF مع دعم العربية، وتصدير دفعات كبيرة من الأوردرات على عدة عمليات"""
+import os
+import re
+import sys
+import json
+import time
+import platform
+import functools
+import argparse
+from datetime import date
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import payroll_db
+import payroll_core as core
+import payroll_profile as profile
+from payroll_core import REPORTS_DIR
+from payroll_db import query
+
+# =====[ PDF Export with Arabic Support ]=====
+try:
+    from reportlab.lib.pagesizes import A4
+    from reportlab.pdfgen import canvas
+    from reportlab.lib import colors
+    from reportlab.lib.units import cm
+    from reportlab.pdfbase import pdfmetrics
+    from reportlab.pdfbase.ttfonts import TTFont
+    from reportlab.pdfbase.cidfonts import UnicodeCIDFont
+    HAS_PDF = True
+    
+    # محاولة استيراد مكتبات معالجة النص العربي
+    try:
+        import arabic_reshaper
+        from bidi.algorithm import get_display
+        HAS_ARABIC_SUPPORT = True
+        print("✅ تم تحميل مكتبات دعم العربية بنجاح")
+    except ImportError:
+        HAS_ARABIC_SUPPORT = False
+        print("⚠️ مكتبات دعم العربية غير متوفرة - سيتم استخدام التحويل اليدوي")
+        
+except Exception:
+    HAS_PDF = False
+    HAS_ARABIC_SUPPORT = False
+
+# ============================= Fonts =============================
+# الخط المختار يُحفظ هنا حتى لا نبحث عن الخطوط مع كل تشغيل
+FONT_CONFIG = os.path.join("data", "font.json")
+# مسار صريح للخط (له الأولوية)، مثلًا على أجهزة بدون خطوط عربية
+FONT_ENV_VAR = "PAYROLL_FONT"
+
+def _resource_dir():
+    # داخل ملف PyInstaller التنفيذي تُفك الملفات المرفقة في sys._MEIPASS
+    return getattr(sys, "_MEIPASS", os.path.dirname(os.path.abspath(__file__)))
+
+# الخط المرفق مع البرنامج (انظر datas في payroll_system.spec)
+BUNDLED_FONT = os.path.join(_resource_dir(), "fonts", "NotoSansArabic-Regular.ttf")
+
+_registered_font = None
+
+def _system_fonts():
+    system = platform.system()
+    
+    if system == "Windows":
+        # خطوط تدعم العربية بشكل أفضل في Windows
+        return [
+            "C:/Windows/Fonts/arial.ttf",
+            "C:/Windows/Fonts/tahoma.ttf",
+            "C:/Windows/Fonts/calibri.ttf",
+            "C:/Windows/Fonts/segoeui.ttf",
+            "C:/Windows/Fonts/times.ttf"
+        ]
+    elif system == "Linux":
+        # خطوط تدعم العربية بشكل أفضل في Linux
+        return [
+            "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf",
+            "/usr/share/fonts/truetype/liberation/LiberationSans-Regular.ttf",
+            "/usr/share/fonts/TTF/DejaVuSans.ttf",
+            "/usr/share/fonts/truetype/noto/NotoSansArabic-Regular.ttf",
+            "/usr/share/fonts/truetype/noto/NotoNastaliqUrdu-Regular.ttf"
+        ]
+    else:  # macOS
+        return [
+            "/System/Library/Fonts/Arial.ttf",
+            "/System/Library/Fonts/Helvetica.ttf",
+            "/Library/Fonts/Arial.ttf"
+        ]
+
+def _load_font_config():
+    try:
+        with open(FONT_CONFIG, encoding="utf-8") as f:
+            return json.load(f).get("path")
+    except (OSError, ValueError):
+        return None
+
+def _save_font_config(font_path):
+    try:
+        os.makedirs(os.path.dirname(FONT_CONFIG), exist_ok=True)
+        with open(FONT_CONFIG, "w", encoding="utf-8") as f:
+            json.dump({"path": font_path}, f, ensure_ascii=False)
+    except OSError as e:
+        print(f"⚠️ تعذر حفظ إعداد الخط: {e}")
+
+def font_candidates():
+    """ترتيب البحث: المتغير PAYROLL_FONT ثم الخط المرفق ثم المحفوظ ثم خطوط النظام"""
+    candidates = [os.environ.get(FONT_ENV_VAR), BUNDLED_FONT, _load_font_config()] + _system_fonts()
+    return [path for path in candidates if path]
+
+def register_arabic_font():
+    """تسجيل خط عربي يدعمه reportlab مرة واحدة لكل عملية"""
+    global _registered_font
+    if _registered_font is not None:
+        return _registered_font
+    try:
+        saved = _load_font_config()
+        for font_path in font_candidates():
+            if os.path.exists(font_path):
+                try:
+                    # تسجيل الخط مع اسم مخصص
+                    pdfmetrics.registerFont(TTFont('ArabicFont', font_path))
+                    print(f"✅ تم تسجيل الخط العربي: {font_path}")
+                    if font_path != saved:
+                        _save_font_config(font_path)
+                    _registered_font = 'ArabicFont'
+                    return _registered_font
+                except Exception as e:
+                    print(f"❌ فشل تسجيل الخط {font_path}: {e}")
+                    continue
+        
+        # إذا لم يتم العثور على خط عربي، استخدم الخط الافتراضي
+        print("⚠️ لم يتم العثور على خط عربي، استخدام الخط الافتراضي")
+        _registered_font = 'Helvetica'
+        return _registered_font
+            
+    except Exception as e:
+        print(f"❌ خطأ في تسجيل الخط العربي: {e}")
+        return 'Helvetica'
+
+# عدد النصوص المعالجة المحفوظة (أسماء الموظفين والعناوين تتكرر في كل التقارير)
+SHAPING_CACHE_SIZE = 4096
+
+_ARABIC_RE = re.compile('[\u0600-\u06FF]')
+
+def process_arabic_text(text):
+    """معالجة النص العربي لعرضه بشكل صحيح في PDF"""
+    if not isinstance(text, str):
+        text = str(text)
+    return _shape_text(text)
+
+@functools.lru_cache(maxsize=SHAPING_CACHE_SIZE)
+def _shape_text(text):
+    try:
+        # التحقق من وجود نص عربي
+        has_arabic = _ARABIC_RE.search(text) is not None
+        
+        if has_arabic and HAS_ARABIC_SUPPORT:
+            # استخدام مكتبات معالجة النص العربي
+            try:
+                reshaped_text = arabic_reshaper.reshape(text)
+                bidi_text = get_display(reshaped_text)
+                return bidi_text
+            except Exception as e:
+                print(f"خطأ في معالجة النص العربي بالمكتبات: {e}")
+                return transliterate_arabic(text)
+        elif has_arabic:
+            # استخدام التحويل اليدوي
+            return transliterate_arabic(text)
+        else:
+            return text
+            
+    except Exception as e:
+        print(f"خطأ في معالجة النص: {e}")
+        return text
+
+def shaping_cache_stats():
+    """إحصائيات ذاكرة المعالجة: (hits, misses, maxsize, currsize)"""
+    return _shape_text.cache_info()
+
+def clear_shaping_cache():
+    _shape_text.cache_clear()
+
+# أسماء شائعة - الأولوية للأسماء الكاملة
+COMMON_NAMES = {
+    'أحمد': 'Ahmed',
+    'محمد': 'Mohamed', 
+    'خالد': 'Khaled',
+    'محمود': 'Mahmoud',
+    'سارة': 'Sara',
+    'الغردقة': 'Hurghada',
+    'القاهرة': 'Cairo',
+    'الإسكندرية': 'Alexandria',
+    'المرتب': 'Salary',
+    'بدل الانتقالات': 'Transport',
+    'الإجمالي': 'Total',
+    'الموظف': 'Employee',
+    'المنطقة': 'Area',
+    'العنوان': 'Address',
+    'التاريخ': 'Date',
+    'تقرير الأوردر رقم': 'Order Report #',
+    'إجمالي المبلغ': 'Total Amount',
+    'جنيه مصري': 'EGP'
+}
+
+# كل الأسماء الشائعة في تعبير واحد (الأطول أولًا) بدلًا من replace لكل اسم
+_COMMON_NAMES_RE = re.compile("|".join(re.escape(name) for name in sorted(COMMON_NAMES, key=len, reverse=True)))
+
+# التحويل حرف بحرف للكلمات المتبقية
+_ARABIC_TO_LATIN = str.maketrans({
+    'أ': 'A', 'ا': 'A', 'ب': 'B', 'ت': 'T', 'ث': 'Th', 'ج': 'J', 'ح': 'H', 'خ': 'Kh',
+    'د': 'D', 'ذ': 'Th', 'ر': 'R', 'ز': 'Z', 'س': 'S', 'ش': 'Sh', 'ص': 'S',
+    'ض': 'D', 'ط': 'T', 'ظ': 'Z', 'ع': 'A', 'غ': 'Gh', 'ف': 'F', 'ق': 'Q',
+    'ك': 'K', 'ل': 'L', 'م': 'M', 'ن': 'N', 'ه': 'H', 'و': 'W', 'ي': 'Y',
+    'ة': 'h', 'ى': 'a', 'ئ': 'Y', 'ء': 'A', 'ؤ': 'W'
+})
+
+def transliterate_arabic(text):
+    """تحويل النص العربي لأحرف لاتينية"""
+    # البحث عن الأسماء الشائعة أولاً
+    if text in COMMON_NAMES:
+        return COMMON_NAMES[text]
+    
+    # الكلمات المركبة ثم باقي الحروف
+    text = _COMMON_NAMES_RE.sub(lambda m: COMMON_NAMES[m.group(0)], text)
+    return text.translate(_ARABIC_TO_LATIN)
+
+def draw_arabic_text(canvas, text, x, y, font_name, font_size, current=None):
+    """رسم نص عربي مع تحسين الاتجاه. current = (الخط, الحجم) المحدد حاليًا على الصفحة إن كان
+    المستدعي يتتبعه، فلا يُعاد تحديده. يرجع (الخط, الحجم) المحدد بعد الرسم"""
+    try:
+        if current != (font_name, font_size):
+            try:
+                canvas.setFont(font_name, font_size)
+            except:
+                canvas.setFont('Helvetica', font_size)
+                font_name = 'Helvetica'
+        
+        # معالجة النص العربي
+        processed_text = process_arabic_text(text)
+        
+        # رسم النص
+        canvas.drawString(x, y, processed_text)
+        return font_name, font_size
+            
+    except Exception as e:
+        print(f"خطأ في رسم النص: {e}")
+        # استخدام الخط الافتراضي كبديل
+        try:
+            canvas.setFont('Helvetica', font_size)
+            canvas.drawString(x, y, str(text))
+            return 'Helvetica', font_size
+        except:
+            canvas.setFont('Helvetica', 12)
+            canvas.drawString(x, y, "Text Error")
+            return 'Helvetica', 12
+
+# ============================= Report writer =============================
+# عدد الصفوف المقروءة من الـ cursor في كل مرة
+ROW_CHUNK = 500
+
+class ReportWriter:
+    """كاتب تقرير جدولي متعدد الصفحات: الصفوف تُرسم فور قراءتها ولا تُجمع في قائمة،
+    ورؤوس الأعمدة تتكرر في كل صفحة مع مجموع الصفحة أسفلها.
+    الذاكرة ليست ثابتة: reportlab يحتفظ بالصفحات المنتهية (مضغوطة) حتى save، فتكبر مع عدد الصفحات.
+    columns: [(العنوان, x بالسنتيمتر)]، total_columns: مواضع أعمدة المبالغ (بالقرش) التي تُجمع"""
+    def __init__(self, fname, title, columns, total_columns=(), info=(), font_name=None):
+        self.fname = fname
+        self.title = title
+        self.columns = columns
+        self.total_columns = tuple(total_columns)
+        self.info = info
+        self.font = font_name or register_arabic_font()
+        # الصفحات المنتهية تُضغط فورًا حتى لا يكبر حجمها في الذاكرة حتى الحفظ
+        self.canvas = canvas.Canvas(fname, pagesize=A4, pageCompression=1)
+        self.top = 27*cm
+        self.bottom = 3.5*cm
+        self.row_height = 0.6*cm
+        self.page = 0
+        self.rows = 0
+        self.grand_totals = {i: 0 for i in self.total_columns}
+        self._start_page()
+
+    def _text(self, text, x, y, size):
+        self.current_font = draw_arabic_text(self.canvas, text, x, y, self.font, size, self.current_font)
+
+    def _start_page(self):
+        self.page += 1
+        # كل صفحة جديدة تبدأ بدون خط محدد
+        self.current_font = None
+        self.page_totals = {i: 0 for i in self.total_columns}
+        y = self.top
+        if self.page == 1:
+            self._text(self.title, 2*cm, y, 16)
+            y -= 1*cm
+            for line in self.info:
+                self._text(line, 2*cm, y, 12)
+                y -= 0.8*cm
+            y -= 0.4*cm
+        else:
+            self._text(f"{self.title} (تابع)", 2*cm, y, 11)
+            y -= 1*cm
+        for header, x in self.columns:
+            self._text(header, x*cm, y, 11)
+        y -= 0.8*cm
+        self.canvas.line(self.columns[0][1]*cm, y + 0.2*cm, 19*cm, y + 0.2*cm)
+        self.y = y - 0.5*cm
+
+    def _end_page(self):
+        y = self.y - 0.3*cm
+        if self.total_columns:
+            self.canvas.line(self.columns[0][1]*cm, y, 19*cm, y)
+            y -= 0.6*cm
+            self._text("مجموع الصفحة", self.columns[0][1]*cm, y, 10)
+            for i in self.total_columns:
+                self._text(core.format_money(self.page_totals[i]), self.columns[i][1]*cm, y, 10)
+        self._text(f"صفحة {self.page}", 10*cm, 1*cm, 9)
+        self.y = y
+
+    def add_row(self, row):
+        if self.y < self.bottom:
+            self._end_page()
+            self.canvas.showPage()
+            self._start_page()
+        for i, ((_, x), value) in enumerate(zip(self.columns, row)):
+            text = core.format_money(value) if i in self.total_columns else str(value)
+            self._text(text, x*cm, self.y, 10)
+        for i in self.total_columns:
+            self.page_totals[i] += row[i]
+            self.grand_totals[i] += row[i]
+        self.y -= self.row_height
+        self.rows += 1
+
+    def write_rows(self, cursor, progress=None):
+        """رسم كل صفوف الـ cursor على دفعات. progress(عدد الصفوف) بعد كل دفعة"""
+        while True:
+            rows = cursor.fetchmany(ROW_CHUNK)
+            if not rows:
+                break
+            for row in rows:
+                self.add_row(row)
+            if progress:
+                progress(self.rows)
+
+    def close(self, total_label="إجمالي المبلغ", total=None):
+        """مجموع آخر صفحة ثم الإجمالي الكلي (total إن حُسب في القاعدة) وحفظ الملف"""
+        self._end_page()
+        if self.total_columns:
+            if total is None:
+                total = self.grand_totals[self.total_columns[-1]]
+            self._text(f"{total_label}: {core.format_money(total)} جنيه مصري", 12*cm, self.y - 0.9*cm, 12)
+        self.canvas.save()
+        profile.count("pdf_pages", self.page)
+        profile.count("pdf_rows", self.rows)
+        return self.fname
+
+# ============================= Order report =============================
+ORDER_COLUMNS = [("الموظف", 2), ("المرتب", 6), ("بدل الانتقالات", 11), ("الإجمالي", 15)]
+
+@profile.timed
+def render_order_pdf(order_id, font_name=None):
+    """رسم تقرير أوردر واحد إلى ملف PDF وإرجاع اسم الملف"""
+    report = core.order_report(order_id)
+    if report is None:
+        raise ValueError(f"الأوردر {order_id} غير موجود")
+    (area, address, dt), totals, lines = report
+    info = [f"المنطقة: {area}"] + ([f"العنوان: {address}"] if address else []) + [f"التاريخ: {dt}"]
+    writer = ReportWriter(f"{REPORTS_DIR}/Order_{order_id}.pdf", f"تقرير الأوردر رقم {order_id}",
+                          ORDER_COLUMNS, total_columns=(1, 2, 3), info=info, font_name=font_name)
+    for row in lines:
+        writer.add_row(row)
+    return writer.close(total=totals[2])
+
+# ============================= Period statement =============================
+PERIOD_COLUMNS = [("التاريخ", 1.2), ("الأوردر", 3.6), ("الموظف", 5.2), ("المنطقة", 8.6),
+                  ("المرتب", 11.6), ("الانتقالات", 14), ("الإجمالي", 16.6)]
+
+@profile.timed
+def render_period_pdf(date_from=None, date_to=None, area_id=None, employee_id=None,
+                      fname=None, font_name=None, progress=None):
+    """كشف كل سطور الأوردرات في فترة (مثل كشف شهري) في ملف واحد مهما كان عدد السطور.
+    يرجع (اسم الملف, عدد السطور)"""
+    period = f"{date_from or '...'} - {date_to or '...'}"
+    fname = fname or f"{REPORTS_DIR}/Statement_{date_from or 'start'}_{date_to or 'end'}.pdf"
+    info = [f"الفترة: {period}"]
+    if area_id is not None:
+        info.append(f"المنطقة: {query('SELECT name FROM areas WHERE id=?', (area_id,))[0][0]}")
+    if employee_id is not None:
+        info.append(f"الموظف: {query('SELECT name FROM employees WHERE id=?', (employee_id,))[0][0]}")
+    writer = ReportWriter(fname, "كشف المرتبات", PERIOD_COLUMNS, total_columns=(4, 5, 6),
+                          info=info, font_name=font_name)
+    writer.write_rows(core.period_lines(date_from, date_to, area_id, employee_id), progress)
+    return writer.close(), writer.rows
+
+# ============================= Batch export =============================
+# عدد الأوردرات في كل مهمة ترسل لعملية فرعية
+BATCH_CHUNK = 25
+
+_worker_font = None
+
+def select_order_ids(id_from=None, id_to=None, date_from=None, date_to=None):
+    """أرقام الأوردرات داخل نطاق أرقام و/أو فترة زمنية"""
+    conds, params = [], []
+    if id_from is not None:
+        conds.append("id>=?")
+        params.append(id_from)
+    if id_to is not None:
+        conds.append("id<=?")
+        params.append(id_to)
+    if date_from:
+        conds.append("created_at>=?")
+        params.append(date_from.isoformat())
+    if date_to:
+        conds.append("created_at<?")
+        params.append(date.fromordinal(date_to.toordinal() + 1).isoformat())
+    where = " WHERE " + " AND ".join(conds) if conds else ""
+    return [row[0] for row in query(f"SELECT id FROM orders{where} ORDER BY id", params)]
+
+def _init_worker(db_path):
+    global _worker_font
+    payroll_db.configure(db_path)
+    _worker_font = register_arabic_font()
+
+def _render_chunk(order_ids):
+    results = []
+    for order_id in order_ids:
+        try:
+            results.append((order_id, render_order_pdf(order_id, _worker_font), None))
+        except Exception as e:
+            results.append((order_id, None, str(e)))
+    return results
+
+def export_orders(order_ids, workers=None, progress=None, cancelled=None):
+    """تصدير عدة أوردرات بالتوازي على عدة عمليات (القاعدة مرحلة مسبقًا من نقطة التشغيل: core.init_db).
+    progress(done, total) يُستدعى بعد كل دفعة، و cancelled (threading.Event) يوقف الباقي.
+    يرجع قائمة (رقم الأوردر, اسم الملف, الخطأ)"""
+    results = []
+    if not order_ids:
+        return results
+    os.makedirs(REPORTS_DIR, exist_ok=True)
+    chunks = [order_ids[i:i + BATCH_CHUNK] for i in range(0, len(order_ids), BATCH_CHUNK)]
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(os.path.abspath(payroll_db.DB_PATH),)) as pool:
+        futures = [pool.submit(_render_chunk, chunk) for chunk in chunks]
+        for future in as_completed(futures):
+            if future.cancelled():
+                continue
+            results.extend(future.result())
+            if progress:
+                progress(len(results), len(order_ids))
+            if cancelled is not None and cancelled.is_set():
+                for f in futures:
+                    f.cancel()
+                break
+    return results
+
+# ============================= CLI =============================
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="تصدير تقارير الأوردرات PDF دفعة واحدة")
+    parser.add_argument("--db", help="مسار قاعدة البيانات")
+    parser.add_argument("--from-id", type=int)
+    parser.add_argument("--to-id", type=int)
+    parser.add_argument("--from-date", type=date.fromisoformat)
+    parser.add_argument("--to-date", type=date.fromisoformat)
+    parser.add_argument("--workers", type=int, help="عدد العمليات (الافتراضي عدد المعالجات)")
+    parser.add_argument("--statement", action="store_true", help="كشف واحد لكل سطور الفترة بدل ملف لكل أوردر")
+    parser.add_argument("--area-id", type=int, help="للكشف: منطقة واحدة")
+    parser.add_argument("--employee-id", type=int, help="للكشف: موظف واحد")
+    args = parser.parse_args(argv)
+    if not HAS_PDF:
+        print("❌ مكتبة reportlab غير مثبتة")
+        return 1
+    if args.db:
+        payroll_db.configure(args.db)
+    # الترحيل مرة واحدة لكل المسارات، وقبل العمليات الفرعية (التي تقرأ فقط) حتى تعمل على قاعدة قديمة
+    core.ensure_dirs()
+    core.init_db()
+    if args.statement:
+        started = time.perf_counter()
+        fname, rows = render_period_pdf(args.from_date, args.to_date, args.area_id, args.employee_id,
+                                        progress=lambda n: print(f"\r{n} سطر", end="", flush=True))
+        print(f"\nتم حفظ {fname} ({rows} سطر) في {time.perf_counter() - started:.1f} ثانية")
+        return 0
+    order_ids = select_order_ids(args.from_id, args.to_id, args.from_date, args.to_date)
+    print(f"تصدير {len(order_ids)} أوردر إلى {REPORTS_DIR}...")
+    started = time.perf_counter()
+    results = export_orders(order_ids, args.workers,
+                            progress=lambda done, total: print(f"\r{done}/{total}", end="", flush=True))
+    elapsed = time.perf_counter() - started
+    failed = [r for r in results if r[2]]
+    print(f"\nتم تصدير {len(results) - len(failed)} ملف في {elapsed:.1f} ثانية")
+    for order_id, _, error in failed:
+        print(f"❌ الأوردر {order_id}: {error}")
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,261 @@
+# -*- coding: utf-8 -*-
+"""قياس الأداء عند الطلب: أزمنة الدوال الساخنة، سجل الاستعلامات البطيئة، عدادات الصفوف،
+و cProfile اختياري. معطل افتراضيًا وتكلفته عندها فحص متغير واحد.
+
+    PAYROLL_PROFILE=1 python payroll_system.py          أزمنة + سجل الاستعلامات البطيئة
+    PAYROLL_PROFILE=cprofile python payroll_system.py   + ملف pstats لكل الخيوط عند الخروج
+    PAYROLL_SLOW_MS=50                                  حد الاستعلام البطيء بالمللي ثانية
+"""
+import os
+import sys
+import time
+import functools
+import threading
+from collections import deque
+from datetime import datetime
+
+ENV = "PAYROLL_PROFILE"
+SLOW_ENV = "PAYROLL_SLOW_MS"
+SLOW_MS = 100
+SLOW_LOG = os.path.join("data", "slow_queries.log")
+STATS_FILE = os.path.join("data", "profile.pstats")
+# عدد الاستعلامات البطيئة المعروضة في الملخص
+SLOW_KEEP = 20
+
+enabled = False
+slow_ms = SLOW_MS
+use_cprofile = False
+
+_lock = threading.Lock()
+_local = threading.local()
+_timings = {}          # الاسم -> [عدد المرات, الزمن الكلي, أقصى زمن]
+_counters = {}
+_slow = deque(maxlen=SLOW_KEEP)
+_profilers = {}        # رقم الخيط -> cProfile.Profile
+_snapshots = {}        # اسم الخيط -> إحصائيات آخر لقطة
+
+
+def enable(slow=None, cprofile=False):
+    """تشغيل القياس. cprofile يبدأ cProfile في الخيط الحالي وكل خيط يستدعي start_thread_profiler"""
+    global enabled, slow_ms, use_cprofile
+    enabled = True
+    if slow is not None:
+        slow_ms = slow
+    use_cprofile = use_cprofile or cprofile
+    start_thread_profiler()
+
+
+def configure_from_env():
+    """تشغيل القياس إذا طُلب بمتغير البيئة. يرجع True إذا تم تشغيله"""
+    mode = os.environ.get(ENV, "").strip().lower()
+    if mode in ("", "0"):
+        return False
+    enable(float(os.environ.get(SLOW_ENV, SLOW_MS)), cprofile=mode == "cprofile")
+    return True
+
+
+def reset():
+    with _lock:
+        _timings.clear()
+        _counters.clear()
+        _slow.clear()
+
+
+# ============================= Timings & counters =============================
+def record(name, seconds):
+    with _lock:
+        entry = _timings.get(name)
+        if entry is None:
+            _timings[name] = [1, seconds, seconds]
+        else:
+            entry[0] += 1
+            entry[1] += seconds
+            entry[2] = max(entry[2], seconds)
+
+
+def count(name, n=1):
+    if not enabled:
+        return
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + n
+
+
+def call(name, fn, *args, **kwargs):
+    """تنفيذ fn وتسجيل زمنها باسم name"""
+    if not enabled:
+        return fn(*args, **kwargs)
+    started = time.perf_counter()
+    try:
+        return fn(*args, **kwargs)
+    finally:
+        record(name, time.perf_counter() - started)
+
+
+def timed(fn=None, name=None):
+    """decorator لتسجيل زمن الدالة: @timed أو @timed(name="...")"""
+    def wrap(fn):
+        label = name or fn.__qualname__
+
+        @functools.wraps(fn)
+        def inner(*args, **kwargs):
+            return call(label, fn, *args, **kwargs)
+        return inner
+    return wrap(fn) if fn is not None else wrap
+
+
+def label(fn):
+    """اسم مقروء لدالة أو lambda (يشمل الدالة التي عرفتها)"""
+    return getattr(fn, "__qualname__", None) or repr(fn)
+
+
+# ============================= Slow queries =============================
+# SQLite يبلغ ببداية كل أمر فقط؛ زمن الأمر = حتى بداية الأمر التالي على نفس الخيط
+# أو حتى statement_done() من query()/transaction(). الـ cursor المقروء تدريجيًا
+# (مثل تصدير PDF) يُحسب زمنه حتى انتهاء قراءته
+def trace(conn):
+    conn.set_trace_callback(_on_statement)
+
+
+def _on_statement(sql):
+    if sql.startswith("--"):
+        # أوامر داخل trigger تتبع الأمر الذي شغله
+        return
+    now = time.perf_counter()
+    _finish_statement(now)
+    _local.statement = (sql, now)
+
+
+def statement_done():
+    if enabled:
+        _finish_statement(time.perf_counter())
+
+
+def _finish_statement(now):
+    current = getattr(_local, "statement", None)
+    if current is None:
+        return
+    _local.statement = None
+    sql, started = current
+    seconds = now - started
+    record("sql", seconds)
+    if seconds * 1000 >= slow_ms:
+        _log_slow(seconds * 1000, sql)
+
+
+def _log_slow(ms, sql):
+    sql = " ".join(sql.split())
+    thread = threading.current_thread().name
+    with _lock:
+        _slow.append((ms, thread, sql))
+        _counters["slow_queries"] = _counters.get("slow_queries", 0) + 1
+    try:
+        os.makedirs(os.path.dirname(SLOW_LOG) or ".", exist_ok=True)
+        with open(SLOW_LOG, "a", encoding="utf-8") as f:
+            f.write(f"{datetime.now().isoformat(timespec='seconds')}\t{ms:.1f} ms\t{thread}\t{sql}\n")
+    except OSError as e:
+        print(f"⚠️ تعذر الكتابة في سجل الاستعلامات البطيئة: {e}")
+
+
+# ============================= cProfile =============================
+class _Snapshot:
+    """إحصائيات محفوظة بالشكل الذي يقبله pstats.Stats"""
+    def __init__(self, stats):
+        self.stats = stats
+
+    def create_stats(self):
+        pass
+
+
+def start_thread_profiler():
+    """بدء cProfile في الخيط الحالي (كل خيط يحتاج profiler خاص به)"""
+    if not use_cprofile or threading.get_ident() in _profilers:
+        return
+    # cProfile و pstats لا يُستوردان إلا عند طلبهما حتى لا يبطئا فتح البرنامج
+    import cProfile
+    profiler = cProfile.Profile()
+    _profilers[threading.get_ident()] = profiler
+    profiler.enable()
+
+
+def snapshot():
+    """حفظ إحصائيات cProfile للخيط الحالي حتى الآن (يُستدعى من داخل الخيط نفسه)"""
+    profiler = _profilers.get(threading.get_ident())
+    if profiler is None:
+        return
+    profiler.disable()
+    profiler.snapshot_stats()
+    with _lock:
+        _snapshots[threading.current_thread().name] = dict(profiler.stats)
+    profiler.enable()
+
+
+def stop_thread_profiler():
+    snapshot()
+    profiler = _profilers.pop(threading.get_ident(), None)
+    if profiler is not None:
+        profiler.disable()
+
+
+def dump_stats(path=STATS_FILE):
+    """دمج لقطات كل الخيوط في ملف pstats. يرجع المسار أو None"""
+    snapshot()
+    with _lock:
+        snapshots = list(_snapshots.values())
+    if not snapshots:
+        return None
+    import pstats
+    stats = pstats.Stats(_Snapshot(snapshots[0]))
+    for other in snapshots[1:]:
+        stats.add(_Snapshot(other))
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    stats.dump_stats(path)
+    return path
+
+
+# ============================= Startup =============================
+def process_uptime():
+    """الثواني منذ إنشاء العملية (يشمل بدء Python نفسه) أو None إن تعذر معرفتها"""
+    try:
+        if sys.platform == "win32":
+            import ctypes
+            from ctypes import wintypes
+            creation, exited, kernel, user, now = (wintypes.FILETIME() for _ in range(5))
+            kernel32 = ctypes.windll.kernel32
+            kernel32.GetCurrentProcess.restype = wintypes.HANDLE
+            kernel32.GetProcessTimes.argtypes = [wintypes.HANDLE] + [ctypes.POINTER(wintypes.FILETIME)] * 4
+            if not kernel32.GetProcessTimes(kernel32.GetCurrentProcess(), ctypes.byref(creation),
+                                            ctypes.byref(exited), ctypes.byref(kernel), ctypes.byref(user)):
+                return None
+            kernel32.GetSystemTimeAsFileTime(ctypes.byref(now))
+            # FILETIME بوحدات 100 نانوثانية
+            ticks = lambda ft: (ft.dwHighDateTime << 32) | ft.dwLowDateTime
+            return (ticks(now) - ticks(creation)) / 1e7
+        with open("/proc/self/stat") as f:
+            # الحقل 22 (starttime) بعد اسم البرنامج بين الأقواس
+            started = int(f.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/uptime") as f:
+            uptime = float(f.read().split()[0])
+        return uptime - started / os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, AttributeError, IndexError):
+        return None
+
+
+# ============================= Summary =============================
+def summary():
+    """ملخص نصي: الأزمنة مرتبة بالزمن الكلي، العدادات، وأبطأ الاستعلامات"""
+    with _lock:
+        timings = sorted(_timings.items(), key=lambda item: item[1][1], reverse=True)
+        counters = sorted(_counters.items())
+        slow = sorted(_slow, reverse=True)
+    lines = [f"{'الاسم':<48}{'مرات':>8}{'الكلي ms':>12}{'المتوسط':>10}{'الأقصى':>10}"]
+    for name, (calls, total, worst) in timings:
+        lines.append(f"{name[:48]:<48}{calls:>8}{total * 1000:>12.1f}{total * 1000 / calls:>10.2f}{worst * 1000:>10.1f}")
+    if counters:
+        lines.append("")
+        lines.append("  ".join(f"{name}={value:,}" for name, value in counters))
+    if slow:
+        lines.append("")
+        lines.append(f"أبطأ الاستعلامات (الحد {slow_ms:g} ms):")
+        for ms, thread, sql in slow:
+            lines.append(f"{ms:>9.1f} ms  [{thread}]  {sql[:160]}")
+    return "\n".join(lines)
@@ -0,0 +1,320 @@
+# -*- coding: utf-8 -*-
+"""زيادة المرتبات الجماعية: نسبة و/أو مبلغ ثابت على رواتب مناطق أو موظفين محددين (أو الكل)،
+مع معاينة أثرها على تكلفة حجم العمل الفعلي في الفترة الأخيرة قبل التطبيق.
+
+جدول الرواتب كله يُحمل كأعمدة متوازية (array('q')) وتُحسب الرواتب الجديدة ومجاميع كل منطقة
+كعمليات على الأعمدة كلها مرة واحدة (numpy إن وُجد، وإلا نفس الحساب بالأعداد الصحيحة في Python).
+التطبيق معاملة واحدة ويُسجل مع ما تغير في salary_adjustments، والرواتب الجديدة تُضاف لسجل الرواتب
+(salary_history) بتاريخ سريان الزيادة. الزيادة بتاريخ سريان لاحق تُحفظ معلقة وتُطبق عند أول تشغيل
+في تاريخها أو بعده (apply_due).
+
+    python payroll_raises.py --percent 10 --area "المعادي" [--amount 50] [--apply] [--from 2025-01-01]
+"""
+import sys
+import json
+import argparse
+from array import array
+from datetime import date, datetime, timedelta
+from itertools import groupby
+
+import payroll_db
+import payroll_core as core
+import payroll_events as events
+import payroll_profile as profile
+from payroll_db import query, transaction
+
+try:
+    import numpy as np
+    HAS_NUMPY = True
+except ImportError:
+    HAS_NUMPY = False
+
+# النسبة بأجزاء المائة من 1% (core.PERCENT_SCALE) فيبقى الحساب كله أعدادًا صحيحة مثل القروش
+_DIVISOR = 100 * core.PERCENT_SCALE
+# التكلفة تُقاس على حجم عمل آخر VOLUME_DAYS يوم (من جدول الملخص اليومي)
+VOLUME_DAYS = 30
+
+_MATRIX_SQL = "SELECT s.id, s.employee_id, s.area_id, s.salary, 0 FROM employee_area_salary s{where} ORDER BY s.area_id, s.employee_id"
+
+_MATRIX_VOLUME_SQL = """
+    SELECT s.id, s.employee_id, s.area_id, s.salary, COALESCE(v.lines, 0)
+    FROM employee_area_salary s
+    LEFT JOIN (SELECT employee_id, area_id, SUM(lines) AS lines FROM payroll_daily
+               WHERE day>=? AND day<=? GROUP BY employee_id, area_id) v
+      ON v.employee_id=s.employee_id AND v.area_id=s.area_id{where}
+    ORDER BY s.area_id, s.employee_id"""
+
+# رواتب لها تعديل في السجل بعد تاريخ السريان: المرتب الحالي ليس المرتب الساري يومها
+_LATER_HISTORY = ("EXISTS (SELECT 1 FROM salary_history h WHERE h.area_id=s.area_id "
+                  "AND h.employee_id=s.employee_id AND h.effective_from>?)")
+
+_LATER_COUNT_SQL = f"""
+    SELECT COUNT(*) FROM employee_area_salary s
+    WHERE (?1 IS NULL OR s.area_id IN (SELECT value FROM json_each(?1)))
+      AND (?2 IS NULL OR s.employee_id IN (SELECT value FROM json_each(?2)))
+      AND {_LATER_HISTORY.replace("?", "?3")}"""
+
+
+class SalaryMatrix:
+    """كل الرواتب المسجلة كأعمدة متوازية مرتبة بالمنطقة ثم الموظف،
+    و lines = عدد سطور كل (موظف، منطقة) في فترة حجم العمل"""
+    COLUMNS = ("ids", "employee_ids", "area_ids", "salaries", "lines")
+
+    def __init__(self, rows):
+        columns = list(zip(*rows)) or [()] * len(self.COLUMNS)
+        for name, values in zip(self.COLUMNS, columns):
+            setattr(self, name, array("q", values))
+
+    def __len__(self):
+        return len(self.ids)
+
+    @classmethod
+    def load(cls, c, date_from=None, date_to=None, effective_from=None):
+        """effective_from (نص ISO) = بدون الرواتب التي عُدلت بعد هذا التاريخ"""
+        where, params = ("", []) if effective_from is None else (" WHERE NOT " + _LATER_HISTORY, [effective_from])
+        if date_from is None:
+            return cls(c.execute(_MATRIX_SQL.format(where=where), params).fetchall())
+        return cls(c.execute(_MATRIX_VOLUME_SQL.format(where=where),
+                             [date_from.isoformat(), date_to.isoformat()] + params).fetchall())
+
+
+class Impact:
+    """نتيجة حساب الزيادة على المصفوفة.
+    areas: (رقم المنطقة, عدد الرواتب, عدد السطور, التكلفة الحالية, التكلفة الجديدة) لكل منطقة متأثرة
+    changes: (رقم السطر, الموظف, المنطقة, المرتب الحالي, الجديد) لكل مرتب يتغير فعلًا"""
+    def __init__(self, areas, changes):
+        self.areas = areas
+        self.changes = changes
+
+
+def _check(percent, amount):
+    if not percent and not amount:
+        raise ValueError("حدد نسبة أو مبلغ الزيادة")
+    if percent <= -_DIVISOR:
+        raise ValueError("النسبة يجب أن تكون أكبر من -100%")
+
+
+def compute(matrix, percent=0, amount=0, area_ids=None, employee_ids=None):
+    """المرتب الجديد = الحالي × (1 + النسبة) مقربًا للقرش + المبلغ الثابت، لرواتب المناطق
+    area_ids والموظفين employee_ids (None = الكل). ValueError إذا نتج مرتب سالب"""
+    _check(percent, amount)
+    compute_fn = _compute_numpy if HAS_NUMPY else _compute_python
+    return compute_fn(matrix, percent, amount, area_ids, employee_ids)
+
+
+def _compute_numpy(matrix, percent, amount, area_ids, employee_ids):
+    # نفس ذاكرة الأعمدة بدون نسخ
+    ids, employees, areas, old, lines = (np.frombuffer(getattr(matrix, name), dtype=np.int64)
+                                         for name in SalaryMatrix.COLUMNS)
+    selected = np.ones(len(ids), dtype=bool)
+    if area_ids is not None:
+        selected &= np.isin(areas, np.fromiter(area_ids, dtype=np.int64))
+    if employee_ids is not None:
+        selected &= np.isin(employees, np.fromiter(employee_ids, dtype=np.int64))
+    picked = np.flatnonzero(selected)
+    if not len(picked):
+        return Impact([], [])
+    before = old[picked]
+    after = (before * (_DIVISOR + percent) + _DIVISOR // 2) // _DIVISOR + amount
+    if (after < 0).any():
+        raise ValueError("الزيادة تجعل بعض المرتبات أقل من صفر")
+    # الصفوف مرتبة بالمنطقة: بداية كل منطقة ثم مجموع كل مقطع (reduceat) بأعداد صحيحة
+    area = areas[picked]
+    starts = np.flatnonzero(np.r_[True, area[1:] != area[:-1]])
+    volume = lines[picked]
+    per_area = zip(area[starts].tolist(), np.diff(np.r_[starts, len(area)]).tolist(),
+                   np.add.reduceat(volume, starts).tolist(),
+                   np.add.reduceat(volume * before, starts).tolist(),
+                   np.add.reduceat(volume * after, starts).tolist())
+    changed = after != before
+    rows = picked[changed]
+    changes = zip(ids[rows].tolist(), employees[rows].tolist(), areas[rows].tolist(),
+                  before[changed].tolist(), after[changed].tolist())
+    return Impact(list(per_area), list(changes))
+
+
+def _compute_python(matrix, percent, amount, area_ids, employee_ids):
+    area_set = None if area_ids is None else set(area_ids)
+    employee_set = None if employee_ids is None else set(employee_ids)
+    factor, half = _DIVISOR + percent, _DIVISOR // 2
+    rows = [(matrix.area_ids[k], matrix.ids[k], matrix.employee_ids[k], matrix.salaries[k], matrix.lines[k])
+            for k in range(len(matrix))
+            if (area_set is None or matrix.area_ids[k] in area_set)
+            and (employee_set is None or matrix.employee_ids[k] in employee_set)]
+    per_area, changes = [], []
+    for area_id, group in groupby(rows, key=lambda row: row[0]):
+        count = volume = old_cost = new_cost = 0
+        for _, mapping_id, employee_id, before, lines in group:
+            after = (before * factor + half) // _DIVISOR + amount
+            if after < 0:
+                raise ValueError("الزيادة تجعل بعض المرتبات أقل من صفر")
+            count += 1
+            volume += lines
+            old_cost += lines * before
+            new_cost += lines * after
+            if after != before:
+                changes.append((mapping_id, employee_id, area_id, before, after))
+        per_area.append((area_id, count, volume, old_cost, new_cost))
+    return Impact(per_area, changes)
+
+
+# ============================= Preview & apply =============================
+@profile.timed(name="raises:preview")
+def preview_raise(percent=0, amount=0, area_ids=None, employee_ids=None, date_from=None, date_to=None):
+    """أثر الزيادة على تكلفة حجم العمل في الفترة (الافتراضي آخر VOLUME_DAYS يوم) = عدد السطور × المرتب.
+    يرجع (الصفوف, الإجمالي): الصف (رقم المنطقة, المنطقة, عدد الرواتب, السطور, التكلفة الحالية, الجديدة)
+    والإجمالي (عدد الرواتب المتغيرة, السطور, التكلفة الحالية, الجديدة) والمبالغ بالقرش"""
+    date_to = date_to or date.today()
+    date_from = date_from or date_to - timedelta(days=VOLUME_DAYS - 1)
+    matrix = SalaryMatrix.load(payroll_db.get_conn(), date_from, date_to)
+    impact = compute(matrix, percent, amount, area_ids, employee_ids)
+    names = dict(core.list_areas())
+    rows = [(area_id, names.get(area_id, f"#{area_id}"), count, lines, old_cost, new_cost)
+            for area_id, count, lines, old_cost, new_cost in impact.areas]
+    totals = (len(impact.changes), sum(row[3] for row in rows), sum(row[4] for row in rows),
+              sum(row[5] for row in rows))
+    return rows, totals
+
+
+def _apply(c, adjustment_id, impact, effective_from):
+    c.executemany("UPDATE employee_area_salary SET salary=? WHERE id=?",
+                  [(new, mapping_id) for mapping_id, _, _, _, new in impact.changes])
+    c.executemany("INSERT OR REPLACE INTO salary_history(area_id, employee_id, effective_from, salary) VALUES(?,?,?,?)",
+                  [(area_id, employee_id, effective_from, new) for _, employee_id, area_id, _, new in impact.changes])
+    c.executemany("INSERT INTO salary_adjustment_lines(adjustment_id, employee_id, area_id, old_salary, new_salary) "
+                  "VALUES(?,?,?,?,?)", [(adjustment_id,) + change[1:] for change in impact.changes])
+    c.execute("UPDATE salary_adjustments SET applied_at=?, rows=? WHERE id=?",
+              (datetime.now().isoformat(timespec="seconds"), len(impact.changes), adjustment_id))
+    return len(impact.changes)
+
+
+def _ids_json(ids):
+    return None if ids is None else json.dumps(sorted(set(ids)))
+
+
+@profile.timed(name="raises:apply")
+def apply_raise(percent=0, amount=0, area_ids=None, employee_ids=None, effective_from=None, note=""):
+    """تسجيل الزيادة وتطبيقها على كل الرواتب في معاملة واحدة إذا حل تاريخ سريانها،
+    وإلا تبقى معلقة حتى apply_due. يرجع (رقم الزيادة, عدد الرواتب المتغيرة, طُبقت؟).
+    ValueError إذا كان تاريخ السريان قبل آخر تعديل لأحد الرواتب المشمولة"""
+    effective_from = effective_from or date.today()
+    due = effective_from <= date.today()
+    with transaction() as c:
+        # زيادة بتاريخ سابق تُحسب من المرتب الحالي، وهو المرتب الساري يومها فقط إذا لم يُعدل بعده
+        later = c.execute(_LATER_COUNT_SQL, (_ids_json(area_ids), _ids_json(employee_ids),
+                                             effective_from.isoformat())).fetchone()[0]
+        if later:
+            raise ValueError(f"{later} مرتب عُدل بعد {effective_from}، اختر تاريخ سريان بعد آخر تعديل")
+        # الحساب يتم دائمًا حتى يُرفض الخطأ (مرتب سالب) عند الإدخال وليس يوم السريان
+        impact = compute(SalaryMatrix.load(c), percent, amount, area_ids, employee_ids)
+        c.execute("INSERT INTO salary_adjustments(created_at, effective_from, percent, amount, area_ids, "
+                  "employee_ids, note) VALUES(?,?,?,?,?,?,?)",
+                  (datetime.now().isoformat(timespec="seconds"), effective_from.isoformat(), percent, amount,
+                   _ids_json(area_ids), _ids_json(employee_ids), (note or "").strip()))
+        adjustment_id = c.lastrowid
+        rows = _apply(c, adjustment_id, impact, effective_from.isoformat()) if due else 0
+    events.publish(events.SALARIES_ADJUSTED, adjustment_id=adjustment_id, rows=rows, applied=due)
+    return adjustment_id, rows, due
+
+
+def apply_due(today=None):
+    """تطبيق الزيادات المعلقة التي حل تاريخ سريانها، بترتيب تواريخها، في معاملة واحدة.
+    يرجع عدد الزيادات المطبقة"""
+    today = today or date.today()
+    applied = []
+    with transaction() as c:
+        pending = c.execute("SELECT id, effective_from, percent, amount, area_ids, employee_ids FROM salary_adjustments "
+                            "WHERE applied_at IS NULL AND effective_from<=? ORDER BY effective_from, id",
+                            (today.isoformat(),)).fetchall()
+        for adjustment_id, effective_from, percent, amount, area_ids, employee_ids in pending:
+            # مرتب عُدل يدويًا بعد تاريخ السريان (التطبيق تأخر) يبقى كما هو ولا تشمله الزيادة
+            impact = compute(SalaryMatrix.load(c, effective_from=effective_from), percent, amount,
+                             json.loads(area_ids) if area_ids else None,
+                             json.loads(employee_ids) if employee_ids else None)
+            applied.append((adjustment_id, _apply(c, adjustment_id, impact, effective_from)))
+    for adjustment_id, rows in applied:
+        events.publish(events.SALARIES_ADJUSTED, adjustment_id=adjustment_id, rows=rows, applied=True)
+    return len(applied)
+
+
+def adjustments(limit=50):
+    """آخر الزيادات: (الرقم, تاريخ الإدخال, تاريخ السريان, النسبة, المبلغ, ملاحظة, تاريخ التطبيق, عدد الرواتب)"""
+    return query("SELECT id, created_at, effective_from, percent, amount, note, applied_at, rows "
+                 "FROM salary_adjustments ORDER BY id DESC LIMIT ?", (limit,))
+
+
+# ============================= CLI =============================
+def _ids(table, names):
+    if not names:
+        return None
+    ids = []
+    for name in names:
+        rows = query(f"SELECT id FROM {table} WHERE name=?", (name,))
+        if not rows:
+            raise SystemExit(f"❌ غير موجود: {name}")
+        ids.append(rows[0][0])
+    return ids
+
+
+def _print_preview(rows, totals):
+    for _, name, count, lines, old_cost, new_cost in rows:
+        print(f"{name}\t{count}\t{lines}\t{core.format_money(old_cost)}\t{core.format_money(new_cost)}\t"
+              f"{core.format_money(new_cost - old_cost)}")
+    changed, lines, old_cost, new_cost = totals
+    print(f"الإجمالي\t{changed} مرتب يتغير\t{lines}\t{core.format_money(old_cost)}\t{core.format_money(new_cost)}\t"
+          f"{core.format_money(new_cost - old_cost)}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="زيادة جماعية للمرتبات مع معاينة أثرها على التكلفة")
+    parser.add_argument("--db", help="مسار قاعدة البيانات")
+    parser.add_argument("--percent", type=core.parse_percent, default=0, help="نسبة الزيادة (سالبة للتخفيض)")
+    parser.add_argument("--amount", type=core.to_piastres, default=0, help="مبلغ ثابت بالجنيه")
+    parser.add_argument("--area", action="append", help="اسم منطقة (يتكرر، الافتراضي كل المناطق)")
+    parser.add_argument("--employee", action="append", help="اسم موظف (يتكرر، الافتراضي كل الموظفين)")
+    parser.add_argument("--effective", type=date.fromisoformat, help="تاريخ السريان (الافتراضي اليوم)")
+    parser.add_argument("--from", dest="date_from", type=date.fromisoformat, help="بداية فترة حجم العمل")
+    parser.add_argument("--to", dest="date_to", type=date.fromisoformat, help="نهاية فترة حجم العمل")
+    parser.add_argument("--note", default="")
+    parser.add_argument("--apply", action="store_true", help="التطبيق بعد المعاينة")
+    parser.add_argument("--list", action="store_true", help="عرض آخر الزيادات")
+    args = parser.parse_args(argv)
+    if args.db:
+        payroll_db.configure(args.db)
+    profile.configure_from_env()
+    core.ensure_dirs()
+    core.init_db()
+    try:
+        due = apply_due()
+        if due:
+            print(f"✅ طُبقت {due} زيادة معلقة حل تاريخ سريانها")
+        if args.list:
+            for adjustment_id, created_at, effective, percent, amount, note, applied_at, rows in adjustments():
+                state = f"طُبقت {applied_at} ({rows} مرتب)" if applied_at else "معلقة"
+                print(f"{adjustment_id}\t{effective}\t{core.format_percent(percent)}\t{core.format_money(amount)}\t"
+                      f"{state}\t{note or ''}")
+            return 0
+        area_ids = _ids("areas", args.area)
+        employee_ids = _ids("employees", args.employee)
+        try:
+            rows, totals = preview_raise(args.percent, args.amount, area_ids, employee_ids, args.date_from, args.date_to)
+            _print_preview(rows, totals)
+            if args.apply:
+                adjustment_id, changed, applied = apply_raise(args.percent, args.amount, area_ids, employee_ids,
+                                                              args.effective, args.note)
+                if applied:
+                    print(f"✅ الزيادة رقم {adjustment_id}: تم تعديل {changed} مرتب")
+                else:
+                    print(f"✅ الزيادة رقم {adjustment_id} محفوظة وتُطبق يوم {args.effective}")
+        except ValueError as e:
+            print(f"❌ {e}")
+            return 1
+    finally:
+        payroll_db.close_all()
+        if profile.enabled:
+            print(profile.summary())
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
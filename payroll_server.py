@@ -0,0 +1,521 @@
+# -*- coding: utf-8 -*-
+"""خادم الشبكة المحلية: قاعدة بيانات واحدة لكل أجهزة الحجز عبر واجهة HTTP/JSON.
+
+كل الكتابة تمر على طابور الكتابة المجمعة (payroll_writer): خيط واحد باتصال واحد، وعمليات
+الكتابة التي تصل في نفس اللحظة تُحفظ بـ commit واحد. القراءة تعمل على عدة خيوط لكل منها اتصاله.
+التغييرات تصل للعملاء بـ long-poll على /events، وأرقام الطابور على /stats.
+
+    python payroll_server.py [--port 8765] [--db data/payroll_new.db]            (هذا الجهاز فقط)
+    python payroll_server.py --host 0.0.0.0 --token سر [--port 8765]             (كل الشبكة)
+    python payroll_system.py --server http://192.168.1.10:8765
+"""
+import os
+import re
+import sys
+import json
+import hmac
+import time
+import ipaddress
+import asyncio
+import sqlite3
+import argparse
+import tempfile
+import functools
+import threading
+from collections import deque
+from datetime import date
+from http import HTTPStatus
+from urllib.parse import urlsplit, parse_qsl
+from concurrent.futures import ThreadPoolExecutor
+
+import payroll_db
+import payroll_core as core
+import payroll_pdf
+import payroll_raises
+import payroll_profile as profile
+from payroll_client import DEFAULT_PORT, TOKEN_ENV, TOKEN_HEADER
+from payroll_writer import GroupCommitQueue, WINDOW
+
+# الافتراضي هذا الجهاز فقط؛ الاستماع على الشبكة يتطلب رمزًا (انظر check_host)
+HOST = "127.0.0.1"
+READ_THREADS = 4
+MAX_BODY = 4 * 1024 * 1024
+# عدد الأحداث المحفوظة للعملاء المتأخرين؛ من فاته أقدم منها يعيد تحميل كل شيء
+EVENT_KEEP = 2000
+POLL_TIMEOUT = 25
+# كل كم ثانية يُطبق ما حل تاريخ سريانه من الزيادات المعلقة (الخادم قد يعمل لأيام)
+DUE_CHECK_SECONDS = 3600
+
+
+class HttpError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class Attachment:
+    """ملف يُرسل كما هو بدل JSON (تقارير PDF)"""
+    __slots__ = ("data", "filename", "rows")
+
+    def __init__(self, data, filename, rows=None):
+        self.data = data
+        self.filename = filename
+        self.rows = rows
+
+
+def _status(error):
+    if isinstance(error, HttpError):
+        return error.status
+    if isinstance(error, sqlite3.IntegrityError):
+        return 409
+    if isinstance(error, (ValueError, KeyError)):
+        return 400
+    return 500
+
+
+# ============================= Routes =============================
+# (الطريقة, النمط, النوع, الدالة). النوع: read = خيوط القراءة، write = طابور الكتابة المجمعة.
+# الدالة تستقبل مجموعات النمط ثم params ثم body. /events و /stats على حلقة asyncio (انظر _dispatch)
+ROUTES = []
+
+
+def route(method, pattern, kind="read"):
+    def register(fn):
+        ROUTES.append((method, re.compile(pattern + "$"), kind, fn))
+        return fn
+    return register
+
+
+def _int(value):
+    return int(value) if value not in (None, "") else None
+
+
+def _date(value):
+    return date.fromisoformat(value) if value else None
+
+
+@route("GET", r"/info")
+def info(params, body):
+    return {"pdf": payroll_pdf.HAS_PDF, "schema": payroll_db.schema_version(payroll_db.get_conn())}
+
+
+@route("GET", r"/employees")
+def list_employees(params, body):
+    return core.list_employees()
+
+
+@route("POST", r"/employees", "write")
+def add_employee(params, body):
+    return {"id": core.add_employee(body["name"])}
+
+
+@route("PUT", r"/employees/(\d+)", "write")
+def rename_employee(employee_id, params, body):
+    core.rename_employee(int(employee_id), body["name"])
+
+
+@route("DELETE", r"/employees/(\d+)", "write")
+def delete_employee(employee_id, params, body):
+    core.delete_employee(int(employee_id))
+
+
+@route("GET", r"/areas")
+def list_areas(params, body):
+    return core.list_areas()
+
+
+@route("POST", r"/areas", "write")
+def add_area(params, body):
+    return {"id": core.add_area(body["name"])}
+
+
+@route("DELETE", r"/areas/(\d+)", "write")
+def delete_area(area_id, params, body):
+    core.delete_area(int(area_id))
+
+
+@route("GET", r"/areas/(\d+)/default_salary")
+def area_default_salary(area_id, params, body):
+    return {"salary": core.area_default_salary(int(area_id))}
+
+
+@route("PUT", r"/areas/(\d+)/default_salary", "write")
+def set_area_default_salary(area_id, params, body):
+    core.set_area_default_salary(int(area_id), _int(body.get("salary")))
+
+
+@route("GET", r"/areas/(\d+)/salaries")
+def area_salaries(area_id, params, body):
+    return core.area_salaries(int(area_id), _date(params.get("day")))
+
+
+@route("GET", r"/salaries/history")
+def salary_history(params, body):
+    return core.salary_history(_int(params.get("area_id")), _int(params.get("employee_id")))
+
+
+@route("POST", r"/salaries", "write")
+def set_salary(params, body):
+    return {"id": core.set_salary(int(body["employee_id"]), int(body["area_id"]), int(body["salary"]),
+                                  _date(body.get("effective_from")))}
+
+
+@route("DELETE", r"/salaries/(\d+)", "write")
+def delete_salary(mapping_id, params, body):
+    core.delete_salary(int(mapping_id))
+
+
+def _ids(value):
+    return None if value is None else [int(v) for v in value]
+
+
+@route("POST", r"/raises/preview")
+def preview_raise(params, body):
+    rows, totals = payroll_raises.preview_raise(int(body.get("percent") or 0), int(body.get("amount") or 0),
+                                                _ids(body.get("area_ids")), _ids(body.get("employee_ids")),
+                                                _date(body.get("from")), _date(body.get("to")))
+    return {"rows": rows, "totals": totals}
+
+
+@route("POST", r"/raises", "write")
+def apply_raise(params, body):
+    adjustment_id, rows, applied = payroll_raises.apply_raise(
+        int(body.get("percent") or 0), int(body.get("amount") or 0), _ids(body.get("area_ids")),
+        _ids(body.get("employee_ids")), _date(body.get("effective_from")), body.get("note", ""))
+    return {"id": adjustment_id, "rows": rows, "applied": applied}
+
+
+@route("GET", r"/orders")
+def search_orders(params, body):
+    return core.search_orders(params.get("text", ""), _int(params.get("area_id")), _date(params.get("from")),
+                              _date(params.get("to")), _int(params.get("limit")) or core.ORDER_SEARCH_LIMIT)
+
+
+@route("POST", r"/orders", "write")
+def create_order(params, body):
+    lines = [{'id': int(line['id']), 'salary': int(line['salary']), 'transport': int(line['transport'])}
+             for line in body["lines"]]
+    order_id, total = core.create_order(int(body["area_id"]), body.get("address"), lines, body.get("created_at"))
+    return {"id": order_id, "total": total}
+
+
+@route("GET", r"/orders/ids")
+def select_order_ids(params, body):
+    return payroll_pdf.select_order_ids(_int(params.get("from_id")), _int(params.get("to_id")),
+                                        _date(params.get("from")), _date(params.get("to")))
+
+
+@route("GET", r"/orders/(\d+)")
+def order_report(order_id, params, body):
+    report = core.order_report(int(order_id))
+    if report is None:
+        raise HttpError(404, f"الأوردر {order_id} غير موجود")
+    header, totals, lines = report
+    return {"header": header, "totals": totals, "lines": list(lines)}
+
+
+@route("GET", r"/orders/(\d+)/total")
+def order_total(order_id, params, body):
+    return {"total": core.order_total(int(order_id))}
+
+
+@route("GET", r"/summary")
+def payroll_summary(params, body):
+    return core.payroll_summary(params.get("period", "month"), params.get("group", "employee"),
+                                _date(params.get("from")), _date(params.get("to")),
+                                _int(params.get("area_id")), _int(params.get("employee_id")))
+
+
+@route("POST", r"/sources/(\w+)")
+def source_page(name, params, body):
+    """صفحة من قائمة طويلة: op = count / first / after / before / slice"""
+    source = core.source(name, *body.get("args", ()))
+    op = body["op"]
+    if op == "count":
+        return source.count()
+    if op == "first":
+        return source.first(int(body["limit"]))
+    if op in ("after", "before"):
+        return getattr(source, op)(tuple(body["key"]), int(body["limit"]))
+    if op == "slice":
+        return source.slice(int(body["offset"]), int(body["limit"]))
+    raise ValueError(f"عملية غير معروفة: {op}")
+
+
+# ملف الأوردر له اسم ثابت في مجلد التقارير؛ القفل يمنع طلبين لنفس الأوردر من الكتابة فيه معًا
+_pdf_lock = threading.Lock()
+
+
+def _require_pdf():
+    if not payroll_pdf.HAS_PDF:
+        raise HttpError(501, "مكتبة reportlab غير مثبتة على الخادم")
+
+
+@route("GET", r"/orders/(\d+)/pdf")
+def order_pdf(order_id, params, body):
+    _require_pdf()
+    with _pdf_lock:
+        fname = payroll_pdf.render_order_pdf(int(order_id))
+        with open(fname, "rb") as f:
+            return Attachment(f.read(), os.path.basename(fname))
+
+
+@route("GET", r"/statement")
+def period_pdf(params, body):
+    _require_pdf()
+    date_from, date_to = _date(params.get("from")), _date(params.get("to"))
+    handle, fname = tempfile.mkstemp(suffix=".pdf")
+    os.close(handle)
+    try:
+        _, rows = payroll_pdf.render_period_pdf(date_from, date_to, _int(params.get("area_id")),
+                                                _int(params.get("employee_id")), fname=fname)
+        with open(fname, "rb") as f:
+            return Attachment(f.read(), f"Statement_{date_from or 'start'}_{date_to or 'end'}.pdf", rows)
+    finally:
+        os.remove(fname)
+
+
+# ============================= Events =============================
+class EventLog:
+    """آخر الأحداث بأرقام متسلسلة؛ العميل يطلب ما بعد آخر رقم وصله وينتظر إن لم يوجد جديد.
+    يُستخدم من حلقة asyncio فقط"""
+    def __init__(self, keep=EVENT_KEEP):
+        self.items = deque(maxlen=keep)
+        self.seq = 0
+        self.waiters = set()
+        # رقم التشغيل: إذا أُعيد تشغيل الخادم تبدأ الأرقام من جديد والعميل يعيد التحميل
+        self.server = f"{os.getpid()}-{time.time():.0f}"
+
+    def extend(self, captured):
+        """أحداث دفعة محفوظة ثم إيقاظ المنتظرين"""
+        for topic, data in captured:
+            self.seq += 1
+            self.items.append((self.seq, topic, data))
+        self.wake()
+
+    def wake(self):
+        for waiter in self.waiters:
+            if not waiter.done():
+                waiter.set_result(None)
+        self.waiters.clear()
+
+    def since(self, seq, server=None):
+        """الأحداث بعد seq. missed = بعضها لم يعد محفوظًا أو أن seq من تشغيل سابق للخادم.
+        seq < 0 = الرقم الحالي فقط"""
+        reply = {"server": self.server, "seq": self.seq, "missed": False, "events": []}
+        if seq < 0:
+            return reply
+        oldest = self.items[0][0] if self.items else self.seq + 1
+        if (server and server != self.server) or seq > self.seq or seq + 1 < oldest:
+            reply["missed"] = True
+            return reply
+        reply["events"] = [(topic, data) for n, topic, data in self.items if n > seq]
+        return reply
+
+    async def wait(self, seq, server, timeout):
+        if seq < 0 or seq != self.seq or (server and server != self.server):
+            return self.since(seq, server)
+        waiter = asyncio.get_running_loop().create_future()
+        self.waiters.add(waiter)
+        try:
+            await asyncio.wait_for(waiter, timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            self.waiters.discard(waiter)
+        return self.since(seq, server)
+
+
+# ============================= HTTP =============================
+async def _read_request(reader):
+    """(الطريقة, المسار, params, headers, body) أو None عند إغلاق الاتصال"""
+    line = await reader.readline()
+    if not line.strip():
+        return None
+    try:
+        method, target, _ = line.decode("latin-1").split()
+    except ValueError:
+        raise HttpError(400, "طلب غير صالح")
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    try:
+        length = int(headers.get("content-length") or 0)
+    except ValueError:
+        length = -1
+    if length < 0:
+        raise HttpError(400, "Content-Length غير صالح")
+    if length > MAX_BODY:
+        raise HttpError(413, "الطلب أكبر من المسموح")
+    body = await reader.readexactly(length) if length else b""
+    url = urlsplit(target)
+    return method.upper(), url.path.rstrip("/") or "/", dict(parse_qsl(url.query)), headers, body
+
+
+def _response(status, payload, keep_alive):
+    extra = []
+    if isinstance(payload, Attachment):
+        data, content_type = payload.data, "application/pdf"
+        extra.append(f'Content-Disposition: attachment; filename="{payload.filename}"')
+        if payload.rows is not None:
+            extra.append(f"X-Rows: {payload.rows}")
+    else:
+        data, content_type = json.dumps(payload, ensure_ascii=False).encode("utf-8"), "application/json; charset=utf-8"
+    head = [f"HTTP/1.1 {status} {HTTPStatus(status).phrase}", f"Content-Type: {content_type}",
+            f"Content-Length: {len(data)}", f"Connection: {'keep-alive' if keep_alive else 'close'}", *extra]
+    return ("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + data
+
+
+def is_loopback(host):
+    if host == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+def check_host(host, token):
+    """كل عمليات الكتابة مفتوحة لمن يصل للخادم، فلا استماع خارج هذا الجهاز بدون رمز"""
+    if not token and not is_loopback(host):
+        raise ValueError(f"الاستماع على {host or 'كل العناوين'} يتطلب رمزًا (--token أو {TOKEN_ENV})")
+
+
+class PayrollServer:
+    def __init__(self, token=None, read_threads=READ_THREADS, window=WINDOW):
+        self.token = token
+        self.read_threads = read_threads
+        self.window = window
+        self.log = None
+        self.writes = None
+        self.readers = None
+
+    async def serve(self, host=HOST, port=DEFAULT_PORT):
+        check_host(host, self.token)
+        loop = asyncio.get_running_loop()
+        self.log = EventLog()
+
+        def publish(captured):
+            # الأحداث تُضاف للسجل على حلقة asyncio (قبل إقرار عمليات الدفعة لأصحابها)
+            if captured:
+                loop.call_soon_threadsafe(self.log.extend, captured)
+
+        self.writes = GroupCommitQueue(self.window, publish=publish)
+        self.readers = ThreadPoolExecutor(self.read_threads, thread_name_prefix="db-read")
+        server = await asyncio.start_server(self._client, host, port)
+        print(f"✅ الخادم يعمل على http://{host}:{port} - القاعدة: {os.path.abspath(payroll_db.DB_PATH)}")
+        due = asyncio.create_task(self._apply_due())
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            due.cancel()
+            self.writes.stop()
+            self.readers.shutdown(wait=False)
+
+    async def _apply_due(self):
+        """الزيادات المعلقة عبر طابور الكتابة فتصل أحداثها للعملاء"""
+        while True:
+            try:
+                count = await asyncio.wrap_future(self.writes.submit(payroll_raises.apply_due))
+                if count:
+                    print(f"✅ طُبقت {count} زيادة معلقة حل تاريخ سريانها")
+            except Exception as e:
+                print(f"❌ تطبيق الزيادات المعلقة: {e}")
+            await asyncio.sleep(DUE_CHECK_SECONDS)
+
+    async def _client(self, reader, writer):
+        try:
+            while True:
+                try:
+                    request = await _read_request(reader)
+                except HttpError as e:
+                    writer.write(_response(e.status, {"error": str(e)}, False))
+                    break
+                if request is None:
+                    break
+                method, path, params, headers, body = request
+                status, payload = await self._dispatch(method, path, params, headers, body)
+                keep_alive = headers.get("connection", "").lower() != "close"
+                writer.write(_response(status, payload, keep_alive))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except asyncio.CancelledError:
+            # إيقاف الخادم أثناء انتظار طلب على اتصال keep-alive
+            pass
+        finally:
+            writer.close()
+
+    async def _dispatch(self, method, path, params, headers, raw):
+        # قيم headers تُقرأ latin-1، فالمقارنة بالبايتات تسمح برمز عربي
+        if self.token and not hmac.compare_digest(headers.get(TOKEN_HEADER, "").encode("latin-1"),
+                                                  self.token.encode("utf-8")):
+            return 401, {"error": "رمز الدخول غير صحيح"}
+        try:
+            body = json.loads(raw) if raw else {}
+            if path == "/events" and method == "GET":
+                timeout = min(float(params.get("timeout", POLL_TIMEOUT)), POLL_TIMEOUT)
+                return 200, await self.log.wait(int(params.get("since", -1)), params.get("server"), timeout)
+            if path == "/stats" and method == "GET":
+                return 200, self.writes.stats()
+            for route_method, pattern, kind, fn in ROUTES:
+                match = pattern.match(path)
+                if match is None or route_method != method:
+                    continue
+                call = functools.partial(fn, *match.groups(), params, body)
+                if kind == "write":
+                    result = await asyncio.wrap_future(self.writes.submit(call))
+                else:
+                    result = await asyncio.get_running_loop().run_in_executor(
+                        self.readers, profile.call, "server:" + fn.__name__, call)
+                return 200, result
+            return 404, {"error": f"مسار غير معروف: {method} {path}"}
+        except Exception as e:
+            status = _status(e)
+            if status == 500:
+                print(f"❌ {method} {path}: {type(e).__name__}: {e}")
+            return status, {"error": f"حقل مطلوب: {e.args[0]}" if isinstance(e, KeyError) else str(e)}
+
+
+# ============================= CLI =============================
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="خادم المرتبات للشبكة المحلية")
+    parser.add_argument("--host", default=HOST, help="عنوان الاستماع (غير 127.0.0.1 يتطلب --token)")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--db", help="مسار قاعدة البيانات")
+    parser.add_argument("--token", default=os.environ.get(TOKEN_ENV), help=f"رمز يرسله كل عميل (أو {TOKEN_ENV})")
+    parser.add_argument("--readers", type=int, default=READ_THREADS, help="عدد خيوط القراءة")
+    parser.add_argument("--window", type=float, default=WINDOW * 1000,
+                        help="انتظار الكتابات الأخرى قبل الـ commit بالمللي ثانية")
+    args = parser.parse_args(argv)
+    try:
+        check_host(args.host, args.token)
+    except ValueError as e:
+        print(f"❌ {e}")
+        return 1
+    profile.configure_from_env()
+    if args.db:
+        payroll_db.configure(args.db)
+    core.ensure_dirs()
+    core.init_db()
+    server = PayrollServer(args.token, args.readers, args.window / 1000)
+    try:
+        asyncio.run(server.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        print("تم إيقاف الخادم")
+    finally:
+        payroll_db.close_all()
+        if profile.enabled:
+            print(profile.summary())
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
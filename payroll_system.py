@@ -1,291 +1,625 @@
 # -*- coding: utf-8 -*-
 import os
+import sys
+import time
+# بداية قياس زمن فتح البرنامج (قبل استيراد tkinter وباقي الوحدات)
+STARTED = time.perf_counter()
+import queue
+import bisect
 import sqlite3
+import itertools
+import threading
+import importlib.util
 from datetime import datetime
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
 
-# =====[ PDF Export with Arabic Support ]=====
-try:
-    from reportlab.lib.pagesizes import A4
-    from reportlab.pdfgen import canvas
-    from reportlab.lib import colors
-    from reportlab.lib.units import cm
-    from reportlab.pdfbase import pdfmetrics
-    from reportlab.pdfbase.ttfonts import TTFont
-    from reportlab.pdfbase.cidfonts import UnicodeCIDFont
-    import platform
-    HAS_PDF = True
-    
-    # محاولة استيراد مكتبات معالجة النص العربي
-    try:
-        import arabic_reshaper
-        from bidi.algorithm import get_display
-        HAS_ARABIC_SUPPORT = True
-        print("✅ تم تحميل مكتبات دعم العربية بنجاح")
-    except ImportError:
-        HAS_ARABIC_SUPPORT = False
-        print("⚠️ مكتبات دعم العربية غير متوفرة - سيتم استخدام التحويل اليدوي")
-        
-except Exception:
-    HAS_PDF = False
-    HAS_ARABIC_SUPPORT = False
+import payroll_db
+import payroll_events as events
+import payroll_profile as profile
+
+import payroll_core as core
+from payroll_core import REPORTS_DIR
 
 APP_TITLE = "نظام إدارة مرتبات العمال (حسب الأوردر)"
-DB_PATH = os.path.join("data", "payroll_new.db")
-REPORTS_DIR = "reports"
+BUSY_DELAY_MS = 150
+# تشغيل البرنامج بهذا الخيار يسجل زمن الفتح في STARTUP_LOG ثم يغلقه (للقياس على الأجهزة)
+STARTUP_FLAG = "--startup-time"
+STARTUP_LOG = os.path.join("data", "startup.log")
+# وضع العميل: python payroll_system.py --server http://جهاز-الخادم:8765 (أو متغير البيئة PAYROLL_SERVER)
+SERVER_FLAG = "--server"
+SERVER_ENV = "PAYROLL_SERVER"
 
-def register_arabic_font():
-    """تسجيل خط عربي يدعمه reportlab مع دعم الاتجاه الصحيح"""
-    try:
-        system = platform.system()
-        
-        if system == "Windows":
-            # خطوط تدعم العربية بشكل أفضل في Windows
-            arabic_fonts = [
-                "C:/Windows/Fonts/arial.ttf",
-                "C:/Windows/Fonts/tahoma.ttf",
-                "C:/Windows/Fonts/calibri.ttf",
-                "C:/Windows/Fonts/segoeui.ttf",
-                "C:/Windows/Fonts/times.ttf"
-            ]
-        elif system == "Linux":
-            # خطوط تدعم العربية بشكل أفضل في Linux
-            arabic_fonts = [
-                "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf",
-                "/usr/share/fonts/truetype/liberation/LiberationSans-Regular.ttf",
-                "/usr/share/fonts/TTF/DejaVuSans.ttf",
-                "/usr/share/fonts/truetype/noto/NotoSansArabic-Regular.ttf",
-                "/usr/share/fonts/truetype/noto/NotoNastaliqUrdu-Regular.ttf"
-            ]
-        else:  # macOS
-            arabic_fonts = [
-                "/System/Library/Fonts/Arial.ttf",
-                "/System/Library/Fonts/Helvetica.ttf",
-                "/Library/Fonts/Arial.ttf"
-            ]
-        
-        for font_path in arabic_fonts:
-            if os.path.exists(font_path):
-                try:
-                    # تسجيل الخط مع اسم مخصص
-                    pdfmetrics.registerFont(TTFont('ArabicFont', font_path))
-                    print(f"✅ تم تسجيل الخط العربي: {font_path}")
-                    return 'ArabicFont'
-                except Exception as e:
-                    print(f"❌ فشل تسجيل الخط {font_path}: {e}")
-                    continue
-        
-        # إذا لم يتم العثور على خط عربي، استخدم الخط الافتراضي
-        print("⚠️ لم يتم العثور على خط عربي، استخدام الخط الافتراضي")
-        return 'Helvetica'
-            
-    except Exception as e:
-        print(f"❌ خطأ في تسجيل الخط العربي: {e}")
-        return 'Helvetica'
+# مصدر البيانات: payroll_core على القاعدة المحلية، أو payroll_client.Client في وضع العميل
+api = core
 
-def process_arabic_text(text):
-    """معالجة النص العربي لعرضه بشكل صحيح في PDF"""
-    try:
-        if not isinstance(text, str):
-            text = str(text)
-            
-        # التحقق من وجود نص عربي
-        has_arabic = any('\u0600' <= char <= '\u06FF' for char in text)
-        
-        if has_arabic and HAS_ARABIC_SUPPORT:
-            # استخدام مكتبات معالجة النص العربي
+# reportlab ومكتبات العربية بطيئة التحميل ونادرًا ما تُستخدم: payroll_pdf يُستورد عند أول تصدير فقط
+HAS_PDF = importlib.util.find_spec("reportlab") is not None
+
+def pdf_call(name):
+    """دالة من payroll_pdf تستورده عند أول استدعاء (في خيط الخلفية فلا تتجمد الواجهة).
+    في وضع العميل يرسم الخادم التقرير ويُنزل الملف"""
+    def call(*args, **kwargs):
+        if api is not core:
+            return getattr(api, name)(*args, **kwargs)
+        import payroll_pdf
+        if not payroll_pdf.HAS_PDF:
+            raise RuntimeError("مكتبة reportlab غير مثبتة أو لا تعمل")
+        return getattr(payroll_pdf, name)(*args, **kwargs)
+    call.__qualname__ = f"payroll_pdf.{name}"
+    return call
+
+def raises_call(name):
+    """دالة من payroll_raises (يستورد numpy) عند أول استدعاء في خيط الخلفية، أو من الخادم في وضع العميل"""
+    def call(*args, **kwargs):
+        if api is not core:
+            return getattr(api, name)(*args, **kwargs)
+        import payroll_raises
+        return getattr(payroll_raises, name)(*args, **kwargs)
+    call.__qualname__ = f"payroll_raises.{name}"
+    return call
+
+# ============================= Background DB =============================
+class _DbRequest:
+    __slots__ = ("fn", "args", "on_done", "on_error", "key", "cancelled")
+
+    def __init__(self, fn, args, on_done, on_error, key):
+        self.fn = fn
+        self.args = args
+        self.on_done = on_done
+        self.on_error = on_error
+        self.key = key
+        self.cancelled = False
+
+
+class DbWorker:
+    """خيط واحد لكل عمليات قاعدة البيانات: الواجهة ترسل الطلب وتستلم النتيجة عبر after()
+    فلا يتجمد البرنامج أثناء استعلام بطيء. الطلبات تُنفذ بالترتيب، وطلب جديد بنفس المفتاح
+    (key) يلغي القديم إن لم تصل نتيجته بعد (مثل تغيير الاختيار بسرعة)"""
+    POLL_MS = 20
+    # بدون طلبات معلقة: فحص أبطأ لما يصل عبر dispatch من خيوط أخرى (أحداث الخادم)
+    IDLE_POLL_MS = 200
+
+    def __init__(self, root, on_busy=None, idle_poll=False):
+        self.root = root
+        self.on_busy = on_busy
+        self.idle_poll = idle_poll
+        self.requests = queue.Queue()
+        self.results = queue.Queue()
+        self.latest = {}
+        self.pending = 0
+        self._poll_job = None
+        self.thread = threading.Thread(target=self._run, name="db-worker", daemon=True)
+        self.thread.start()
+
+    def submit(self, fn, *args, on_done=None, on_error=None, key=None):
+        request = _DbRequest(fn, args, on_done, on_error, key)
+        if key is not None:
+            old = self.latest.get(key)
+            if old is not None:
+                old.cancelled = True
+            self.latest[key] = request
+        self._started()
+        self.requests.put(request)
+        return request
+
+    def track(self, future, on_done=None, on_error=None):
+        """مثل submit لعملية تعمل في خيط آخر (طابور الكتابة): on_done(النتيجة) على خيط الواجهة عند اكتمال future"""
+        request = _DbRequest(None, (), on_done, on_error, None)
+        self._started()
+
+        def finished(future):
+            error = future.exception()
+            self.results.put(("done", request, None if error else future.result(), error))
+
+        future.add_done_callback(finished)
+        return request
+
+    def _started(self):
+        self.pending += 1
+        if self.pending == 1 and self.on_busy:
+            self.on_busy(True)
+        if self._poll_job is None:
+            self._poll_job = self.root.after(self.POLL_MS, self._poll)
+
+    def dispatch(self, callback):
+        """تنفيذ callback على خيط الواجهة (يُستدعى من خيط قاعدة البيانات لتوصيل الأحداث).
+        يصل قبل نتيجة الطلب الذي نشره"""
+        self.results.put(("event", callback))
+
+    def stop(self, timeout=2):
+        self.requests.put(None)
+        self.thread.join(timeout)
+
+    def _run(self):
+        profile.start_thread_profiler()
+        while True:
+            request = self.requests.get()
+            if request is None:
+                break
+            if request.cancelled:
+                self.results.put(("done", request, None, None))
+                continue
             try:
-                reshaped_text = arabic_reshaper.reshape(text)
-                bidi_text = get_display(reshaped_text)
-                return bidi_text
+                result, error = profile.call("db:" + profile.label(request.fn), request.fn, *request.args), None
             except Exception as e:
-                print(f"خطأ في معالجة النص العربي بالمكتبات: {e}")
-                return transliterate_arabic(text)
-        elif has_arabic:
-            # استخدام التحويل اليدوي
-            return transliterate_arabic(text)
-        else:
-            return text
-            
-    except Exception as e:
-        print(f"خطأ في معالجة النص: {e}")
-        return str(text)
-
-def transliterate_arabic(text):
-    """تحويل النص العربي لأحرف لاتينية"""
-    # أسماء شائعة - الأولوية للأسماء الكاملة
-    common_names = {
-        'أحمد': 'Ahmed',
-        'محمد': 'Mohamed', 
-        'خالد': 'Khaled',
-        'محمود': 'Mahmoud',
-        'سارة': 'Sara',
-        'الغردقة': 'Hurghada',
-        'القاهرة': 'Cairo',
-        'الإسكندرية': 'Alexandria',
-        'المرتب': 'Salary',
-        'بدل الانتقالات': 'Transport',
-        'الإجمالي': 'Total',
-        'الموظف': 'Employee',
-        'المنطقة': 'Area',
-        'العنوان': 'Address',
-        'التاريخ': 'Date',
-        'تقرير الأوردر رقم': 'Order Report #',
-        'إجمالي المبلغ': 'Total Amount',
-        'جنيه مصري': 'EGP'
-    }
-    
-    # البحث عن الأسماء الشائعة أولاً
-    if text in common_names:
-        return common_names[text]
-    
-    # البحث عن الكلمات المركبة
-    for arabic, english in common_names.items():
-        if arabic in text:
-            text = text.replace(arabic, english)
-    
-    # التحويل حرف بحرف للكلمات المتبقية
-    arabic_to_latin = {
-        'أ': 'A', 'ا': 'A', 'ب': 'B', 'ت': 'T', 'ث': 'Th', 'ج': 'J', 'ح': 'H', 'خ': 'Kh',
-        'د': 'D', 'ذ': 'Th', 'ر': 'R', 'ز': 'Z', 'س': 'S', 'ش': 'Sh', 'ص': 'S',
-        'ض': 'D', 'ط': 'T', 'ظ': 'Z', 'ع': 'A', 'غ': 'Gh', 'ف': 'F', 'ق': 'Q',
-        'ك': 'K', 'ل': 'L', 'م': 'M', 'ن': 'N', 'ه': 'H', 'و': 'W', 'ي': 'Y',
-        'ة': 'h', 'ى': 'a', 'ئ': 'Y', 'ء': 'A', 'ؤ': 'W'
-    }
-    
-    transliterated = ''
-    for char in text:
-        if char in arabic_to_latin:
-            transliterated += arabic_to_latin[char]
+                result, error = None, e
+            self.results.put(("done", request, result, error))
+        profile.stop_thread_profiler()
+        payroll_db.close_thread()
+
+    def _poll(self):
+        self._poll_job = None
+        try:
+            while True:
+                msg = self.results.get_nowait()
+                try:
+                    if msg[0] == "event":
+                        msg[1]()
+                    else:
+                        self._finish(*msg[1:])
+                except Exception:
+                    self.root.report_callback_exception(*sys.exc_info())
+        except queue.Empty:
+            pass
+        if self._poll_job is None and (self.pending or self.idle_poll):
+            self._poll_job = self.root.after(self.POLL_MS if self.pending else self.IDLE_POLL_MS, self._poll)
+
+    def _finish(self, request, result, error):
+        self.pending -= 1
+        if request.key is not None and self.latest.get(request.key) is request:
+            del self.latest[request.key]
+        if self.pending == 0 and self.on_busy:
+            self.on_busy(False)
+        if request.cancelled:
+            return
+        if error is None:
+            if request.on_done:
+                profile.call("ui:" + profile.label(request.on_done), request.on_done, result)
+        elif request.on_error:
+            request.on_error(error)
         else:
-            transliterated += char
-    
-    return transliterated
+            messagebox.showerror("خطأ", str(error))
+
 
-def draw_arabic_text(canvas, text, x, y, font_name, font_size):
-    """رسم نص عربي مع تحسين الاتجاه"""
+db_worker = None
+# طابور الكتابة المجمعة لحفظ الأوردرات على القاعدة المحلية (يُنشأ عند أول حفظ، ولا يُستخدم في وضع العميل)
+writes = None
+
+def run_db(fn, *args, on_done=None, on_error=None, key=None):
+    """تنفيذ fn(*args) في خيط قاعدة البيانات ثم on_done(النتيجة) على خيط الواجهة.
+    قبل تشغيل الخيط يُنفذ مباشرة"""
+    if db_worker is not None:
+        return db_worker.submit(fn, *args, on_done=on_done, on_error=on_error, key=key)
     try:
-        # تحديد الخط
-        try:
-            canvas.setFont(font_name, font_size)
-        except:
-            canvas.setFont('Helvetica', font_size)
-            font_name = 'Helvetica'
-        
-        # معالجة النص العربي
-        processed_text = process_arabic_text(text)
-        
-        # رسم النص
-        canvas.drawString(x, y, processed_text)
-            
+        result = fn(*args)
     except Exception as e:
-        print(f"خطأ في رسم النص: {e}")
-        # استخدام الخط الافتراضي كبديل
-        try:
-            canvas.setFont('Helvetica', font_size)
-            canvas.drawString(x, y, str(text))
-        except:
-            canvas.setFont('Helvetica', 12)
-            canvas.drawString(x, y, "Text Error")
+        if on_error:
+            on_error(e)
+        else:
+            messagebox.showerror("خطأ", str(e))
+        return
+    if on_done:
+        on_done(result)
 
-# ============================= Helpers =============================
-def ensure_dirs():
-    os.makedirs("data", exist_ok=True)
-    os.makedirs(REPORTS_DIR, exist_ok=True)
+def run_write(fn, *args, on_done=None, on_error=None):
+    """كتابة عبر طابور الكتابة المجمعة: الواجهة لا تنتظر، و on_done بعد أن تُحفظ فعلًا على القرص.
+    في وضع العميل يجمع الخادم الكتابات بنفسه فتمر عبر run_db"""
+    global writes
+    if api is not core or db_worker is None:
+        return run_db(fn, *args, on_done=on_done, on_error=on_error)
+    if writes is None:
+        from payroll_writer import GroupCommitQueue
+        writes = GroupCommitQueue()
+    return db_worker.track(writes.submit(fn, *args), on_done, on_error)
 
-def db():
-    return sqlite3.connect(DB_PATH)
+def on_integrity_error(message):
+    """on_error يعرض message لأخطاء التكرار/الربط ({e} = نص الخطأ) وأي خطأ آخر كما هو"""
+    def handler(e):
+        messagebox.showerror("خطأ", message.format(e=e) if isinstance(e, sqlite3.IntegrityError) else str(e))
+    return handler
 
-def init_db():
-    if not os.path.exists(DB_PATH):
-        print("إنشاء قاعدة بيانات جديدة...")
-    else:
-        print("استخدام قاعدة البيانات الموجودة...")
-    
-    conn = db()
-    c = conn.cursor()
-    
-    # Employees
-    c.execute("""
-    CREATE TABLE IF NOT EXISTS employees(
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        name TEXT NOT NULL UNIQUE
-    )""")
-    
-    # Areas
-    c.execute("""
-    CREATE TABLE IF NOT EXISTS areas(
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        name TEXT NOT NULL UNIQUE
-    )""")
-    
-    # Salary per (employee × area)
-    c.execute("""
-    CREATE TABLE IF NOT EXISTS employee_area_salary(
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        employee_id INTEGER NOT NULL,
-        area_id INTEGER NOT NULL,
-        salary REAL NOT NULL,
-        UNIQUE(employee_id, area_id),
-        FOREIGN KEY(employee_id) REFERENCES employees(id),
-        FOREIGN KEY(area_id) REFERENCES areas(id)
-    )""")
-    
-    # Orders
-    c.execute("""
-    CREATE TABLE IF NOT EXISTS orders(
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        area_id INTEGER NOT NULL,
-        address TEXT,
-        created_at TEXT NOT NULL,
-        FOREIGN KEY(area_id) REFERENCES areas(id)
-    )""")
-    
-    # Order details (employees in each order)
-    c.execute("""
-    CREATE TABLE IF NOT EXISTS order_employees(
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        order_id INTEGER NOT NULL,
-        employee_id INTEGER NOT NULL,
-        salary REAL NOT NULL,
-        transport REAL NOT NULL DEFAULT 0,
-        total REAL NOT NULL,
-        FOREIGN KEY(order_id) REFERENCES orders(id),
-        FOREIGN KEY(employee_id) REFERENCES employees(id)
-    )""")
-    
-    # إضافة بيانات تجريبية
-    c.execute("SELECT COUNT(*) FROM employees")
-    if c.fetchone()[0] == 0:
-        print("إضافة بيانات تجريبية...")
-        employees = [("أحمد",), ("محمد",), ("خالد",), ("محمود",), ("سارة",)]
-        c.executemany("INSERT INTO employees(name) VALUES(?)", employees)
-        
-        areas = [("الغردقة",), ("القاهرة",), ("الإسكندرية",)]
-        c.executemany("INSERT INTO areas(name) VALUES(?)", areas)
-        
-        # رواتب تجريبية
-        c.execute("SELECT id,name FROM employees")
-        emp_map = {name: emp_id for emp_id, name in c.fetchall()}
-        c.execute("SELECT id,name FROM areas")
-        area_map = {name: area_id for area_id, name in c.fetchall()}
-        
-        salary_data = [
-            (emp_map["أحمد"], area_map["الغردقة"], 5000),
-            (emp_map["محمد"], area_map["الغردقة"], 5400),
-            (emp_map["خالد"], area_map["الغردقة"], 4800),
-            (emp_map["محمود"], area_map["القاهرة"], 6100),
-            (emp_map["سارة"], area_map["الإسكندرية"], 5900),
-            (emp_map["أحمد"], area_map["القاهرة"], 7000),
-        ]
-        c.executemany("INSERT INTO employee_area_salary(employee_id, area_id, salary) VALUES (?,?,?)", salary_data)
-    else:
-        print("البيانات التجريبية موجودة بالفعل...")
-    
-    conn.commit()
-    conn.close()
-    print("تم إنشاء قاعدة البيانات بنجاح!")
+# ============================= Lazy Table =============================
+class ListSource:
+    """مصدر صفوف من قائمة في الذاكرة بنفس واجهة core.SqlSource (المفتاح = رقم الصف)"""
+    in_memory = True
+
+    def __init__(self, rows=()):
+        self.rows = list(rows)
+
+    def key(self, row):
+        return row[-1]
+
+    def _wrap(self, start, rows):
+        return [tuple(r) + (start + i,) for i, r in enumerate(rows)]
+
+    def count(self):
+        return len(self.rows)
+
+    def first(self, limit):
+        return self._wrap(0, self.rows[:limit])
+
+    def after(self, key, limit):
+        return self._wrap(key + 1, self.rows[key + 1:key + 1 + limit])
+
+    def before(self, key, limit):
+        start = max(0, key - limit)
+        return self._wrap(start, self.rows[start:key])
+
+    def slice(self, offset, limit):
+        return self._wrap(offset, self.rows[offset:offset + limit])
+
+
+class LazyTree(ttk.Frame):
+    """Treeview يحمل الصفوف على دفعات حسب موضع التمرير،
+    ويحتفظ فقط بالنافذة الظاهرة مع هامش صغير قبلها وبعدها"""
+    def __init__(self, parent, columns, source=None, widths=None, height=12, page_size=100, iid_index=None):
+        super().__init__(parent)
+        self.source = source
+        self.ncols = len(columns)
+        self.page_size = page_size
+        self.max_rows = page_size * 3
+        self.iid_index = iid_index
+        self.rows = []
+        self.items = []
+        self.offset = 0
+        self.total = 0
+        self._pending = None
+        self._jump_job = None
+        self._generation = 0
+        self._loading = False
+        self.tree = ttk.Treeview(self, columns=[col for col, _ in columns], show="headings", height=height)
+        for col, txt in columns:
+            self.tree.heading(col, text=txt)
+            self.tree.column(col, anchor="center")
+            if widths and col in widths:
+                self.tree.column(col, width=widths[col])
+        self.tree.pack(side="left", fill="both", expand=True)
+        self.sb = ttk.Scrollbar(self, orient="vertical", command=self._on_scrollbar)
+        self.sb.pack(side="right", fill="y")
+        self.tree.configure(yscrollcommand=self._on_tree_scroll)
+
+    def set_source(self, source):
+        self.source = source
+        self.reload()
+
+    def reload(self):
+        """إعادة التحميل من أول الصفوف (في خيط قاعدة البيانات)"""
+        if self.source is None:
+            self.clear()
+            return
+        source, limit = self.source, self.max_rows
+        self._request(lambda: (source.count(), source.first(limit)), self._apply_reload)
+
+    def clear(self):
+        self.source = None
+        self.total = 0
+        self._generation += 1
+        self._loading = False
+        self._fill([], 0)
+
+    def _request(self, fn, apply):
+        """تحميل في الخلفية؛ أي طلب أحدث لنفس الجدول يلغي السابق ويتجاهل نتيجته"""
+        self._generation += 1
+        generation = self._generation
+        if self.source.in_memory:
+            # لا حاجة لخيط قاعدة البيانات لصفوف موجودة في الذاكرة
+            self._loading = False
+            apply(fn())
+            return
+        self._loading = True
+
+        def done(result):
+            if generation == self._generation:
+                self._loading = False
+                apply(result)
+
+        def failed(e):
+            if generation == self._generation:
+                self._loading = False
+            messagebox.showerror("خطأ", f"تعذر تحميل البيانات.\n{e}")
+
+        run_db(fn, on_done=done, on_error=failed, key=("table", str(self)))
+
+    def _apply_reload(self, result):
+        self.total, rows = result
+        self._fill(rows, 0)
+
+    # ---------- Treeview content ----------
+    def _insert(self, index, row):
+        iid = None if self.iid_index is None else str(row[self.iid_index])
+        profile.count("tree_inserts")
+        return self.tree.insert("", index, iid=iid, values=row[:self.ncols])
+
+    def _fill(self, rows, offset):
+        if self.items:
+            self.tree.delete(*self.items)
+        self.rows = list(rows)
+        self.items = [self._insert("end", row) for row in self.rows]
+        self.offset = offset
+
+    def _new_rows(self, rows):
+        # صف أضيف بحدث أثناء التحميل قد يرجع مرة أخرى مع الدفعة
+        if self.iid_index is None:
+            return rows
+        return [row for row in rows if not self.tree.exists(str(row[self.iid_index]))]
+
+    def _load_forward(self):
+        self._pending = None
+        if not self.rows or self._loading:
+            return
+        source, key, limit = self.source, self.source.key(self.rows[-1]), self.page_size
+        self._request(lambda: source.after(key, limit), self._apply_forward)
+
+    def _apply_forward(self, rows):
+        if not rows:
+            self.total = self.offset + len(self.rows)
+            return
+        rows = self._new_rows(rows)
+        top = float(self.tree.yview()[0]) * len(self.rows)
+        self.rows.extend(rows)
+        self.items.extend(self._insert("end", row) for row in rows)
+        drop = len(self.rows) - self.max_rows
+        if drop > 0:
+            self.tree.delete(*self.items[:drop])
+            del self.rows[:drop]
+            del self.items[:drop]
+            self.offset += drop
+            top -= drop
+        self.total = max(self.total, self.offset + len(self.rows))
+        if self.rows:
+            self.tree.yview_moveto(max(0.0, top) / len(self.rows))
+
+    def _load_backward(self):
+        self._pending = None
+        if not self.rows or self._loading:
+            return
+        source, key, limit = self.source, self.source.key(self.rows[0]), self.page_size
+        self._request(lambda: source.before(key, limit), self._apply_backward)
+
+    def _apply_backward(self, rows):
+        if not rows:
+            self.offset = 0
+            return
+        rows = self._new_rows(rows)
+        top = float(self.tree.yview()[0]) * len(self.rows) + len(rows)
+        self.rows[0:0] = rows
+        self.items[0:0] = [self._insert(i, row) for i, row in enumerate(rows)]
+        self.offset = max(0, self.offset - len(rows))
+        drop = len(self.rows) - self.max_rows
+        if drop > 0:
+            self.tree.delete(*self.items[-drop:])
+            del self.rows[-drop:]
+            del self.items[-drop:]
+        if self.rows:
+            self.tree.yview_moveto(top / len(self.rows))
+
+    def _jump(self, target):
+        self._jump_job = None
+        start = max(0, min(target - self.page_size, self.total - self.max_rows))
+        source, limit = self.source, self.max_rows
+
+        def apply(rows):
+            self._fill(rows, start)
+            if self.rows:
+                self.tree.yview_moveto((target - start) / len(self.rows))
+
+        self._request(lambda: source.slice(start, limit), apply)
+
+    # ---------- Deltas ----------
+    def insert_row(self, row):
+        """إضافة صف جديد في موضعه داخل النافذة بدون إعادة تحميل"""
+        if self.source is None:
+            return
+        had_more = self.offset + len(self.rows) < self.total
+        self.total += 1
+        key = self.source.key(row)
+        if self.source.descending:
+            goes_before = lambda other: key > other
+        else:
+            goes_before = lambda other: key < other
+        pos = 0
+        while pos < len(self.rows) and not goes_before(self.source.key(self.rows[pos])):
+            pos += 1
+        if pos == 0 and self.offset > 0:
+            self.offset += 1
+            return
+        if pos == len(self.rows) and had_more:
+            return
+        self.rows.insert(pos, row)
+        self.items.insert(pos, self._insert(pos, row))
+
+    def update_row(self, iid, row):
+        if iid in self.items:
+            i = self.items.index(iid)
+            self.rows[i] = row
+            self.tree.item(iid, values=row[:self.ncols])
+
+    def remove_row(self, iid):
+        if iid in self.items:
+            i = self.items.index(iid)
+            self.tree.delete(iid)
+            del self.rows[i]
+            del self.items[i]
+            self.total = max(0, self.total - 1)
+
+    def update_rows(self, match, make):
+        """تعديل الصفوف المحملة التي تطابق الشرط (مثل تغيير اسم موظف)"""
+        for i, row in enumerate(self.rows):
+            if match(row):
+                self.update_row(self.items[i], make(row))
+
+    def remove_rows(self, match):
+        for iid in [iid for iid, row in zip(self.items, self.rows) if match(row)]:
+            self.remove_row(iid)
+
+    # ---------- Scrolling ----------
+    def _on_tree_scroll(self, first, last):
+        first, last = float(first), float(last)
+        n = len(self.rows)
+        if n and self.total:
+            self.sb.set((self.offset + first * n) / self.total,
+                        min(1.0, (self.offset + last * n) / self.total))
+        else:
+            self.sb.set(0.0, 1.0)
+        if self._pending is not None or self._loading or not n:
+            return
+        if last >= 0.98 and self.offset + n < self.total:
+            self._pending = self.after_idle(self._load_forward)
+        elif first <= 0.02 and self.offset > 0:
+            self._pending = self.after_idle(self._load_backward)
+
+    def _on_scrollbar(self, action, *args):
+        if action != "moveto" or not self.rows:
+            self.tree.yview(action, *args)
+            return
+        target = int(float(args[0]) * self.total)
+        n = len(self.rows)
+        visible = int(self.tree.cget("height"))
+        all_loaded = self.offset == 0 and n >= self.total
+        if all_loaded or self.offset <= target <= self.offset + n - visible:
+            self.tree.yview_moveto((target - self.offset) / n)
+            return
+        # القفز لمكان بعيد: تحميل النافذة الجديدة بعد توقف السحب لحظة
+        if self._jump_job is not None:
+            self.after_cancel(self._jump_job)
+        self._jump_job = self.after(40, lambda: self._jump(target))
+
+class NameChoices:
+    """أسماء Combobox مرتبة مع تحديث جزئي عند الإضافة أو التعديل أو الحذف"""
+    def __init__(self, combobox):
+        self.cmb = combobox
+        self.ids = {}
+        self.names = {}
+        self.sorted = []
+
+    def load(self, rows):
+        self.ids = {name: rid for rid, name in rows}
+        self.names = {rid: name for rid, name in rows}
+        self.sorted = sorted(self.ids)
+        self.cmb['values'] = self.sorted
+
+    def add(self, rid, name):
+        self.ids[name] = rid
+        self.names[rid] = name
+        bisect.insort(self.sorted, name)
+        self.cmb['values'] = self.sorted
+
+    def remove(self, rid):
+        name = self.names.pop(rid, None)
+        if name is None:
+            return
+        del self.ids[name]
+        self.sorted.remove(name)
+        self.cmb['values'] = self.sorted
+        if self.cmb.get() == name:
+            self.cmb.set('')
+
+    def rename(self, rid, name):
+        selected = self.cmb.get() == self.names.get(rid)
+        self.remove(rid)
+        self.add(rid, name)
+        if selected:
+            self.cmb.set(name)
+
+class NameIndex:
+    """أسماء مرتبة في الذاكرة للبحث أثناء الكتابة: الأسماء التي تبدأ بالنص (bisect) ثم التي تحتويه.
+    البحث داخل الاسم يتم على نص واحد يضم كل الأسماء فلا يمر على الأسماء واحدًا واحدًا في Python،
+    وإضافة حرف للبحث تفلتر النتائج السابقة فقط"""
+    def __init__(self, rows, name_index=1):
+        self.rows = sorted(rows, key=lambda r: r[name_index].casefold())
+        self.keys = [r[name_index].casefold() for r in self.rows]
+        self.blob = "\n".join(self.keys)
+        self.starts = list(itertools.accumulate((len(k) + 1 for k in self.keys[:-1]), initial=0))
+        self._last = ("", None)
+
+    def search(self, text):
+        """مواضع الصفوف المطابقة في self.rows"""
+        text = text.strip().casefold()
+        if not text:
+            return list(range(len(self.rows)))
+        lo = bisect.bisect_left(self.keys, text)
+        hi = bisect.bisect_left(self.keys, text + "\uffff")
+        last_text, last = self._last
+        if last_text and text.startswith(last_text):
+            # ما كان يبدأ بالنص السابق قد يصبح "يحتوي" فقط، فيُعاد ترتيبه مع الباقي كالبحث من البداية
+            contains = sorted(i for i in last if not lo <= i < hi and text in self.keys[i])
+        else:
+            contains = self._find_all(text, lo, hi)
+        result = list(range(lo, hi)) + contains
+        self._last = (text, result)
+        return result
+
+    def _find_all(self, text, lo, hi):
+        found = []
+        pos = self.blob.find(text)
+        while pos != -1:
+            i = bisect.bisect_right(self.starts, pos) - 1
+            if not lo <= i < hi:
+                found.append(i)
+            if i + 1 >= len(self.starts):
+                break
+            pos = self.blob.find(text, self.starts[i + 1])
+        return found
+
+class AreaSalaryCache:
+    """رواتب الموظفين لكل منطقة في الذاكرة: اختيار الموظفين مرة أخرى لنفس المنطقة بدون استعلام.
+    لأوردر بتاريخ سابق يُحمل سجل رواتب المنطقة مرة واحدة (core.SalaryHistory) وأي تاريخ بعدها
+    يُحسب في الذاكرة. أي تعديل يصل كحدث ويمسح المنطقة المتأثرة فقط"""
+    def __init__(self):
+        self.rows = {}
+        self.history = {}
+        events.subscribe(events.MAPPING_SAVED, lambda area_id, **_: self.invalidate(area_id))
+        events.subscribe(events.MAPPING_DELETED, lambda area_id, **_: self.invalidate(area_id))
+        events.subscribe(events.SALARY_HISTORY, lambda area_id, **_: self.invalidate(area_id))
+        events.subscribe(events.AREA_DEFAULT_SALARY, lambda area_id, **_: self.invalidate(area_id))
+        events.subscribe(events.AREA_DELETED, self.invalidate)
+        events.subscribe(events.SALARIES_ADJUSTED, lambda applied, **_: applied and self.clear())
+        # المناطق بدون رواتب مسجلة تعرض كل الموظفين، لذلك أي تغيير في الموظفين يمسح الكل
+        for topic in (events.EMPLOYEE_ADDED, events.EMPLOYEE_RENAMED, events.EMPLOYEE_DELETED):
+            events.subscribe(topic, lambda **_: self.clear())
+
+    def get(self, area_id, on_done, day=None):
+        """on_done(الصفوف) فورًا من الذاكرة أو بعد تحميلها في خيط قاعدة البيانات.
+        day = المرتبات السارية يوم الأوردر (None = الحالية)"""
+        if day is not None:
+            self._get_at(area_id, day, on_done)
+            return
+        rows = self.rows.get(area_id)
+        if rows is not None:
+            on_done(rows)
+            return
+
+        def loaded(rows):
+            self.rows[area_id] = rows
+            on_done(rows)
+
+        run_db(api.area_salaries, area_id, on_done=loaded, key="area-salaries")
+
+    def _get_at(self, area_id, day, on_done):
+        cached = self.history.get(area_id)
+        if cached is not None:
+            history, employees, default = cached
+            on_done(history.area_salaries(area_id, day, employees, default))
+            return
+
+        def load():
+            return (core.SalaryHistory(api.salary_history(area_id)), api.list_employees(),
+                    api.area_default_salary(area_id))
+
+        def loaded(cached):
+            self.history[area_id] = cached
+            self._get_at(area_id, day, on_done)
+
+        run_db(load, on_done=loaded, key="area-salaries")
+
+    def invalidate(self, area_id):
+        self.rows.pop(area_id, None)
+        self.history.pop(area_id, None)
+
+    def clear(self):
+        self.rows.clear()
+        self.history.clear()
 
 # ============================= GUI =============================
 class App(tk.Tk):
@@ -301,32 +635,137 @@ class App(tk.Tk):
             pass
         if "clam" in style.theme_names():
             style.theme_use("clam")
-        nb = ttk.Notebook(self)
-        nb.pack(fill="both", expand=True, padx=10, pady=10)
-        self.tab_employees = EmployeesTab(nb)
-        self.tab_areas = AreasTab(nb)
-        self.tab_mapping = MappingTab(nb)
-        self.tab_add_order = AddOrderTab(nb)
-        self.tab_reports = ReportsTab(nb)
-        for t, n in [(self.tab_employees, "الموظفون"),
-                     (self.tab_areas, "المناطق"),
-                     (self.tab_mapping, "رواتب (موظف × منطقة)"),
-                     (self.tab_add_order, "إضافة أوردر جديد"),
-                     (self.tab_reports, "التقارير")]:
-            nb.add(t, text=n)
-        # refresh hooks
-        for t in [self.tab_employees, self.tab_areas, self.tab_mapping, self.tab_add_order, self.tab_reports]:
-            t.set_refresh_hooks(self.refresh_all)
-
-    def refresh_all(self):
-        for t in [self.tab_employees, self.tab_areas, self.tab_mapping, self.tab_add_order, self.tab_reports]:
-            t.refresh()
+        menubar = tk.Menu(self)
+        tools = tk.Menu(menubar, tearoff=0)
+        tools.add_command(label="ملخص الأداء", command=self.show_profile)
+        menubar.add_cascade(label="أدوات", menu=tools)
+        self.config(menu=menubar)
+        status = ttk.Frame(self)
+        status.pack(side="bottom", fill="x", padx=10)
+        self.busy_bar = ttk.Progressbar(status, mode="indeterminate", length=120)
+        self.lbl_busy = ttk.Label(status, text="")
+        self.lbl_busy.pack(side="right")
+        self._busy_job = None
+        # يجب تشغيل خيط قاعدة البيانات قبل إنشاء التبويبات لأنها تحمل بياناتها عبره
+        global db_worker
+        db_worker = DbWorker(self, on_busy=self.set_busy, idle_poll=True)
+        events.set_dispatcher(db_worker.dispatch)
+        # كل تبويب يُبنى ويحمل بياناته عند أول اختيار له، فتظهر النافذة بعد بناء الأول فقط
+        self.nb = ttk.Notebook(self)
+        self.nb.pack(fill="both", expand=True, padx=10, pady=10)
+        self.tab_classes = [(EmployeesTab, "الموظفون"),
+                            (AreasTab, "المناطق"),
+                            (MappingTab, "رواتب (موظف × منطقة)"),
+                            (AddOrderTab, "إضافة أوردر جديد"),
+                            (ReportsTab, "التقارير"),
+                            (PayrollSummaryTab, "ملخص المرتبات")]
+        self.tabs = {}
+        for _, title in self.tab_classes:
+            self.nb.add(ttk.Frame(self.nb), text=title)
+        self.nb.bind("<<NotebookTabChanged>>", lambda e: self.build_current_tab())
+        self.build_current_tab()
+        self._shown = False
+        self.bind("<Map>", self._on_map)
+
+    def reload_tabs(self):
+        """إعادة تحميل كل التبويبات المبنية (عندما تفوت العميل تغييرات من الخادم)"""
+        for tab in self.tabs.values():
+            tab.refresh()
+
+    def build_current_tab(self):
+        index = self.nb.index("current")
+        if index in self.tabs:
+            return
+        tab_class = self.tab_classes[index][0]
+        holder = self.nb.nametowidget(self.nb.tabs()[index])
+        self.tabs[index] = profile.call(f"build:{tab_class.__name__}", tab_class, holder)
+        self.tabs[index].pack(fill="both", expand=True)
+
+    def _on_map(self, event):
+        # <Map> يصل لكل عنصر داخل النافذة؛ المطلوب أول ظهور للنافذة نفسها
+        if event.widget is not self or self._shown:
+            return
+        self._shown = True
+        self.after_idle(self._startup_done)
+
+    def _startup_done(self):
+        elapsed = time.perf_counter() - STARTED
+        profile.record("startup", elapsed)
+        if STARTUP_FLAG not in sys.argv:
+            return
+        uptime = profile.process_uptime()
+        print(f"زمن الفتح: {elapsed * 1000:.0f} ms"
+              + (f" (من بدء العملية {uptime * 1000:.0f} ms)" if uptime is not None else ""))
+        try:
+            with open(STARTUP_LOG, "a", encoding="utf-8") as f:
+                f.write(f"{datetime.now().isoformat(timespec='seconds')}\t{elapsed * 1000:.0f}\t"
+                        f"{'' if uptime is None else round(uptime * 1000)}\t"
+                        f"{'frozen' if getattr(sys, 'frozen', False) else 'python'}\n")
+        except OSError as e:
+            print(f"⚠️ تعذر كتابة {STARTUP_LOG}: {e}")
+        self.destroy()
+
+    def set_busy(self, busy):
+        # المؤشر يظهر فقط إذا طال الانتظار حتى لا يومض مع الاستعلامات السريعة
+        if busy:
+            self._busy_job = self.after(BUSY_DELAY_MS, self._show_busy)
+            return
+        if self._busy_job is not None:
+            self.after_cancel(self._busy_job)
+            self._busy_job = None
+        self.busy_bar.stop()
+        self.busy_bar.pack_forget()
+        self.lbl_busy.config(text="")
+
+    def _show_busy(self):
+        self._busy_job = None
+        self.lbl_busy.config(text="جاري التحميل...")
+        self.busy_bar.pack(side="right", padx=5)
+        self.busy_bar.start(15)
+
+    def show_profile(self):
+        if not profile.enabled:
+            if messagebox.askyesno("ملخص الأداء", f"القياس غير مفعل (شغل البرنامج مع {profile.ENV}=1).\nتفعيله الآن؟"):
+                profile.enable()
+            return
+        # لقطة cProfile لخيط قاعدة البيانات تُؤخذ من داخله
+        run_db(profile.snapshot, on_done=lambda _: ProfileDialog(self))
+
+class ProfileDialog(tk.Toplevel):
+    """ملخص أزمنة العمليات والعدادات وأبطأ الاستعلامات منذ التشغيل (أو آخر تصفير)"""
+    def __init__(self, parent):
+        super().__init__(parent)
+        self.title("ملخص الأداء")
+        self.geometry("900x500")
+        self.text = tk.Text(self, wrap="none", font=("Courier", 9))
+        self.text.pack(fill="both", expand=True, padx=8, pady=8)
+        btns = ttk.Frame(self)
+        btns.pack(fill="x", padx=8, pady=(0, 8))
+        ttk.Button(btns, text="تحديث", command=self.refresh).pack(side="right", padx=5)
+        ttk.Button(btns, text="تصفير", command=self.reset).pack(side="right", padx=5)
+        if profile.use_cprofile:
+            ttk.Button(btns, text="حفظ pstats", command=self.save_stats).pack(side="left", padx=5)
+        self.refresh()
+
+    def refresh(self):
+        self.text.delete("1.0", tk.END)
+        self.text.insert("1.0", profile.summary() + (f"\n\n{writes.summary()}" if writes is not None else ""))
+
+    def reset(self):
+        profile.reset()
+        self.refresh()
+
+    def save_stats(self):
+        path = profile.dump_stats()
+        messagebox.showinfo("تم", f"تم حفظ الإحصائيات في:\n{path}" if path else "لا توجد إحصائيات بعد")
 
 # ============================= Employees Tab =============================
+def employees_source():
+    return api.source("employees")
+
 class EmployeesTab(ttk.Frame):
     def __init__(self, parent):
         super().__init__(parent)
-        self.refresh_hook = None
         frm = ttk.LabelFrame(self, text="إضافة موظف")
         frm.pack(side="top", fill="x", padx=8, pady=8)
         ttk.Label(frm, text="اسم الموظف:").grid(row=0, column=0, padx=5, pady=8, sticky="e")
@@ -336,53 +775,40 @@ class EmployeesTab(ttk.Frame):
         
         lst = ttk.LabelFrame(self, text="قائمة الموظفين")
         lst.pack(fill="both", expand=True, padx=8, pady=8)
-        self.tree = ttk.Treeview(lst, columns=("id", "name"), show="headings", height=12)
-        self.tree.heading("id", text="ID")
-        self.tree.heading("name", text="الاسم")
-        self.tree.column("id", width=70, anchor="center")
-        self.tree.column("name", anchor="center")
-        self.tree.pack(side="left", fill="both", expand=True)
-        sb = ttk.Scrollbar(lst, orient="vertical", command=self.tree.yview)
-        sb.pack(side="right", fill="y")
-        self.tree.configure(yscrollcommand=sb.set)
+        self.table = LazyTree(lst, [("id", "ID"), ("name", "الاسم")], widths={"id": 70}, iid_index=0,
+                              source=employees_source())
+        self.table.pack(fill="both", expand=True)
+        self.tree = self.table.tree
         btns = ttk.Frame(self)
         btns.pack(fill="x", padx=8, pady=(0, 8))
         ttk.Button(btns, text="تعديل المحدد", command=self.edit_selected).pack(side="left", padx=5)
         ttk.Button(btns, text="حذف المحدد", command=self.delete_selected).pack(anchor="e")
         self.tree.bind('<Double-1>', lambda e: self.edit_selected())
+        events.subscribe(events.EMPLOYEE_ADDED, self.on_employee_added)
+        events.subscribe(events.EMPLOYEE_RENAMED, self.on_employee_renamed)
+        events.subscribe(events.EMPLOYEE_DELETED, self.on_employee_deleted)
         self.refresh()
 
-    def set_refresh_hooks(self, fn):
-        self.refresh_hook = fn
-
+    @profile.timed
     def refresh(self):
-        for i in self.tree.get_children():
-            self.tree.delete(i)
-        conn = db()
-        c = conn.cursor()
-        c.execute("SELECT id,name FROM employees ORDER BY id DESC")
-        for rid, name in c.fetchall():
-            self.tree.insert("", "end", values=(rid, name))
-        conn.close()
+        self.table.reload()
+
+    def on_employee_added(self, employee_id, name):
+        self.table.insert_row((employee_id, name))
+
+    def on_employee_renamed(self, employee_id, name):
+        self.table.update_row(str(employee_id), (employee_id, name))
+
+    def on_employee_deleted(self, employee_id):
+        self.table.remove_row(str(employee_id))
 
     def add_employee(self):
         name = self.entry_name.get().strip()
         if not name:
             messagebox.showerror("خطأ", "اكتب اسم الموظف.")
             return
-        conn = db()
-        c = conn.cursor()
-        try:
-            c.execute("INSERT INTO employees(name) VALUES(?)", (name,))
-            conn.commit()
-            self.entry_name.delete(0, tk.END)
-            self.refresh()
-            if self.refresh_hook:
-                self.refresh_hook()
-        except sqlite3.IntegrityError:
-            messagebox.showerror("خطأ", "الاسم موجود بالفعل.")
-        finally:
-            conn.close()
+        run_db(api.add_employee, name, on_done=lambda _: self.entry_name.delete(0, tk.END),
+               on_error=on_integrity_error("الاسم موجود بالفعل."))
 
     def edit_selected(self):
         selection = self.tree.selection()
@@ -410,18 +836,11 @@ class EmployeesTab(ttk.Frame):
             if not new_name:
                 messagebox.showerror("خطأ", "ادخل الاسم")
                 return
-            conn = db()
-            c = conn.cursor()
-            try:
-                c.execute("UPDATE employees SET name=? WHERE id=?", (new_name, emp_id))
-                conn.commit()
+            def done(_):
                 dialog.destroy()
-                self.refresh()
                 messagebox.showinfo("تم", "تم التعديل")
-            except sqlite3.IntegrityError:
-                messagebox.showerror("خطأ", "الاسم موجود")
-            finally:
-                conn.close()
+            run_db(api.rename_employee, int(emp_id), new_name, on_done=done,
+                   on_error=on_integrity_error("الاسم موجود"))
         
         ttk.Button(btn_frame, text="حفظ", command=save).pack(side="left", padx=5)
         ttk.Button(btn_frame, text="إلغاء", command=dialog.destroy).pack(side="left", padx=5)
@@ -436,22 +855,15 @@ class EmployeesTab(ttk.Frame):
         rid = self.tree.item(selection[0], "values")[0]
         if not messagebox.askyesno("تأكيد", "هل تريد حذف الموظف المحدد؟"):
             return
-        conn = db()
-        c = conn.cursor()
-        try:
-            c.execute("DELETE FROM employees WHERE id=?", (rid,))
-            conn.commit()
-            self.refresh()
-        except sqlite3.IntegrityError as e:
-            messagebox.showerror("خطأ", f"تعذر الحذف.\n{e}")
-        finally:
-            conn.close()
+        run_db(api.delete_employee, int(rid), on_error=on_integrity_error("تعذر الحذف.\n{e}"))
 
 # ============================= Areas Tab =============================
+def areas_source():
+    return api.source("areas")
+
 class AreasTab(ttk.Frame):
     def __init__(self, parent):
         super().__init__(parent)
-        self.refresh_hook = None
         frm = ttk.LabelFrame(self, text="إضافة منطقة")
         frm.pack(side="top", fill="x", padx=8, pady=8)
         ttk.Label(frm, text="اسم المنطقة:").grid(row=0, column=0, padx=5, pady=8, sticky="e")
@@ -460,49 +872,36 @@ class AreasTab(ttk.Frame):
         ttk.Button(frm, text="إضافة", command=self.add_area).grid(row=0, column=2, padx=5, pady=8)
         lst = ttk.LabelFrame(self, text="قائمة المناطق")
         lst.pack(fill="both", expand=True, padx=8, pady=8)
-        self.tree = ttk.Treeview(lst, columns=("id", "name"), show="headings", height=12)
-        self.tree.heading("id", text="ID")
-        self.tree.heading("name", text="الاسم")
-        self.tree.column("id", width=70, anchor="center")
-        self.tree.column("name", anchor="center")
-        self.tree.pack(side="left", fill="both", expand=True)
-        sb = ttk.Scrollbar(lst, orient="vertical", command=self.tree.yview)
-        sb.pack(side="right", fill="y")
-        self.tree.configure(yscrollcommand=sb.set)
+        self.table = LazyTree(lst, [("id", "ID"), ("name", "الاسم"), ("default_salary", "المرتب الافتراضي")],
+                              widths={"id": 70}, iid_index=0,
+                              source=areas_source())
+        self.table.pack(fill="both", expand=True)
+        self.tree = self.table.tree
         btns = ttk.Frame(self)
         btns.pack(fill="x", padx=8, pady=(0, 8))
+        ttk.Button(btns, text="المرتب الافتراضي للمحدد", command=self.edit_default_salary).pack(side="left", padx=5)
         ttk.Button(btns, text="حذف المحدد", command=self.delete_selected).pack(anchor="e")
+        self.tree.bind('<Double-1>', lambda e: self.edit_default_salary())
+        events.subscribe(events.AREA_ADDED, lambda area_id, name: self.table.insert_row((area_id, name, "")))
+        events.subscribe(events.AREA_DELETED, lambda area_id: self.table.remove_row(str(area_id)))
+        events.subscribe(events.AREA_DEFAULT_SALARY, self.on_default_salary)
         self.refresh()
 
-    def set_refresh_hooks(self, fn):
-        self.refresh_hook = fn
+    def on_default_salary(self, area_id, default_salary):
+        self.table.update_rows(lambda r: r[0] == area_id,
+                               lambda r: (r[0], r[1], "" if default_salary is None else core.format_money(default_salary)))
 
+    @profile.timed
     def refresh(self):
-        for i in self.tree.get_children():
-            self.tree.delete(i)
-        conn = db()
-        c = conn.cursor()
-        c.execute("SELECT id,name FROM areas ORDER BY id DESC")
-        for rid, name in c.fetchall():
-            self.tree.insert("", "end", values=(rid, name))
-        conn.close()
+        self.table.reload()
 
     def add_area(self):
         name = self.entry_name.get().strip()
         if not name:
             messagebox.showerror("خطأ", "اكتب اسم المنطقة.")
             return
-        conn = db()
-        c = conn.cursor()
-        try:
-            c.execute("INSERT INTO areas(name) VALUES(?)", (name,))
-            conn.commit()
-            self.entry_name.delete(0, tk.END)
-            self.refresh()
-        except sqlite3.IntegrityError:
-            messagebox.showerror("خطأ", "الاسم موجود بالفعل.")
-        finally:
-            conn.close()
+        run_db(api.add_area, name, on_done=lambda _: self.entry_name.delete(0, tk.END),
+               on_error=on_integrity_error("الاسم موجود بالفعل."))
 
     def delete_selected(self):
         selection = self.tree.selection()
@@ -512,22 +911,46 @@ class AreasTab(ttk.Frame):
         rid = self.tree.item(selection[0], "values")[0]
         if not messagebox.askyesno("تأكيد", "هل تريد حذف المنطقة المحددة؟"):
             return
-        conn = db()
-        c = conn.cursor()
-        try:
-            c.execute("DELETE FROM areas WHERE id=?", (rid,))
-            conn.commit()
-            self.refresh()
-        except sqlite3.IntegrityError as e:
-            messagebox.showerror("خطأ", f"تعذر الحذف.\n{e}")
-        finally:
-            conn.close()
+        run_db(api.delete_area, int(rid), on_error=on_integrity_error("تعذر الحذف.\n{e}"))
+
+    def edit_default_salary(self):
+        selection = self.tree.selection()
+        if not selection:
+            messagebox.showwarning("تحذير", "اختر منطقة")
+            return
+        area_id, area_name, current = self.tree.item(selection[0])['values']
+
+        dialog = tk.Toplevel(self)
+        dialog.title(f"المرتب الافتراضي - {area_name}")
+        dialog.geometry("320x130")
+        dialog.grab_set()
+        frame = ttk.Frame(dialog)
+        frame.pack(fill="both", expand=True, padx=15, pady=15)
+        ttk.Label(frame, text=f"مرتب موظفي المنطقة بدون رواتب مسجلة (فارغ = {core.format_money(core.DEFAULT_SALARY)}):").pack(anchor="w")
+        entry = ttk.Entry(frame, width=25)
+        entry.insert(0, str(current))
+        entry.pack(fill="x", pady=5)
+
+        def save():
+            text = entry.get().strip()
+            try:
+                salary = core.to_piastres(text) if text else None
+            except ValueError:
+                messagebox.showerror("خطأ", "المرتب يجب أن يكون رقم")
+                return
+            run_db(api.set_area_default_salary, int(area_id), salary, on_done=lambda _: dialog.destroy())
+
+        ttk.Button(frame, text="حفظ", command=save).pack(side="left", padx=5)
+        ttk.Button(frame, text="إلغاء", command=dialog.destroy).pack(side="left", padx=5)
+        entry.focus()
 
 # ============================= Mapping Tab =============================
+def mapping_source():
+    return api.source("mapping")
+
 class MappingTab(ttk.Frame):
     def __init__(self, parent):
         super().__init__(parent)
-        self.refresh_hook = None
         frm = ttk.LabelFrame(self, text="تحديد المرتب (موظف × منطقة)")
         frm.pack(side="top", fill="x", padx=8, pady=8)
         ttk.Label(frm, text="الموظف:").grid(row=0, column=0, padx=5, pady=8, sticky="e")
@@ -540,46 +963,54 @@ class MappingTab(ttk.Frame):
         self.entry_salary = ttk.Entry(frm, width=12)
         self.entry_salary.grid(row=0, column=5, padx=5, pady=8, sticky="w")
         ttk.Button(frm, text="حفظ", command=self.save_mapping).grid(row=0, column=6, padx=5, pady=8)
+        ttk.Label(frm, text="من تاريخ:").grid(row=1, column=4, padx=5, pady=(0, 8), sticky="e")
+        self.entry_from = ttk.Entry(frm, width=12)
+        self.entry_from.grid(row=1, column=5, padx=5, pady=(0, 8), sticky="w")
+        ttk.Label(frm, text="فارغ = اليوم، تاريخ سابق = تصحيح مرتب تلك الفترة").grid(row=1, column=6, padx=5, pady=(0, 8), sticky="w")
         lst = ttk.LabelFrame(self, text="الرواتب المسجلة")
         lst.pack(fill="both", expand=True, padx=8, pady=8)
-        self.tree = ttk.Treeview(lst, columns=("id", "employee", "area", "salary"), show="headings", height=12)
-        self.tree.heading("id", text="ID")
-        self.tree.heading("employee", text="الموظف")
-        self.tree.heading("area", text="المنطقة")
-        self.tree.heading("salary", text="المرتب")
-        self.tree.column("id", width=70, anchor="center")
-        self.tree.column("employee", anchor="center")
-        self.tree.column("area", anchor="center")
-        self.tree.column("salary", anchor="center")
-        self.tree.pack(side="left", fill="both", expand=True)
-        sb = ttk.Scrollbar(lst, orient="vertical", command=self.tree.yview)
-        sb.pack(side="right", fill="y")
-        self.tree.configure(yscrollcommand=sb.set)
+        self.table = LazyTree(lst, [("id", "ID"), ("employee", "الموظف"), ("area", "المنطقة"), ("salary", "المرتب")],
+                              widths={"id": 70}, iid_index=0, source=mapping_source())
+        self.table.pack(fill="both", expand=True)
+        self.tree = self.table.tree
         btns = ttk.Frame(self)
         btns.pack(fill="x", padx=8, pady=(0, 8))
+        ttk.Button(btns, text="زيادة جماعية...", command=lambda: RaiseDialog(self, self.areas, self.employees)).pack(side="left", padx=5)
         ttk.Button(btns, text="حذف المحدد", command=self.delete_selected).pack(anchor="e")
+        self.employees = NameChoices(self.cmb_employee)
+        self.areas = NameChoices(self.cmb_area)
+        events.subscribe(events.EMPLOYEE_ADDED, lambda employee_id, name: self.employees.add(employee_id, name))
+        events.subscribe(events.EMPLOYEE_RENAMED, self.on_employee_renamed)
+        events.subscribe(events.EMPLOYEE_DELETED, self.on_employee_deleted)
+        events.subscribe(events.AREA_ADDED, lambda area_id, name: self.areas.add(area_id, name))
+        events.subscribe(events.AREA_DELETED, self.on_area_deleted)
+        events.subscribe(events.MAPPING_SAVED, self.on_mapping_saved)
+        events.subscribe(events.MAPPING_DELETED, lambda mapping_id, **_: self.table.remove_row(str(mapping_id)))
+        events.subscribe(events.SALARIES_ADJUSTED, lambda applied, **_: applied and self.table.reload())
         self.refresh()
 
-    def set_refresh_hooks(self, fn):
-        self.refresh_hook = fn
-
+    @profile.timed
     def refresh(self):
-        conn = db()
-        c = conn.cursor()
-        c.execute("SELECT id,name FROM employees ORDER BY name")
-        emps = c.fetchall()
-        self.emp_map = {name: emp_id for emp_id, name in emps}
-        self.cmb_employee['values'] = [name for emp_id, name in emps]
-        c.execute("SELECT id,name FROM areas ORDER BY name")
-        areas = c.fetchall()
-        self.area_map = {name: area_id for area_id, name in areas}
-        self.cmb_area['values'] = [name for area_id, name in areas]
-        for i in self.tree.get_children():
-            self.tree.delete(i)
-        c.execute("SELECT mas.id,e.name,a.name,mas.salary FROM employee_area_salary mas JOIN employees e ON e.id=mas.employee_id JOIN areas a ON a.id=mas.area_id ORDER BY a.name,e.name")
-        for rid, emp, area, sal in c.fetchall():
-            self.tree.insert("", "end", values=(rid, emp, area, sal))
-        conn.close()
+        run_db(api.list_employees, on_done=self.employees.load, key=("choices", id(self.employees)))
+        run_db(api.list_areas, on_done=self.areas.load, key=("choices", id(self.areas)))
+        self.table.reload()
+
+    def on_employee_renamed(self, employee_id, name):
+        self.employees.rename(employee_id, name)
+        self.table.update_rows(lambda r: r[5] == employee_id, lambda r: (r[0], name) + r[2:])
+
+    def on_employee_deleted(self, employee_id):
+        self.employees.remove(employee_id)
+        self.table.remove_rows(lambda r: r[5] == employee_id)
+
+    def on_area_deleted(self, area_id):
+        self.areas.remove(area_id)
+        self.table.remove_rows(lambda r: r[4] == area_id)
+
+    def on_mapping_saved(self, mapping_id, employee_id, area_id, salary, employee, area, replaced_id):
+        if replaced_id is not None:
+            self.table.remove_row(str(replaced_id))
+        self.table.insert_row((mapping_id, employee, area, core.format_money(salary), area_id, employee_id))
 
     def save_mapping(self):
         emp = self.cmb_employee.get()
@@ -589,23 +1020,19 @@ class MappingTab(ttk.Frame):
             messagebox.showerror("خطأ", "اكمل جميع الحقول")
             return
         try:
-            sal = float(sal)
-        except:
+            sal = core.to_piastres(sal)
+        except ValueError:
             messagebox.showerror("خطأ", "المرتب يجب أن يكون رقم")
             return
-        emp_id = self.emp_map[emp]
-        area_id = self.area_map[area]
-        conn = db()
-        c = conn.cursor()
-        try:
-            c.execute("INSERT OR REPLACE INTO employee_area_salary(employee_id, area_id, salary) VALUES(?,?,?)", (emp_id, area_id, sal))
-            conn.commit()
-            self.entry_salary.delete(0, tk.END)
-            self.refresh()
-        except Exception as e:
-            messagebox.showerror("خطأ", str(e))
-        finally:
-            conn.close()
+        since = self.entry_from.get().strip()
+        effective_from = parse_date(since) if since else None
+        if since and effective_from is None:
+            messagebox.showerror("خطأ", "التاريخ بصيغة YYYY-MM-DD")
+            return
+        emp_id = self.employees.ids[emp]
+        area_id = self.areas.ids[area]
+        run_db(api.set_salary, emp_id, area_id, sal, effective_from, on_done=lambda _: self.entry_salary.delete(0, tk.END),
+               on_error=lambda e: messagebox.showerror("خطأ", str(e)))
 
     def delete_selected(self):
         selection = self.tree.selection()
@@ -615,21 +1042,140 @@ class MappingTab(ttk.Frame):
         rid = self.tree.item(selection[0], "values")[0]
         if not messagebox.askyesno("تأكيد", "هل تريد حذف العنصر المحدد؟"):
             return
-        conn = db()
-        c = conn.cursor()
+        run_db(api.delete_salary, int(rid))
+
+class RaiseDialog(tk.Toplevel):
+    """زيادة جماعية (نسبة و/أو مبلغ) لرواتب مناطق أو موظفين محددين: معاينة أثرها على تكلفة
+    حجم العمل الفعلي ثم تطبيقها كلها في معاملة واحدة (انظر payroll_raises)"""
+    def __init__(self, parent, areas, employees):
+        super().__init__(parent)
+        self.title("زيادة جماعية للمرتبات")
+        self.geometry("820x600")
+        self.grab_set()
+        self.previewed = None
+
+        frm = ttk.Frame(self)
+        frm.pack(fill="x", padx=10, pady=8)
+        ttk.Label(frm, text="النسبة %:").grid(row=0, column=0, padx=5, pady=5, sticky="e")
+        self.entry_percent = ttk.Entry(frm, width=8)
+        self.entry_percent.grid(row=0, column=1, padx=5, pady=5, sticky="w")
+        ttk.Label(frm, text="مبلغ ثابت:").grid(row=0, column=2, padx=5, pady=5, sticky="e")
+        self.entry_amount = ttk.Entry(frm, width=10)
+        self.entry_amount.grid(row=0, column=3, padx=5, pady=5, sticky="w")
+        ttk.Label(frm, text="تاريخ السريان:").grid(row=0, column=4, padx=5, pady=5, sticky="e")
+        self.entry_effective = ttk.Entry(frm, width=11)
+        self.entry_effective.insert(0, datetime.now().date().isoformat())
+        self.entry_effective.grid(row=0, column=5, padx=5, pady=5, sticky="w")
+        ttk.Label(frm, text="حجم العمل من:").grid(row=1, column=0, padx=5, pady=5, sticky="e")
+        self.entry_from = ttk.Entry(frm, width=11)
+        self.entry_from.grid(row=1, column=1, padx=5, pady=5, sticky="w")
+        ttk.Label(frm, text="إلى:").grid(row=1, column=2, padx=5, pady=5, sticky="e")
+        self.entry_to = ttk.Entry(frm, width=11)
+        self.entry_to.grid(row=1, column=3, padx=5, pady=5, sticky="w")
+        ttk.Label(frm, text="(فارغ = آخر شهر)").grid(row=1, column=4, columnspan=2, padx=5, pady=5, sticky="w")
+
+        choices = ttk.Frame(self)
+        choices.pack(fill="x", padx=10)
+        self.lst_areas = self._choice_list(choices, "المناطق (بدون اختيار = الكل)", areas)
+        self.lst_employees = self._choice_list(choices, "الموظفون (بدون اختيار = الكل)", employees)
+
+        lst = ttk.LabelFrame(self, text="أثر الزيادة على تكلفة حجم العمل")
+        lst.pack(fill="both", expand=True, padx=10, pady=8)
+        cols = [("area", "المنطقة"), ("count", "عدد الرواتب"), ("lines", "السطور"),
+                ("old", "التكلفة الحالية"), ("new", "التكلفة الجديدة"), ("diff", "الفرق")]
+        self.table = LazyTree(lst, cols, height=8)
+        self.table.pack(fill="both", expand=True)
+        self.lbl_total = ttk.Label(self, text="", font=('Arial', 11, 'bold'))
+        self.lbl_total.pack(anchor="e", padx=10)
+
+        btns = ttk.Frame(self)
+        btns.pack(pady=8)
+        ttk.Button(btns, text="معاينة", command=self.preview).pack(side="left", padx=5)
+        self.btn_apply = ttk.Button(btns, text="تطبيق", command=self.apply, state="disabled")
+        self.btn_apply.pack(side="left", padx=5)
+        ttk.Button(btns, text="إغلاق", command=self.destroy).pack(side="left", padx=5)
+        self.entry_percent.focus()
+
+    def _choice_list(self, parent, title, choices):
+        frame = ttk.LabelFrame(parent, text=title)
+        frame.pack(side="left", fill="both", expand=True, padx=(0, 5))
+        listbox = tk.Listbox(frame, selectmode="extended", exportselection=False, height=6)
+        listbox.pack(side="left", fill="both", expand=True)
+        sb = ttk.Scrollbar(frame, orient="vertical", command=listbox.yview)
+        sb.pack(side="right", fill="y")
+        listbox.configure(yscrollcommand=sb.set)
+        listbox.insert(tk.END, *choices.sorted)
+        listbox.ids = [choices.ids[name] for name in choices.sorted]
+        return listbox
+
+    def rule(self):
+        """(النسبة, المبلغ, المناطق, الموظفون) من الحقول أو None بعد عرض الخطأ"""
         try:
-            c.execute("DELETE FROM employee_area_salary WHERE id=?", (rid,))
-            conn.commit()
-            self.refresh()
-        finally:
-            conn.close()
+            percent = core.parse_percent(self.entry_percent.get())
+            amount = core.to_piastres(self.entry_amount.get())
+        except ValueError as e:
+            messagebox.showerror("خطأ", str(e), parent=self)
+            return None
+        if not percent and not amount:
+            messagebox.showerror("خطأ", "اكتب نسبة أو مبلغ الزيادة", parent=self)
+            return None
+        picked = [[lst.ids[i] for i in lst.curselection()] or None for lst in (self.lst_areas, self.lst_employees)]
+        return (percent, amount, *picked)
+
+    def preview(self):
+        rule = self.rule()
+        if rule is None:
+            return
+
+        def show(result):
+            rows, (changed, lines, old_cost, new_cost) = result
+            self.table.set_source(ListSource(
+                [(name, count, volume, core.format_money(old), core.format_money(new), core.format_money(new - old))
+                 for _, name, count, volume, old, new in rows]))
+            self.lbl_total.config(text=f"يتغير {changed} مرتب - تكلفة {lines} سطر: {core.format_money(old_cost)} ← "
+                                       f"{core.format_money(new_cost)} (الفرق {core.format_money(new_cost - old_cost)})")
+            self.previewed = rule
+            self.btn_apply.config(state="normal" if changed else "disabled")
+
+        run_db(raises_call("preview_raise"), *rule, parse_date(self.entry_from.get()), parse_date(self.entry_to.get()),
+               on_done=show, key="raise-preview")
+
+    def apply(self):
+        rule = self.rule()
+        if rule is None:
+            return
+        if rule != self.previewed:
+            messagebox.showwarning("تنبيه", "تغيرت القيم بعد المعاينة، اضغط معاينة أولًا", parent=self)
+            return
+        text = self.entry_effective.get().strip()
+        effective = parse_date(text) if text else datetime.now().date()
+        if effective is None:
+            messagebox.showerror("خطأ", "تاريخ السريان بصيغة YYYY-MM-DD", parent=self)
+            return
+        if not messagebox.askyesno("تأكيد", f"تطبيق الزيادة ({self.lbl_total.cget('text')}) من {effective}؟", parent=self):
+            return
+
+        def done(result):
+            adjustment_id, rows, applied = result
+            message = (f"تم تعديل {rows} مرتب (الزيادة رقم {adjustment_id})" if applied else
+                       f"الزيادة رقم {adjustment_id} محفوظة وتُطبق تلقائيًا يوم {effective}")
+            messagebox.showinfo("تم", message, parent=self)
+            self.destroy()
+
+        def failed(e):
+            self.btn_apply.config(state="normal")
+            messagebox.showerror("خطأ", str(e), parent=self)
+
+        self.btn_apply.config(state="disabled")
+        run_db(raises_call("apply_raise"), *rule, effective, on_done=done, on_error=failed)
 
 # ============================= Add Order Tab =============================
 class AddOrderTab(ttk.Frame):
     def __init__(self, parent):
         super().__init__(parent)
-        self.refresh_hook = None
         self.selected_employees = []
+        # تاريخ الأوردر الذي حُسبت عليه مرتبات الموظفين المختارين (None = اليوم)
+        self.picked_day = None
         
         frm = ttk.LabelFrame(self, text="إضافة أوردر جديد")
         frm.pack(side="top", fill="x", padx=8, pady=8)
@@ -653,39 +1199,43 @@ class AddOrderTab(ttk.Frame):
         ttk.Button(frm, text="مسح الكل", command=self.clear_all).grid(row=1, column=4, padx=5, pady=8)
         
         self.lbl_selected = ttk.Label(frm, text="الموظفين المختارين: 0")
-        self.lbl_selected.grid(row=2, column=0, columnspan=6, padx=5, pady=8, sticky="w")
+        self.lbl_selected.grid(row=2, column=0, columnspan=2, padx=5, pady=8, sticky="w")
+        ttk.Label(frm, text="تاريخ الأوردر:").grid(row=2, column=2, padx=5, pady=8, sticky="e")
+        self.entry_date = ttk.Entry(frm, width=12)
+        self.entry_date.grid(row=2, column=3, padx=5, pady=8, sticky="w")
+        ttk.Label(frm, text="YYYY-MM-DD (فارغ = اليوم)").grid(row=2, column=4, padx=5, pady=8, sticky="w")
         
         self.cmb_area.bind('<<ComboboxSelected>>', self.on_area_selected)
         
         preview = ttk.LabelFrame(self, text="معاينة الأوردر")
         preview.pack(fill="both", expand=True, padx=8, pady=8)
         
-        self.preview_tree = ttk.Treeview(preview, columns=("employee", "salary", "transport", "total"), show="headings", height=8)
-        for col, txt in [("employee", "الموظف"), ("salary", "المرتب"), ("transport", "بدل انتقالات"), ("total", "الإجمالي")]:
-            self.preview_tree.heading(col, text=txt)
-            self.preview_tree.column(col, width=120, anchor="center")
-        self.preview_tree.pack(fill="both", expand=True)
+        cols = [("employee", "الموظف"), ("salary", "المرتب"), ("transport", "بدل انتقالات"), ("total", "الإجمالي")]
+        self.preview = LazyTree(preview, cols, widths={col: 120 for col, _ in cols}, height=8)
+        self.preview.pack(fill="both", expand=True)
         
         self.lbl_total = ttk.Label(preview, text="إجمالي الأوردر: 0 جنيه مصري", font=('Arial', 12, 'bold'))
         self.lbl_total.pack(anchor="e", padx=10, pady=5)
         
+        self.areas = NameChoices(self.cmb_area)
+        self.salaries = AreaSalaryCache()
+        events.subscribe(events.AREA_ADDED, lambda area_id, name: self.areas.add(area_id, name))
+        events.subscribe(events.AREA_DELETED, self.on_area_deleted)
         self.refresh()
         
-    def set_refresh_hooks(self, fn):
-        self.refresh_hook = fn
-
     def on_area_selected(self, event=None):
         if self.cmb_area.get():
             self.btn_pick_employees.config(state="normal")
 
+    @profile.timed
     def refresh(self):
-        conn = db()
-        c = conn.cursor()
-        c.execute("SELECT id,name FROM areas ORDER BY name")
-        areas_data = c.fetchall()
-        self.area_map = {name: area_id for area_id, name in areas_data}
-        self.cmb_area['values'] = [name for area_id, name in areas_data]
-        conn.close()
+        self.salaries.clear()
+        run_db(api.list_areas, on_done=self.areas.load, key=("choices", id(self.areas)))
+
+    def on_area_deleted(self, area_id):
+        self.areas.remove(area_id)
+        if not self.cmb_area.get():
+            self.btn_pick_employees.config(state="disabled")
         
     def pick_employees(self):
         area = self.cmb_area.get()
@@ -693,71 +1243,54 @@ class AddOrderTab(ttk.Frame):
             messagebox.showerror("خطأ", "اختر المنطقة أولًا")
             return
         
-        area_id = self.area_map.get(area)
+        area_id = self.areas.ids.get(area)
         if area_id is None:
             messagebox.showerror("خطأ", f"لم يتم العثور على معرف للمنطقة: {area}")
             return
-        
-        conn = db()
-        c = conn.cursor()
-        
-        c.execute("SELECT e.id,e.name,mas.salary FROM employees e JOIN employee_area_salary mas ON mas.employee_id=e.id WHERE mas.area_id=?", (area_id,))
-        rows = c.fetchall()
-        
-        if not rows:
-            c.execute("SELECT id,name FROM employees ORDER BY name")
-            all_employees = c.fetchall()
-            rows = [(emp_id, emp_name, 5000) for emp_id, emp_name in all_employees]
-        
-        conn.close()
-        
+        day = self.order_day()
+        if day is False:
+            return
+        self.picked_day = day
+        self.salaries.get(area_id, self.show_employee_picker, day)
+
+    def order_day(self):
+        """تاريخ الأوردر المكتوب أو None لليوم، و False (بعد رسالة الخطأ) إذا كان غير صالح"""
+        text = self.entry_date.get().strip()
+        if not text:
+            return None
+        day = parse_date(text)
+        if day is None:
+            messagebox.showerror("خطأ", "تاريخ الأوردر بصيغة YYYY-MM-DD")
+            return False
+        return day
+
+    def show_employee_picker(self, rows):
         if not rows:
             messagebox.showinfo("تنبيه", "لا يوجد موظفين في النظام.")
             return
-        
-        top = tk.Toplevel(self)
-        top.title("اختيار الموظفين")
-        top.geometry("400x300")
-        top.grab_set()
-        ttk.Label(top, text="اختر الموظفين (Ctrl للمتعدد):", font=("Arial", 10, "bold")).pack(pady=5)
-        
-        lst = tk.Listbox(top, selectmode="extended")
-        lst.pack(fill="both", expand=True, padx=10, pady=10)
-        self.emp_rows_map = {}
-        for idx, (eid, name, sal) in enumerate(rows):
-            lst.insert("end", f"{name} ({sal} جنيه مصري)")
-            self.emp_rows_map[idx] = {'id': eid, 'name': name, 'salary': sal, 'transport': 0}
-        
-        def select_all():
-            lst.select_set(0, tk.END)
+        EmployeePicker(self, rows, [emp['id'] for emp in self.selected_employees], self.on_employees_picked)
 
-        def on_done():
-            sel = lst.curselection()
-            if not sel:
-                messagebox.showwarning("تحذير", "اختر موظف واحد على الأقل")
-                return
-            self.selected_employees = [self.emp_rows_map[i] for i in sel]
-            self.update_preview()
-            self.lbl_selected.config(text=f"الموظفين المختارين: {len(self.selected_employees)}")
-            if self.selected_employees:
-                self.btn_edit_transport.config(state="normal")
-                self.btn_save_order.config(state="normal")
-            top.destroy()
-        
-        btn_frame = ttk.Frame(top)
-        btn_frame.pack(pady=5)
-        ttk.Button(btn_frame, text="اختيار الكل", command=select_all).pack(side="left", padx=5)
-        ttk.Button(btn_frame, text="تم", command=on_done).pack(side="right", padx=5)
+    def on_employees_picked(self, rows):
+        # الإبقاء على بدل الانتقالات لمن كان مختارًا من قبل
+        transport = {emp['id']: emp['transport'] for emp in self.selected_employees}
+        self.selected_employees = [{'id': eid, 'name': name, 'salary': sal, 'transport': transport.get(eid, 0)}
+                                   for eid, name, sal in rows]
+        self.update_preview()
+        self.lbl_selected.config(text=f"الموظفين المختارين: {len(self.selected_employees)}")
+        if self.selected_employees:
+            self.btn_edit_transport.config(state="normal")
+            self.btn_save_order.config(state="normal")
     
     def update_preview(self):
-        for item in self.preview_tree.get_children():
-            self.preview_tree.delete(item)
+        rows = []
         total_amount = 0
         for emp in self.selected_employees:
-            emp_total = emp['salary'] + emp['transport']
+            emp_total = core.line_total(emp['salary'], emp['transport'])
             total_amount += emp_total
-            self.preview_tree.insert("", "end", values=(emp['name'], emp['salary'], emp['transport'], emp_total))
-        self.lbl_total.config(text=f"إجمالي الأوردر: {total_amount} جنيه مصري")
+            rows.append((emp['name'], core.format_money(emp['salary']), core.format_money(emp['transport']),
+                         core.format_money(emp_total)))
+        self.preview.set_source(ListSource(rows))
+        self.lbl_total.config(text=f"إجمالي الأوردر: {core.format_money(total_amount)} جنيه مصري")
     
     def edit_transport(self):
         if not self.selected_employees:
@@ -777,7 +1310,7 @@ class AddOrderTab(ttk.Frame):
             emp_frame.pack(fill="x", pady=2)
             ttk.Label(emp_frame, text=f"{emp['name']}:", width=15).pack(side="left")
             entry = ttk.Entry(emp_frame, width=8)
-            entry.insert(0, str(emp['transport']))
+            entry.insert(0, core.format_money(emp['transport']))
             entry.pack(side="left", padx=5)
             ttk.Label(emp_frame, text="جنيه مصري").pack(side="left")
             entries.append(entry)
@@ -785,7 +1318,7 @@ class AddOrderTab(ttk.Frame):
         def apply():
             try:
                 for i, entry in enumerate(entries):
-                    self.selected_employees[i]['transport'] = float(entry.get() or "0")
+                    self.selected_employees[i]['transport'] = core.to_piastres(entry.get())
                 self.update_preview()
                 dialog.destroy()
                 messagebox.showinfo("تم", "تم التحديث")
@@ -806,186 +1339,528 @@ class AddOrderTab(ttk.Frame):
         if not self.selected_employees:
             messagebox.showerror("خطأ", "اختر موظفين")
             return
-        area_id = self.area_map[area]
-        created_at = datetime.now().isoformat()
-        conn = db()
-        c = conn.cursor()
-        try:
-            c.execute("INSERT INTO orders(area_id,address,created_at) VALUES(?,?,?)", (area_id, address, created_at))
-            order_id = c.lastrowid
-            for emp in self.selected_employees:
-                emp_total = emp['salary'] + emp['transport']
-                c.execute("INSERT INTO order_employees(order_id,employee_id,salary,transport,total) VALUES(?,?,?,?,?)", (order_id, emp['id'], emp['salary'], emp['transport'], emp_total))
-            conn.commit()
-            total_amount = sum(emp['salary'] + emp['transport'] for emp in self.selected_employees)
-            messagebox.showinfo("نجاح", f"تم إضافة الأوردر رقم {order_id}\nإجمالي: {total_amount} جنيه مصري")
+        area_id = self.areas.ids[area]
+        day = self.order_day()
+        if day is False:
+            return
+        if day != self.picked_day:
+            messagebox.showerror("خطأ", "تم تغيير تاريخ الأوردر بعد اختيار الموظفين، اختر الموظفين مرة أخرى لتحديث المرتبات")
+            return
+        created_at = datetime.combine(day, datetime.now().time()).isoformat() if day else None
+
+        def done(result):
+            order_id, total_amount = result
+            messagebox.showinfo("نجاح", f"تم إضافة الأوردر رقم {order_id}\nإجمالي: {core.format_money(total_amount)} جنيه مصري")
             self.clear_all()
-        except Exception as e:
+
+        def failed(e):
+            self.btn_save_order.config(state="normal")
             messagebox.showerror("خطأ", f"خطأ: {str(e)}")
-        finally:
-            conn.close()
+
+        # منع الحفظ مرتين بالضغط المتكرر أثناء الكتابة
+        self.btn_save_order.config(state="disabled")
+        run_write(api.create_order, area_id, address, self.selected_employees, created_at, on_done=done, on_error=failed)
     
     def clear_all(self):
+        # التاريخ يبقى لإدخال باقي أوردرات نفس اليوم
         self.selected_employees = []
+        self.picked_day = None
         self.lbl_selected.config(text="الموظفين المختارين: 0")
         self.entry_address.delete(0, tk.END)
         self.cmb_area.set('')
-        for item in self.preview_tree.get_children():
-            self.preview_tree.delete(item)
+        self.preview.clear()
         self.lbl_total.config(text="إجمالي الأوردر: 0 جنيه مصري")
         self.btn_pick_employees.config(state="disabled")
         self.btn_edit_transport.config(state="disabled")
         self.btn_save_order.config(state="disabled")
 
+class _PickerSource(ListSource):
+    """الموظفون المطابقون للبحث، وعلامة الاختيار تُحسب عند عرض الصف"""
+    def __init__(self, index, matches, selected):
+        super().__init__(matches)
+        self.index = index
+        self.selected = selected
+
+    def _wrap(self, start, positions):
+        rows = self.index.rows
+        return [("✓" if rows[p][0] in self.selected else "", rows[p][1], core.format_money(rows[p][2]), rows[p][0], start + i)
+                for i, p in enumerate(positions)]
+
+
+class EmployeePicker(tk.Toplevel):
+    """اختيار موظفين من قائمة قد تصل لعشرات الآلاف: بحث أثناء الكتابة،
+    وعرض النافذة الظاهرة فقط، والاختيار محفوظ بالرقم فلا يضيع عند تغيير البحث"""
+    SEARCH_DELAY_MS = 150
+
+    def __init__(self, parent, rows, selected_ids, on_done):
+        super().__init__(parent)
+        self.title("اختيار الموظفين")
+        self.geometry("480x460")
+        self.grab_set()
+        self.on_done = on_done
+        self.index = NameIndex(rows)
+        self.selected = set(selected_ids)
+        self.matches = []
+        self._search_job = None
+
+        top = ttk.Frame(self)
+        top.pack(fill="x", padx=10, pady=5)
+        ttk.Label(top, text="بحث:").pack(side="left")
+        self.entry_search = ttk.Entry(top)
+        self.entry_search.pack(side="left", fill="x", expand=True, padx=5)
+        self.entry_search.bind("<KeyRelease>", lambda e: self.schedule_search())
+        self.lbl_count = ttk.Label(self, text="")
+        self.lbl_count.pack(anchor="w", padx=10)
+
+        self.table = LazyTree(self, [("sel", "✓"), ("name", "الموظف"), ("salary", "المرتب")],
+                              widths={"sel": 40, "salary": 100}, height=14, iid_index=3)
+        self.table.pack(fill="both", expand=True, padx=10, pady=5)
+        self.table.tree.configure(selectmode="browse")
+        self.table.tree.bind("<ButtonRelease-1>", self.on_click)
+        self.table.tree.bind("<space>", lambda e: self.toggle_focused())
+
+        btn_frame = ttk.Frame(self)
+        btn_frame.pack(pady=5)
+        ttk.Button(btn_frame, text="اختيار كل المطابق", command=lambda: self.set_matching(True)).pack(side="left", padx=5)
+        ttk.Button(btn_frame, text="إلغاء المطابق", command=lambda: self.set_matching(False)).pack(side="left", padx=5)
+        ttk.Button(btn_frame, text="تم", command=self.done).pack(side="left", padx=5)
+        ttk.Button(btn_frame, text="إلغاء", command=self.destroy).pack(side="left", padx=5)
+        self.search()
+        self.entry_search.focus()
+
+    def schedule_search(self):
+        if self._search_job is not None:
+            self.after_cancel(self._search_job)
+        self._search_job = self.after(self.SEARCH_DELAY_MS, self.search)
+
+    def search(self):
+        self._search_job = None
+        self.matches = self.index.search(self.entry_search.get())
+        self.table.set_source(_PickerSource(self.index, self.matches, self.selected))
+        self.update_count()
+
+    def update_count(self):
+        self.lbl_count.config(text=f"المطابق: {len(self.matches)} من {len(self.index.rows)} - المختار: {len(self.selected)}")
+
+    def _mark(self, row):
+        return ("✓" if row[3] in self.selected else "",) + row[1:]
+
+    def toggle(self, iid):
+        emp_id = int(iid)
+        if emp_id in self.selected:
+            self.selected.discard(emp_id)
+        else:
+            self.selected.add(emp_id)
+        self.table.update_rows(lambda r: r[3] == emp_id, self._mark)
+        self.update_count()
+
+    def on_click(self, event):
+        iid = self.table.tree.identify_row(event.y)
+        if iid:
+            self.toggle(iid)
+
+    def toggle_focused(self):
+        iid = self.table.tree.focus()
+        if iid:
+            self.toggle(iid)
+
+    def set_matching(self, selected):
+        ids = (self.index.rows[p][0] for p in self.matches)
+        if selected:
+            self.selected.update(ids)
+        else:
+            self.selected.difference_update(ids)
+        self.table.update_rows(lambda r: True, self._mark)
+        self.update_count()
+
+    def done(self):
+        if not self.selected:
+            messagebox.showwarning("تحذير", "اختر موظف واحد على الأقل", parent=self)
+            return
+        rows = [row for row in self.index.rows if row[0] in self.selected]
+        self.destroy()
+        self.on_done(rows)
+
 # ============================= Reports Tab =============================
+def parse_date(text):
+    try:
+        return datetime.strptime(text.strip(), "%Y-%m-%d").date()
+    except ValueError:
+        return None
+
+def order_lines_source(order_id):
+    return api.source("order_lines", order_id)
+
 class ReportsTab(ttk.Frame):
     def __init__(self, parent):
         super().__init__(parent)
-        self.refresh_hook = None
+        self._search_job = None
         frm = ttk.LabelFrame(self, text="تقرير الأوردرات")
         frm.pack(side="top", fill="x", padx=8, pady=8)
-        ttk.Label(frm, text="اختر الأوردر:").grid(row=0, column=0, padx=5, pady=8, sticky="e")
-        self.cmb_orders = ttk.Combobox(frm, state="readonly", width=50)
-        self.cmb_orders.grid(row=0, column=1, padx=5, pady=8, sticky="w")
-        ttk.Button(frm, text="عرض التقرير", command=self.show_report).grid(row=0, column=2, padx=5, pady=8)
-        ttk.Button(frm, text="تحديث القائمة", command=self.refresh).grid(row=0, column=3, padx=5, pady=8)
+        ttk.Label(frm, text="بحث (رقم/عنوان):").grid(row=0, column=0, padx=5, pady=8, sticky="e")
+        self.entry_search = ttk.Entry(frm, width=25)
+        self.entry_search.grid(row=0, column=1, padx=5, pady=8, sticky="w")
+        ttk.Label(frm, text="المنطقة:").grid(row=0, column=2, padx=5, pady=8, sticky="e")
+        self.cmb_area = ttk.Combobox(frm, state="readonly", width=15)
+        self.cmb_area.grid(row=0, column=3, padx=5, pady=8, sticky="w")
+        ttk.Label(frm, text="من (YYYY-MM-DD):").grid(row=0, column=4, padx=5, pady=8, sticky="e")
+        self.entry_from = ttk.Entry(frm, width=11)
+        self.entry_from.grid(row=0, column=5, padx=5, pady=8, sticky="w")
+        ttk.Label(frm, text="إلى:").grid(row=0, column=6, padx=5, pady=8, sticky="e")
+        self.entry_to = ttk.Entry(frm, width=11)
+        self.entry_to.grid(row=0, column=7, padx=5, pady=8, sticky="w")
+        ttk.Button(frm, text="مسح", command=self.clear_filters).grid(row=0, column=8, padx=5, pady=8)
+        ttk.Button(frm, text="عرض التقرير", command=self.show_report).grid(row=1, column=0, padx=5, pady=8)
+        ttk.Button(frm, text="تحديث القائمة", command=self.refresh).grid(row=1, column=1, padx=5, pady=8, sticky="w")
         if HAS_PDF:
-            ttk.Button(frm, text="تصدير PDF", command=self.export_pdf).grid(row=0, column=4, padx=5, pady=8)
+            ttk.Button(frm, text="تصدير PDF", command=self.export_pdf).grid(row=1, column=2, padx=5, pady=8)
+            ttk.Button(frm, text="تصدير دفعة PDF", command=lambda: BatchExportDialog(self)).grid(row=1, column=3, padx=5, pady=8)
+        for entry in (self.entry_search, self.entry_from, self.entry_to):
+            entry.bind("<KeyRelease>", lambda e: self.schedule_search())
+        self.cmb_area.bind("<<ComboboxSelected>>", lambda e: self.refresh())
+
+        found = ttk.LabelFrame(self, text=f"نتائج البحث (أول {core.ORDER_SEARCH_LIMIT})")
+        found.pack(fill="x", padx=8, pady=(0, 8))
+        self.results = ttk.Treeview(found, columns=("id", "area", "address", "date", "total"), show="headings", height=6)
+        for col, txt in [("id", "رقم"), ("area", "المنطقة"), ("address", "العنوان"), ("date", "التاريخ"), ("total", "الإجمالي")]:
+            self.results.heading(col, text=txt)
+            self.results.column(col, anchor="center")
+        self.results.column("id", width=70)
+        self.results.pack(side="left", fill="both", expand=True)
+        sb = ttk.Scrollbar(found, orient="vertical", command=self.results.yview)
+        sb.pack(side="right", fill="y")
+        self.results.configure(yscrollcommand=sb.set, selectmode="browse")
+        self.results.bind("<<TreeviewSelect>>", lambda e: self.show_report())
+
         lst = ttk.LabelFrame(self, text="تفاصيل الأوردر")
         lst.pack(fill="both", expand=True, padx=8, pady=8)
-        self.tree = ttk.Treeview(lst, columns=("employee", "salary", "transport", "total"), show="headings", height=15)
-        for col, txt in [("employee", "الموظف"), ("salary", "المرتب"), ("transport", "بدل الانتقالات"), ("total", "الإجمالي")]:
-            self.tree.heading(col, text=txt)
-            self.tree.column(col, anchor="center")
-        self.tree.pack(side="left", fill="both", expand=True)
-        sb = ttk.Scrollbar(lst, orient="vertical", command=self.tree.yview)
-        sb.pack(side="right", fill="y")
-        self.tree.configure(yscrollcommand=sb.set)
+        self.table = LazyTree(lst, [("employee", "الموظف"), ("salary", "المرتب"), ("transport", "بدل الانتقالات"), ("total", "الإجمالي")], height=15)
+        self.table.pack(fill="both", expand=True)
         self.lbl_total = ttk.Label(self, text="إجمالي الأوردر: 0")
         self.lbl_total.pack(anchor="e", padx=10, pady=5)
+        self.areas = NameChoices(self.cmb_area)
+        run_db(api.list_areas, on_done=self.areas.load, key=("choices", id(self.areas)))
+        events.subscribe(events.AREA_ADDED, lambda area_id, name: self.areas.add(area_id, name))
+        events.subscribe(events.AREA_DELETED, lambda area_id: self.areas.remove(area_id))
+        events.subscribe(events.ORDER_ADDED, lambda **order: self.schedule_search())
+        events.subscribe(events.EMPLOYEE_RENAMED, self.on_employee_renamed)
         self.refresh()
 
-    def set_refresh_hooks(self, fn):
-        self.refresh_hook = fn
+    def schedule_search(self):
+        """البحث أثناء الكتابة بعد توقف قصير"""
+        if self._search_job is not None:
+            self.after_cancel(self._search_job)
+        self._search_job = self.after(200, self.refresh)
 
+    @profile.timed
     def refresh(self):
-        conn = db()
-        c = conn.cursor()
-        c.execute("SELECT o.id,a.name,o.address,o.created_at FROM orders o JOIN areas a ON a.id=o.area_id ORDER BY o.id DESC")
-        self.orders_map = {f"{a} | {ad} | {dt}": oid for oid, a, ad, dt in c.fetchall()}
-        self.cmb_orders['values'] = list(self.orders_map.keys())
-        conn.close()
+        self._search_job = None
+        # كل كتابة في البحث تلغي البحث السابق إن لم ينته
+        run_db(api.search_orders, self.entry_search.get(),
+               self.areas.ids.get(self.cmb_area.get()),
+               parse_date(self.entry_from.get()),
+               parse_date(self.entry_to.get()),
+               on_done=self.show_results, key="order-search")
+
+    def show_results(self, rows):
+        selected = self.selected_order()
+        self.results.delete(*self.results.get_children())
+        for oid, area, address, dt, total_amount in rows:
+            self.results.insert("", "end", iid=str(oid), values=(oid, area, address, dt, core.format_money(total_amount)))
+        if selected is not None and self.results.exists(str(selected)):
+            self.results.selection_set(str(selected))
+
+    def clear_filters(self):
+        for entry in (self.entry_search, self.entry_from, self.entry_to):
+            entry.delete(0, tk.END)
+        self.cmb_area.set('')
+        self.refresh()
+
+    def selected_order(self):
+        sel = self.results.selection()
+        return int(sel[0]) if sel else None
+
+    def on_employee_renamed(self, employee_id, name):
+        self.table.update_rows(lambda r: r[5] == employee_id, lambda r: (name,) + r[1:])
 
     def show_report(self):
-        sel = self.cmb_orders.get()
-        if not sel:
+        order_id = self.selected_order()
+        if order_id is None:
             messagebox.showerror("خطأ", "اختر أوردر")
             return
-        order_id = self.orders_map[sel]
-        conn = db()
-        c = conn.cursor()
-        c.execute("SELECT e.name,oe.salary,oe.transport,oe.total FROM order_employees oe JOIN employees e ON e.id=oe.employee_id WHERE oe.order_id=?", (order_id,))
-        rows = c.fetchall()
-        conn.close()
-        [self.tree.delete(i) for i in self.tree.get_children()]
-        total = 0
-        for emp, sal, tran, tot in rows:
-            self.tree.insert("", "end", values=(emp, sal, tran, tot))
-            total += tot
-        self.lbl_total.config(text=f"إجمالي الأوردر: {total}")
+        self.table.set_source(order_lines_source(order_id))
+        run_db(api.order_total, order_id, key="order-total",
+               on_done=lambda total: self.lbl_total.config(text=f"إجمالي الأوردر: {core.format_money(total)}"))
 
     def export_pdf(self):
         if not HAS_PDF:
             messagebox.showerror("خطأ", "مكتبة reportlab غير مثبتة")
             return
-        sel = self.cmb_orders.get()
-        if not sel:
+        order_id = self.selected_order()
+        if order_id is None:
             messagebox.showerror("خطأ", "اختر أوردر")
             return
-        order_id = self.orders_map[sel]
-        conn = db()
-        c = conn.cursor()
-        c.execute("SELECT a.name,o.address,o.created_at FROM orders o JOIN areas a ON a.id=o.area_id WHERE o.id=?", (order_id,))
-        area, address, dt = c.fetchone()
-        c.execute("SELECT e.name,oe.salary,oe.transport,oe.total FROM order_employees oe JOIN employees e ON e.id=oe.employee_id WHERE oe.order_id=?", (order_id,))
-        rows = c.fetchall()
-        conn.close()
-        fname = f"{REPORTS_DIR}/Order_{order_id}.pdf"
-        
-        # تسجيل الخط العربي
-        arabic_font_name = register_arabic_font()
-        
-        cpdf = canvas.Canvas(fname, pagesize=A4)
-        
-        # عنوان التقرير
-        title = f"تقرير الأوردر رقم {order_id}"
-        draw_arabic_text(cpdf, title, 2*cm, 27*cm, arabic_font_name, 16)
-        
-        # معلومات الأوردر
-        y_pos = 26*cm
-        
-        # المنطقة
-        area_text = f"المنطقة: {area}"
-        draw_arabic_text(cpdf, area_text, 2*cm, y_pos, arabic_font_name, 12)
-        y_pos -= 0.8*cm
-        
-        # العنوان
-        if address:
-            address_text = f"العنوان: {address}"
-            draw_arabic_text(cpdf, address_text, 2*cm, y_pos, arabic_font_name, 12)
-            y_pos -= 0.8*cm
-        
-        # التاريخ
-        date_text = f"التاريخ: {dt}"
-        draw_arabic_text(cpdf, date_text, 2*cm, y_pos, arabic_font_name, 12)
-        y_pos -= 1.2*cm
-        
-        # رؤوس الأعمدة
-        headers = ["الموظف", "المرتب", "بدل الانتقالات", "الإجمالي"]
-        x_positions = [2*cm, 6*cm, 11*cm, 15*cm]
-        
-        for i, header in enumerate(headers):
-            draw_arabic_text(cpdf, header, x_positions[i], y_pos, arabic_font_name, 11)
-        
-        y_pos -= 0.8*cm
-        
-        # خط فاصل
-        cpdf.line(2*cm, y_pos + 0.2*cm, 19*cm, y_pos + 0.2*cm)
-        y_pos -= 0.5*cm
-        
-        # بيانات الموظفين
-        total_amount = 0
-        for emp_name, salary, transport, total in rows:
-            if y_pos < 3*cm:  # إذا وصلنا لنهاية الصفحة
-                cpdf.showPage()
-                y_pos = 27*cm
-            
-            draw_arabic_text(cpdf, str(emp_name), x_positions[0], y_pos, arabic_font_name, 10)
-            draw_arabic_text(cpdf, str(salary), x_positions[1], y_pos, arabic_font_name, 10)
-            draw_arabic_text(cpdf, str(transport), x_positions[2], y_pos, arabic_font_name, 10)
-            draw_arabic_text(cpdf, str(total), x_positions[3], y_pos, arabic_font_name, 10)
-            
-            total_amount += total
-            y_pos -= 0.6*cm
-        
-        # خط فاصل قبل الإجمالي
-        y_pos -= 0.3*cm
-        cpdf.line(2*cm, y_pos, 19*cm, y_pos)
-        y_pos -= 0.8*cm
-        
-        # الإجمالي
-        total_text = f"إجمالي المبلغ: {total_amount} جنيه مصري"
-        draw_arabic_text(cpdf, total_text, 12*cm, y_pos, arabic_font_name, 12)
-        
-        cpdf.save()
-        messagebox.showinfo("تم", f"تم تصدير التقرير إلى:\n{fname}")
+        run_db(pdf_call("render_order_pdf"), order_id,
+               on_done=lambda fname: messagebox.showinfo("تم", f"تم تصدير التقرير إلى:\n{fname}"))
+
+# ============================= Payroll Summary Tab =============================
+PERIOD_NAMES = [("month", "شهري"), ("week", "أسبوعي"), ("day", "يومي")]
+GROUP_NAMES = [("employee", "حسب الموظف"), ("area", "حسب المنطقة")]
+
+class PayrollSummaryTab(ttk.Frame):
+    """مستحقات كل موظف/منطقة في كل فترة (من جدول الملخص اليومي)"""
+    def __init__(self, parent):
+        super().__init__(parent)
+        self._refresh_job = None
+        frm = ttk.LabelFrame(self, text="ملخص المرتبات")
+        frm.pack(side="top", fill="x", padx=8, pady=8)
+        ttk.Label(frm, text="الفترة:").grid(row=0, column=0, padx=5, pady=8, sticky="e")
+        self.cmb_period = ttk.Combobox(frm, state="readonly", width=10, values=[n for _, n in PERIOD_NAMES])
+        self.cmb_period.current(0)
+        self.cmb_period.grid(row=0, column=1, padx=5, pady=8, sticky="w")
+        self.cmb_group = ttk.Combobox(frm, state="readonly", width=14, values=[n for _, n in GROUP_NAMES])
+        self.cmb_group.current(0)
+        self.cmb_group.grid(row=0, column=2, padx=5, pady=8, sticky="w")
+        ttk.Label(frm, text="المنطقة:").grid(row=0, column=3, padx=5, pady=8, sticky="e")
+        self.cmb_area = ttk.Combobox(frm, state="readonly", width=15)
+        self.cmb_area.grid(row=0, column=4, padx=5, pady=8, sticky="w")
+        ttk.Label(frm, text="من (YYYY-MM-DD):").grid(row=1, column=0, padx=5, pady=8, sticky="e")
+        self.entry_from = ttk.Entry(frm, width=11)
+        self.entry_from.grid(row=1, column=1, padx=5, pady=8, sticky="w")
+        ttk.Label(frm, text="إلى:").grid(row=1, column=2, padx=5, pady=8, sticky="e")
+        self.entry_to = ttk.Entry(frm, width=11)
+        self.entry_to.grid(row=1, column=3, padx=5, pady=8, sticky="w")
+        ttk.Button(frm, text="عرض", command=self.refresh).grid(row=1, column=4, padx=5, pady=8, sticky="w")
+        ttk.Button(frm, text="مسح", command=self.clear_filters).grid(row=1, column=5, padx=5, pady=8)
+        self.exporter = None
+        if HAS_PDF:
+            ttk.Button(frm, text="كشف PDF للفترة", command=self.export_statement).grid(row=1, column=6, padx=5, pady=8)
+        self.lbl_export = ttk.Label(frm, text="")
+        self.lbl_export.grid(row=2, column=0, columnspan=7, padx=5, sticky="w")
+        for cmb in (self.cmb_period, self.cmb_group, self.cmb_area):
+            cmb.bind("<<ComboboxSelected>>", lambda e: self.refresh())
+
+        lst = ttk.LabelFrame(self, text="المستحقات")
+        lst.pack(fill="both", expand=True, padx=8, pady=8)
+        cols = [("period", "الفترة"), ("name", "الاسم"), ("lines", "عدد الأوردرات"),
+                ("salary", "المرتبات"), ("transport", "الانتقالات"), ("total", "الإجمالي")]
+        self.table = LazyTree(lst, cols, height=15)
+        self.table.pack(fill="both", expand=True)
+        self.lbl_total = ttk.Label(self, text="الإجمالي: 0", font=('Arial', 12, 'bold'))
+        self.lbl_total.pack(anchor="e", padx=10, pady=5)
+        self.areas = NameChoices(self.cmb_area)
+        run_db(api.list_areas, on_done=self.areas.load, key=("choices", id(self.areas)))
+        events.subscribe(events.AREA_ADDED, lambda area_id, name: self.areas.add(area_id, name))
+        events.subscribe(events.AREA_DELETED, lambda area_id: self.areas.remove(area_id))
+        # الاستيراد ينشر حدثًا لكل أوردر: تحديث واحد بعد توقف الأحداث
+        events.subscribe(events.ORDER_ADDED, lambda **order: self.schedule_refresh())
+        self.refresh()
+
+    def schedule_refresh(self):
+        if self._refresh_job is not None:
+            self.after_cancel(self._refresh_job)
+        self._refresh_job = self.after(500, self.refresh)
+
+    @profile.timed
+    def refresh(self):
+        self._refresh_job = None
+        period = PERIOD_NAMES[max(0, self.cmb_period.current())][0]
+        group = GROUP_NAMES[max(0, self.cmb_group.current())][0]
+        run_db(api.payroll_summary, period, group,
+               parse_date(self.entry_from.get()), parse_date(self.entry_to.get()),
+               self.areas.ids.get(self.cmb_area.get()),
+               on_done=self.show_summary, key="payroll-summary")
+
+    def show_summary(self, rows):
+        grand = 0
+        display = []
+        for period, _, name, lines, salary, transport, total in rows:
+            display.append((period, name, lines, core.format_money(salary), core.format_money(transport),
+                            core.format_money(total)))
+            grand += total
+        self.table.set_source(ListSource(display))
+        self.lbl_total.config(text=f"الإجمالي: {core.format_money(grand)} جنيه مصري")
+
+    def export_statement(self):
+        # الكشف قد يكون مئات الآلاف من السطور: خيط مستقل حتى لا ينتظر باقي البرنامج انتهاءه
+        if self.exporter is None:
+            self.exporter = DbWorker(self)
+        if self.exporter.pending:
+            messagebox.showinfo("تنبيه", "جاري تصدير كشف آخر")
+            return
+        exporter = self.exporter
+
+        def progress(rows):
+            exporter.dispatch(lambda: self.lbl_export.config(text=f"جاري التصدير... {rows} سطر"))
+
+        def done(result):
+            self.lbl_export.config(text="")
+            messagebox.showinfo("تم", f"تم تصدير {result[1]} سطر إلى:\n{result[0]}")
+
+        def failed(e):
+            self.lbl_export.config(text="")
+            messagebox.showerror("خطأ", str(e))
+
+        self.lbl_export.config(text="جاري التصدير...")
+        exporter.submit(pdf_call("render_period_pdf"), parse_date(self.entry_from.get()), parse_date(self.entry_to.get()),
+                        self.areas.ids.get(self.cmb_area.get()), None, None, None, progress,
+                        on_done=done, on_error=failed)
+
+    def clear_filters(self):
+        for entry in (self.entry_from, self.entry_to):
+            entry.delete(0, tk.END)
+        self.cmb_area.set('')
+        self.refresh()
+
+class BatchExportDialog(tk.Toplevel):
+    """تصدير أوردرات كثيرة (نطاق أرقام أو فترة) في الخلفية مع شريط تقدم"""
+    def __init__(self, parent):
+        super().__init__(parent)
+        self.title("تصدير دفعة PDF")
+        self.geometry("420x230")
+        self.cancelled = threading.Event()
+        self.updates = queue.Queue()
+        self.worker = None
+        frame = ttk.Frame(self)
+        frame.pack(fill="both", expand=True, padx=10, pady=10)
+        self.entries = {}
+        for row, (key, text) in enumerate([("id_from", "من أوردر رقم:"), ("id_to", "إلى أوردر رقم:"),
+                                           ("date_from", "من تاريخ (YYYY-MM-DD):"), ("date_to", "إلى تاريخ:")]):
+            ttk.Label(frame, text=text).grid(row=row, column=0, padx=5, pady=3, sticky="e")
+            entry = ttk.Entry(frame, width=15)
+            entry.grid(row=row, column=1, padx=5, pady=3, sticky="w")
+            self.entries[key] = entry
+        self.progress = ttk.Progressbar(frame, length=300, mode="determinate")
+        self.progress.grid(row=4, column=0, columnspan=2, pady=8)
+        self.lbl_status = ttk.Label(frame, text="")
+        self.lbl_status.grid(row=5, column=0, columnspan=2)
+        btns = ttk.Frame(frame)
+        btns.grid(row=6, column=0, columnspan=2, pady=5)
+        self.btn_start = ttk.Button(btns, text="بدء التصدير", command=self.start)
+        self.btn_start.pack(side="left", padx=5)
+        ttk.Button(btns, text="إلغاء", command=self.close).pack(side="left", padx=5)
+        self.protocol("WM_DELETE_WINDOW", self.close)
+
+    def start(self):
+        values = {key: entry.get().strip() for key, entry in self.entries.items()}
+        try:
+            id_from = int(values["id_from"]) if values["id_from"] else None
+            id_to = int(values["id_to"]) if values["id_to"] else None
+        except ValueError:
+            messagebox.showerror("خطأ", "رقم الأوردر يجب أن يكون رقم", parent=self)
+            return
+        date_from = parse_date(values["date_from"]) if values["date_from"] else None
+        date_to = parse_date(values["date_to"]) if values["date_to"] else None
+        if (values["date_from"] and not date_from) or (values["date_to"] and not date_to):
+            messagebox.showerror("خطأ", "التاريخ بصيغة YYYY-MM-DD", parent=self)
+            return
+        self.btn_start.config(state="disabled")
+        run_db(pdf_call("select_order_ids"), id_from, id_to, date_from, date_to, on_done=self._start_export,
+               on_error=self._select_failed)
+
+    def _select_failed(self, e):
+        if self.winfo_exists():
+            self.btn_start.config(state="normal")
+            messagebox.showerror("خطأ", str(e), parent=self)
+
+    def _start_export(self, order_ids):
+        if not self.winfo_exists():
+            return
+        if not order_ids:
+            self.btn_start.config(state="normal")
+            messagebox.showinfo("تنبيه", "لا توجد أوردرات في هذا النطاق", parent=self)
+            return
+        self.progress.config(maximum=len(order_ids), value=0)
+        self.lbl_status.config(text=f"0 / {len(order_ids)}")
+        self.worker = threading.Thread(target=self._run, args=(order_ids,), daemon=True)
+        self.worker.start()
+        self.after(100, self._poll)
+
+    def _run(self, order_ids):
+        # يعمل في خيط منفصل؛ النتائج ترجع للواجهة عبر الـ queue
+        try:
+            results = pdf_call("export_orders")(order_ids, progress=lambda done, total: self.updates.put(("progress", done, total)),
+                                                cancelled=self.cancelled)
+            self.updates.put(("done", results))
+        except Exception as e:
+            self.updates.put(("error", str(e)))
+
+    def _poll(self):
+        if not self.winfo_exists():
+            return
+        try:
+            while True:
+                msg = self.updates.get_nowait()
+                if msg[0] == "progress":
+                    self.progress.config(value=msg[1])
+                    self.lbl_status.config(text=f"{msg[1]} / {msg[2]}")
+                elif msg[0] == "done":
+                    failed = [r for r in msg[1] if r[2]]
+                    messagebox.showinfo("تم", f"تم تصدير {len(msg[1]) - len(failed)} ملف إلى {REPORTS_DIR}"
+                                        + (f"\nفشل {len(failed)}" if failed else ""), parent=self)
+                    self.destroy()
+                    return
+                else:
+                    messagebox.showerror("خطأ", msg[1], parent=self)
+                    self.destroy()
+                    return
+        except queue.Empty:
+            pass
+        self.after(100, self._poll)
+
+    def close(self):
+        self.cancelled.set()
+        self.destroy()
 
 # ============================= Main =============================
+def server_url():
+    """عنوان الخادم من سطر الأوامر أو البيئة، أو None للعمل على القاعدة المحلية"""
+    if SERVER_FLAG in sys.argv[1:-1]:
+        return sys.argv[sys.argv.index(SERVER_FLAG) + 1]
+    return os.environ.get(SERVER_ENV) or None
+
 def main():
-    ensure_dirs()
-    init_db()
+    global api, HAS_PDF
+    profile.configure_from_env()
+    core.ensure_dirs()
+    url = server_url()
+    listener = None
+    if url:
+        import payroll_client
+        api = payroll_client.Client(url, os.environ.get(payroll_client.TOKEN_ENV))
+        try:
+            HAS_PDF = api.info()["pdf"]
+        except Exception as e:
+            messagebox.showerror("خطأ", f"تعذر الاتصال بالخادم {api.url}:\n{e}")
+            return
+    else:
+        core.init_db()
     app = App()
-    app.mainloop()
+    if not url:
+        # الزيادات المعلقة التي حل تاريخ سريانها (في وضع العميل يطبقها الخادم)
+        run_db(raises_call("apply_due"))
+    if url:
+        app.title(f"{APP_TITLE} - {api.url}")
+        listener = payroll_client.EventListener(api, on_missed=lambda: db_worker.dispatch(app.reload_tabs))
+        listener.start()
+    try:
+        app.mainloop()
+    finally:
+        if listener is not None:
+            listener.stop()
+        if writes is not None:
+            writes.stop()
+        if db_worker is not None:
+            db_worker.stop()
+        events.set_dispatcher(None)
+        payroll_db.close_all()
+        if profile.enabled:
+            print(profile.summary())
+            if profile.use_cprofile:
+                print(f"إحصائيات cProfile في: {profile.dump_stats()}")
 
 if __name__ == "__main__":
+    # مطلوب لعمليات التصدير المتوازي داخل ملف PyInstaller التنفيذي
+    import multiprocessing
+    multiprocessing.freeze_support()
     main()
\ No newline at end of file
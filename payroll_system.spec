@@ -1,11 +1,16 @@
 # -*- mode: python ; coding: utf-8 -*-
+import os
+
+# خط عربي مرفق مع البرنامج: ضع fonts/NotoSansArabic-Regular.ttf بجانب هذا الملف
+# (يُقرأ من payroll_pdf.BUNDLED_FONT)
+font_datas = [('fonts', 'fonts')] if os.path.isdir('fonts') else []
 
 
 a = Analysis(
     ['payroll_system.py'],
     pathex=[],
     binaries=[],
-    datas=[],
+    datas=font_datas,
     hiddenimports=[],
     hookspath=[],
     hooksconfig={},
@@ -0,0 +1,192 @@
+# -*- coding: utf-8 -*-
+"""طابور الكتابة المجمعة (group commit): عمليات الكتابة التي تصل خلال نافذة زمنية قصيرة
+تُنفذ في معاملة واحدة على اتصال واحد، فيُدفع ثمن الـ commit (و fsync) مرة لكل دفعة بدل كل أوردر.
+
+كل عملية في SAVEPOINT خاص بها: خطؤها يلغيها وحدها. نتيجة كل عملية (Future) لا تكتمل إلا بعد
+الـ commit، وأحداثها لا تُنشر إلا بعده، فالإقرار يعني أن البيانات محفوظة فعلًا.
+
+    writes = GroupCommitQueue()
+    future = writes.submit(core.create_order, area_id, address, lines)
+    order_id, total = future.result()
+"""
+import time
+import queue
+import threading
+from collections import deque
+from concurrent.futures import Future
+
+import payroll_db
+import payroll_events as events
+import payroll_profile as profile
+from payroll_db import transaction
+
+# أقصى انتظار لعمليات أخرى بعد أول عملية في الدفعة (ثوانٍ). الانتظار الفعلي لا يزيد عن زمن آخر
+# COMMIT (لا فائدة من انتظار أطول من ثمن commit إضافي، فعلى قرص سريع يكاد يكون صفرًا وعلى قرص
+# شبكة بطيء يجمع دفعات أكبر)، ولا يُنتظر بعد دفعة من عملية واحدة: كاتب وحيد متتابع لا يستفيد
+WINDOW = 0.005
+MAX_BATCH = 200
+# عدد الدفعات الأخيرة المحفوظة لحساب أزمنة الـ commit
+LATENCY_KEEP = 1000
+
+
+class _Job:
+    __slots__ = ("fn", "args", "future", "queued", "result", "error", "events")
+
+    def __init__(self, fn, args):
+        self.fn = fn
+        self.args = args
+        self.future = Future()
+        self.queued = time.perf_counter()
+        self.result = None
+        self.error = None
+        self.events = []
+
+
+def _percentile(values, fraction):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+class GroupCommitQueue:
+    """خيط كتابة واحد باتصال واحد. durable = synchronous=FULL على اتصاله حتى يصل كل commit للقرص
+    قبل الإقرار (مع WAL و NORMAL قد يضيع آخر commit عند انقطاع الكهرباء).
+    publish(الأحداث) يُستدعى بعد كل commit بأحداث العمليات الناجحة (الافتراضي: events.publish)"""
+    def __init__(self, window=WINDOW, max_batch=MAX_BATCH, durable=True, publish=None, name="db-writer"):
+        self.window = window
+        self.max_batch = max_batch
+        self.durable = durable
+        self.publish = publish or _publish_local
+        self.jobs = queue.Queue()
+        self._lock = threading.Lock()
+        self._commit_ms = deque(maxlen=LATENCY_KEEP)
+        self._ack_ms = deque(maxlen=LATENCY_KEEP)
+        self._totals = {"jobs": 0, "failed": 0, "commits": 0, "failed_commits": 0, "max_batch": 0}
+        self.thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self.thread.start()
+
+    def submit(self, fn, *args):
+        """تنفيذ fn(*args) في الدفعة التالية. يرجع concurrent.futures.Future بنتيجتها بعد الـ commit"""
+        job = _Job(fn, args)
+        self.jobs.put(job)
+        return job.future
+
+    def call(self, fn, *args):
+        """submit ثم انتظار الإقرار"""
+        return self.submit(fn, *args).result()
+
+    def depth(self):
+        """عدد العمليات التي تنتظر دورها"""
+        return self.jobs.qsize()
+
+    def stop(self, timeout=5):
+        """إنهاء الخيط بعد تنفيذ كل ما في الطابور"""
+        self.jobs.put(None)
+        self.thread.join(timeout)
+
+    # ----------------------------- Writer thread -----------------------------
+    def _run(self):
+        profile.start_thread_profiler()
+        if self.durable:
+            payroll_db.get_conn().execute("PRAGMA synchronous=FULL")
+        running, last_size, last_commit = True, 1, 0.0
+        while running:
+            job = self.jobs.get()
+            if job is None:
+                break
+            batch = [job]
+            deadline = time.perf_counter() + (min(self.window, last_commit) if last_size > 1 else 0)
+            while len(batch) < self.max_batch:
+                wait = deadline - time.perf_counter()
+                try:
+                    job = self.jobs.get(timeout=wait) if wait > 0 else self.jobs.get_nowait()
+                except queue.Empty:
+                    break
+                if job is None:
+                    running = False
+                    break
+                batch.append(job)
+            last_commit = self._run_batch(batch)
+            last_size = len(batch)
+        profile.stop_thread_profiler()
+        payroll_db.close_thread()
+
+    def _run_batch(self, batch):
+        """يرجع زمن الـ COMMIT نفسه (الكتابة على القرص) بالثواني"""
+        started = time.perf_counter()
+        committed = True
+        try:
+            with transaction() as c:
+                for job in batch:
+                    c.execute("SAVEPOINT job")
+                    with events.capture() as job.events:
+                        try:
+                            job.result = job.fn(*job.args)
+                        except Exception as e:
+                            job.error = e
+                    if job.error is not None:
+                        c.execute("ROLLBACK TO job")
+                        job.events.clear()
+                    c.execute("RELEASE job")
+                commit_started = time.perf_counter()
+        except Exception as e:
+            # فشل BEGIN أو COMMIT: لم يُحفظ شيء من الدفعة
+            committed = False
+            commit_started = time.perf_counter()
+            for job in batch:
+                job.result, job.error = None, job.error or e
+                job.events.clear()
+        done = time.perf_counter()
+        try:
+            self.publish([event for job in batch for event in job.events])
+        except Exception as e:
+            print(f"خطأ في نشر أحداث الدفعة: {e}")
+        for job in batch:
+            if job.error is None:
+                job.future.set_result(job.result)
+            else:
+                job.future.set_exception(job.error)
+        self._record(batch, committed, started, done)
+        return done - commit_started
+
+    def _record(self, batch, committed, started, done):
+        commit_ms = (done - started) * 1000
+        with self._lock:
+            totals = self._totals
+            totals["jobs"] += len(batch)
+            totals["failed"] += sum(1 for job in batch if job.error is not None)
+            totals["commits" if committed else "failed_commits"] += 1
+            totals["max_batch"] = max(totals["max_batch"], len(batch))
+            self._commit_ms.append(commit_ms)
+            self._ack_ms.extend((done - job.queued) * 1000 for job in batch)
+        if profile.enabled:
+            profile.record("writer:commit", done - started)
+            profile.count("writer_jobs", len(batch))
+
+    # ----------------------------- Metrics -----------------------------
+    def stats(self):
+        """الأعداد منذ التشغيل وأزمنة آخر الدفعات: commit_ms = زمن المعاملة كلها،
+        ack_ms = من إضافة العملية للطابور حتى إقرارها"""
+        with self._lock:
+            totals = dict(self._totals)
+            commit_ms, ack_ms = list(self._commit_ms), list(self._ack_ms)
+        commits = totals["commits"] + totals["failed_commits"]
+        return dict(totals, depth=self.depth(),
+                    avg_batch=round(totals["jobs"] / commits, 2) if commits else 0.0,
+                    commit_ms_p50=round(_percentile(commit_ms, 0.5), 3),
+                    commit_ms_p95=round(_percentile(commit_ms, 0.95), 3),
+                    ack_ms_p50=round(_percentile(ack_ms, 0.5), 3),
+                    ack_ms_p95=round(_percentile(ack_ms, 0.95), 3))
+
+    def summary(self):
+        s = self.stats()
+        return (f"طابور الكتابة: في الانتظار {s['depth']}  عمليات {s['jobs']:,} (فشل {s['failed']})  "
+                f"commits {s['commits']:,}  متوسط الدفعة {s['avg_batch']}  أكبر دفعة {s['max_batch']}\n"
+                f"  زمن الـ commit: p50 {s['commit_ms_p50']:.2f} ms  p95 {s['commit_ms_p95']:.2f} ms   "
+                f"زمن الإقرار: p50 {s['ack_ms_p50']:.2f} ms  p95 {s['ack_ms_p95']:.2f} ms")
+
+
+def _publish_local(captured):
+    for topic, data in captured:
+        events.publish(topic, **data)
@@ -0,0 +1,28 @@
+# -*- coding: utf-8 -*-
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import payroll_db
+import payroll_core as core
+
+
+@pytest.fixture
+def db(tmp_path):
+    """قاعدة جديدة مؤقتة بالبيانات التجريبية (5 موظفين، 3 مناطق، بدون أوردرات)"""
+    old = payroll_db.DB_PATH
+    payroll_db.configure(str(tmp_path / "payroll.db"))
+    core.init_db()
+    yield payroll_db
+    payroll_db.configure(old)
+
+
+@pytest.fixture
+def ids(db):
+    """أرقام الموظفين والمناطق التجريبية بالاسم"""
+    employees = {name: emp_id for emp_id, name in core.list_employees()}
+    areas = {name: area_id for area_id, name in core.list_areas()}
+    return employees, areas
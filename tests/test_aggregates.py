@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+"""payroll_daily و orders.total_amount تحدّثهما triggers: بعد كل تعديل يجب أن يطابقا الحساب من السطور"""
+import payroll_core as core
+from payroll_db import query, transaction
+
+RECOMPUTED_DAILY = (
+    "SELECT substr(o.created_at, 1, 10), oe.employee_id, o.area_id, COUNT(*), SUM(oe.salary), "
+    "SUM(oe.transport), SUM(oe.total) FROM order_employees oe JOIN orders o ON o.id=oe.order_id "
+    "GROUP BY 1, 2, 3 ORDER BY 1, 2, 3")
+RECOMPUTED_TOTALS = (
+    "SELECT o.id, COALESCE(SUM(oe.total), 0) FROM orders o LEFT JOIN order_employees oe ON oe.order_id=o.id "
+    "GROUP BY o.id ORDER BY o.id")
+
+
+def assert_aggregates():
+    daily = query("SELECT day, employee_id, area_id, lines, salary, transport, total FROM payroll_daily "
+                  "ORDER BY 1, 2, 3")
+    assert daily == query(RECOMPUTED_DAILY)
+    assert query("SELECT id, total_amount FROM orders ORDER BY id") == query(RECOMPUTED_TOTALS)
+
+
+def assert_aggregates_without_orphans(c):
+    """بعد حذف الأوردر وقبل حذف سطوره: الملخص = السطور التي ما زال أوردرها موجودًا"""
+    daily = c.execute("SELECT day, employee_id, area_id, lines, salary, transport, total FROM payroll_daily "
+                      "ORDER BY 1, 2, 3").fetchall()
+    assert daily == c.execute(RECOMPUTED_DAILY).fetchall()
+
+
+def make_orders(ids):
+    employees, areas = ids
+    ahmed, mohamed, khaled = employees["أحمد"], employees["محمد"], employees["خالد"]
+    hurghada, cairo = areas["الغردقة"], areas["القاهرة"]
+    first, _ = core.create_order(hurghada, "شارع النصر", [
+        {'id': ahmed, 'salary': 500000, 'transport': 1225},
+        {'id': mohamed, 'salary': 540000, 'transport': 0},
+    ], "2025-01-05T09:00:00")
+    second, _ = core.create_order(hurghada, "الممشى", [
+        {'id': ahmed, 'salary': 500000, 'transport': 500},
+        {'id': khaled, 'salary': 480000, 'transport': 300},
+    ], "2025-01-05T17:30:00")
+    third, _ = core.create_order(cairo, "مدينة نصر", [
+        {'id': ahmed, 'salary': 700000, 'transport': 2000},
+    ], "2025-01-06T08:00:00")
+    return first, second, third
+
+
+def test_insert(ids):
+    first, second, third = make_orders(ids)
+    assert_aggregates()
+    employees, areas = ids
+    # سطرا أحمد في الغردقة في نفس اليوم يُجمعان في صف واحد
+    assert query("SELECT lines, salary, transport, total FROM payroll_daily WHERE day='2025-01-05' "
+                 "AND employee_id=? AND area_id=?", (employees["أحمد"], areas["الغردقة"])) == [
+        (2, 1000000, 1725, 1001725)]
+    assert query("SELECT total_amount FROM orders WHERE id=?", (first,)) == [(1041225,)]
+
+
+def test_create_order_returns_total(ids):
+    employees, areas = ids
+    _, total = core.create_order(areas["القاهرة"], "", [
+        {'id': employees["محمود"], 'salary': 610000, 'transport': 150}], "2025-02-01T10:00:00")
+    assert total == 610150
+    assert_aggregates()
+
+
+def test_update_line(ids):
+    first, _, _ = make_orders(ids)
+    employees, _ = ids
+    with transaction() as c:
+        c.execute("UPDATE order_employees SET salary=520000, transport=0, total=520000 "
+                  "WHERE order_id=? AND employee_id=?", (first, employees["أحمد"]))
+    assert_aggregates()
+    # نقل السطر لموظف آخر
+    with transaction() as c:
+        c.execute("UPDATE order_employees SET employee_id=? WHERE order_id=? AND employee_id=?",
+                  (employees["سارة"], first, employees["محمد"]))
+    assert_aggregates()
+
+
+def test_update_order_day_and_area(ids):
+    first, second, _ = make_orders(ids)
+    _, areas = ids
+    with transaction() as c:
+        c.execute("UPDATE orders SET created_at='2025-01-07T09:00:00' WHERE id=?", (first,))
+    assert_aggregates()
+    with transaction() as c:
+        c.execute("UPDATE orders SET area_id=? WHERE id=?", (areas["القاهرة"], second))
+    assert_aggregates()
+    # تعديل العنوان فقط لا يغير الملخص
+    with transaction() as c:
+        c.execute("UPDATE orders SET address='عنوان جديد' WHERE id=?", (second,))
+    assert_aggregates()
+
+
+def test_delete_line(ids):
+    first, second, _ = make_orders(ids)
+    employees, _ = ids
+    with transaction() as c:
+        c.execute("DELETE FROM order_employees WHERE order_id=? AND employee_id=?", (second, employees["خالد"]))
+    assert_aggregates()
+    # آخر سطر للموظف في اليوم يحذف صفه من الملخص
+    assert not query("SELECT 1 FROM payroll_daily WHERE employee_id=?", (employees["خالد"],))
+    with transaction() as c:
+        c.execute("DELETE FROM order_employees WHERE order_id=?", (first,))
+    assert_aggregates()
+
+
+def test_delete_order_before_lines(ids):
+    first, _, _ = make_orders(ids)
+    with transaction() as c:
+        c.execute("DELETE FROM orders WHERE id=?", (first,))
+        assert_aggregates_without_orphans(c)
+        c.execute("DELETE FROM order_employees WHERE order_id=?", (first,))
+    assert_aggregates()
+
+
+def test_delete_lines_then_order(ids):
+    _, _, third = make_orders(ids)
+    with transaction() as c:
+        c.execute("DELETE FROM order_employees WHERE order_id=?", (third,))
+        c.execute("DELETE FROM orders WHERE id=?", (third,))
+    assert_aggregates()
+    assert not query("SELECT 1 FROM payroll_daily WHERE day='2025-01-06'")
+
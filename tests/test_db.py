@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+"""طبقة الاتصالات: configure يصل لكل الخيوط، والمعاملة الفاشلة لا تبقى مفتوحة"""
+import sqlite3
+import threading
+
+import pytest
+
+import payroll_db
+from payroll_db import get_conn, query, transaction
+
+
+def db_file(conn):
+    return conn.execute("PRAGMA database_list").fetchone()[2]
+
+
+class Worker:
+    """خيط يحتفظ باتصاله وينفذ ما يُطلب منه"""
+    def __init__(self):
+        self.jobs, self.results = [], []
+        self.ready, self.done = threading.Event(), threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def run(self, fn):
+        self.done.clear()
+        self.jobs.append(fn)
+        self.ready.set()
+        assert self.done.wait(5)
+        return self.results.pop()
+
+    def stop(self):
+        self.run(None)
+        self.thread.join(5)
+
+    def _run(self):
+        while True:
+            self.ready.wait()
+            self.ready.clear()
+            fn = self.jobs.pop()
+            self.results.append(fn() if fn else None)
+            self.done.set()
+            if fn is None:
+                payroll_db.close_thread()
+                return
+
+
+@pytest.fixture
+def paths(tmp_path):
+    old = payroll_db.DB_PATH
+    yield str(tmp_path / "a.db"), str(tmp_path / "b.db")
+    payroll_db.configure(old)
+
+
+def test_configure_reaches_other_threads(paths):
+    a, b = paths
+    payroll_db.configure(a)
+    worker = Worker()
+    try:
+        assert worker.run(lambda: db_file(get_conn())) == a
+        payroll_db.configure(b)
+        assert worker.run(lambda: db_file(get_conn())) == b
+        # الاتصال القديم أغلقه خيطه
+        assert len(payroll_db._connections) == 1
+    finally:
+        worker.stop()
+    assert db_file(get_conn()) == b
+
+
+def test_failed_commit_leaves_no_transaction(paths):
+    payroll_db.configure(paths[0])
+    # مفتاح أجنبي مؤجل يفشل عند COMMIT نفسه
+    get_conn().execute("PRAGMA foreign_keys=ON")
+    with transaction() as c:
+        c.execute("CREATE TABLE parent(id INTEGER PRIMARY KEY)")
+        c.execute("CREATE TABLE child(parent_id INTEGER REFERENCES parent(id) DEFERRABLE INITIALLY DEFERRED)")
+    with pytest.raises(sqlite3.IntegrityError):
+        with transaction() as c:
+            c.execute("INSERT INTO child VALUES(1)")
+    assert not get_conn().in_transaction
+    with transaction() as c:
+        c.execute("INSERT INTO parent VALUES(1)")
+    assert query("SELECT id FROM parent") == [(1,)]
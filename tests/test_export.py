@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+"""التصدير التزايدي: كل تشغيل يصدّر الأوردرات الجديدة فقط، ويتعافى من علامة تالفة،
+ولا يحذف شيئًا خارج أقسام التصدير"""
+import csv
+import glob
+import gzip
+import os
+
+import pytest
+
+import payroll_core as core
+import payroll_export as export
+
+
+def add_orders(ids, days):
+    employees, areas = ids
+    lines = [{'id': employees["أحمد"], 'salary': 500000, 'transport': 100},
+             {'id': employees["محمد"], 'salary': 540000, 'transport': 0}]
+    return [core.create_order(areas["الغردقة"] if n % 2 else areas["القاهرة"], f"عنوان {n}", lines,
+                              f"{day}T10:00:00")[0] for n, day in enumerate(days)]
+
+
+def exported(out_dir):
+    """(رقم السطر, رقم الأوردر) لكل سطر في ملفات التصدير"""
+    rows = []
+    for path in glob.glob(os.path.join(out_dir, "month=*", "area_id=*", "*.csv.gz")):
+        with gzip.open(path, "rt", encoding="utf-8", newline="") as f:
+            rows.extend((int(row["line_id"]), int(row["order_id"])) for row in csv.DictReader(f))
+    return sorted(rows)
+
+
+@pytest.fixture
+def out_dir(db, tmp_path):
+    return str(tmp_path / "export")
+
+
+def test_incremental(ids, out_dir):
+    first = add_orders(ids, ["2025-01-05", "2025-02-10", "2025-02-11"])
+    report = export.export_orders(out_dir, fmt="csv")
+    assert (report.orders, report.rows, report.until) == (3, 6, first[-1])
+    assert export.read_watermark(out_dir) == first[-1]
+    files = set(report.files)
+    second = add_orders(ids, ["2025-02-12", "2025-03-01"])
+    report = export.export_orders(out_dir, fmt="csv")
+    # التشغيل الثاني يكتب ملفات جديدة للأوردرات الجديدة فقط
+    assert (report.since, report.orders, report.rows) == (first[-1], 2, 4)
+    assert not files & set(report.files)
+    assert sorted({order_id for _, order_id in exported(out_dir)}) == first + second
+    assert len(exported(out_dir)) == 10
+    report = export.export_orders(out_dir, fmt="csv")
+    assert (report.orders, report.files) == (0, [])
+
+
+def test_corrupt_watermark(ids, out_dir):
+    add_orders(ids, ["2025-01-05", "2025-02-10"])
+    export.export_orders(out_dir, fmt="csv")
+    expected = exported(out_dir)
+    with open(os.path.join(out_dir, export.WATERMARK_FILE), "w", encoding="utf-8") as f:
+        f.write('{"order_id": ')
+    assert export.read_watermark(out_dir) is None
+    report = export.export_orders(out_dir, fmt="csv")
+    # إعادة التصدير من البداية بدون تكرار السطور
+    assert (report.since, report.orders) == (0, 2)
+    assert exported(out_dir) == expected
+    assert export.read_watermark(out_dir) == report.until
+
+
+def test_refuses_foreign_directory(ids, tmp_path):
+    add_orders(ids, ["2025-01-05"])
+    out_dir = str(tmp_path)
+    foreign = os.path.join(out_dir, "payroll.db")
+    assert os.path.exists(foreign)
+    for full in (False, True):
+        with pytest.raises(ValueError):
+            export.export_orders(out_dir, fmt="csv", full=full)
+    assert os.path.exists(foreign)
+    assert not glob.glob(os.path.join(out_dir, "month=*"))
+
+
+def test_full_clears_partitions_only(ids, out_dir):
+    add_orders(ids, ["2025-01-05", "2025-02-10"])
+    export.export_orders(out_dir, fmt="csv")
+    notes = os.path.join(out_dir, "notes.txt")
+    with open(notes, "w", encoding="utf-8") as f:
+        f.write("ملاحظات")
+    stale = os.path.join(out_dir, "month=1999-01", "area_id=1")
+    os.makedirs(stale)
+    report = export.export_orders(out_dir, fmt="csv", full=True)
+    assert report.orders == 2
+    assert os.path.exists(notes)
+    assert not os.path.exists(stale)
+    assert len(exported(out_dir)) == 4
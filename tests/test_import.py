@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+"""استيراد الأوردرات: تجميع الصفوف المتتالية بنفس المرجع، ورفض الأوردر كله عند أي صف غير صالح"""
+import csv
+
+import payroll_core as core
+import payroll_import
+from payroll_db import query
+
+
+def write_csv(tmp_path, rows):
+    path = tmp_path / "orders.csv"
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(payroll_import.COLUMNS)
+        writer.writerows(rows)
+    return str(path)
+
+
+def reasons(report):
+    return {line_no: reason for line_no, reason, _ in report.rejected}
+
+
+def test_groups_consecutive_rows(db, tmp_path):
+    path = write_csv(tmp_path, [
+        ("A1", "الغردقة", "شارع النصر", "2025-01-05T09:00:00", "أحمد", "12.25", ""),
+        ("A1", "الغردقة", "شارع النصر", "2025-01-05T09:00:00", "محمد", "", "5500"),
+        ("A2", "القاهرة", "مدينة نصر", "2025-01-06", "محمود", "", ""),
+        ("A3", "القاهرة", "", "2025-01-06", "أحمد", "5", ""),
+    ])
+    report = payroll_import.import_orders(path, chunk_size=2)
+    assert (report.orders, report.lines, report.rejected) == (3, 4, [])
+    # المرتب الفارغ = المرتب الساري يوم الأوردر
+    assert query("SELECT o.address, e.name, oe.salary, oe.transport, oe.total FROM order_employees oe "
+                 "JOIN orders o ON o.id=oe.order_id JOIN employees e ON e.id=oe.employee_id ORDER BY oe.id") == [
+        ("شارع النصر", "أحمد", 500000, 1225, 501225),
+        ("شارع النصر", "محمد", 550000, 0, 550000),
+        ("مدينة نصر", "محمود", 610000, 0, 610000),
+        ("", "أحمد", 700000, 500, 700500),
+    ]
+    assert query("SELECT total_amount FROM orders ORDER BY id") == [(1051225,), (610000,), (700500,)]
+    assert query("SELECT SUM(lines), SUM(total) FROM payroll_daily") == [(4, 2361725)]
+
+
+def test_repeated_reference_rejected(db, tmp_path):
+    path = write_csv(tmp_path, [
+        ("A1", "الغردقة", "", "2025-01-05", "أحمد", "", ""),
+        ("A2", "الغردقة", "", "2025-01-05", "محمد", "", ""),
+        ("A1", "الغردقة", "", "2025-01-05", "خالد", "", ""),
+        ("", "الغردقة", "", "2025-01-05", "خالد", "", ""),
+    ])
+    report = payroll_import.import_orders(path)
+    assert (report.orders, report.lines) == (2, 2)
+    assert reasons(report) == {4: "مرجع أوردر مكرر في الملف: A1", 5: "مرجع الأوردر فارغ"}
+
+
+def test_bad_row_rejects_whole_order(db, tmp_path):
+    path = write_csv(tmp_path, [
+        ("B1", "الغردقة", "", "2025-01-05", "أحمد", "", ""),
+        ("B1", "الغردقة", "", "2025-01-05", "مجهول", "", ""),
+        ("B2", "المريخ", "", "2025-01-05", "أحمد", "", ""),
+        ("B3", "الغردقة", "", "أمس", "أحمد", "", ""),
+        ("B4", "الغردقة", "", "2025-01-05", "أحمد", "abc", ""),
+        ("B5", "الغردقة", "", "2025-01-05", "أحمد", "", "-5"),
+        ("B6", "الغردقة", "", "2025-01-05", "أحمد", "", ""),
+        ("B6", "القاهرة", "", "2025-01-05", "محمود", "", ""),
+        ("B7", "الغردقة", "", "2025-01-05", "محمد", "", ""),
+    ])
+    report = payroll_import.import_orders(path)
+    assert (report.orders, report.lines) == (1, 1)
+    assert reasons(report) == {
+        2: "رُفض مع باقي الأوردر",
+        3: "موظف غير معروف: مجهول",
+        4: "منطقة غير معروفة: المريخ",
+        5: "تاريخ غير صالح: أمس",
+        6: "مبلغ غير صالح",
+        7: "مبلغ غير صالح",
+        8: "رُفض مع باقي الأوردر",
+        9: "منطقة مختلفة داخل نفس الأوردر",
+    }
+    assert query("SELECT e.name FROM order_employees oe JOIN employees e ON e.id=oe.employee_id") == [("محمد",)]
+    assert query("SELECT SUM(lines) FROM payroll_daily") == [(1,)]
+
+
+def test_no_rate_on_order_day(db, ids, tmp_path):
+    employees, areas = ids
+    # خالد يبدأ في القاهرة اليوم: لا مرتب له في أوردرات سابقة بها، وسارة بلا مرتب في الغردقة
+    # (التي لها رواتب مسجلة فلا يُستخدم المرتب الافتراضي)
+    core.set_salary(employees["خالد"], areas["القاهرة"], 450000)
+    path = write_csv(tmp_path, [
+        ("C1", "القاهرة", "", "2025-01-05", "خالد", "", ""),
+        ("C2", "الغردقة", "", "2025-01-05", "سارة", "", ""),
+        ("C3", "الغردقة", "", "2025-01-05", "سارة", "", "4000"),
+    ])
+    report = payroll_import.import_orders(path)
+    assert (report.orders, report.lines) == (1, 1)
+    assert reasons(report) == {2: "لا يوجد مرتب للموظف في هذه المنطقة يوم الأوردر",
+                               3: "لا يوجد مرتب للموظف في هذه المنطقة يوم الأوردر"}
+
+
+def test_rate_looked_up_only_for_empty_salary(db, tmp_path, monkeypatch):
+    calls = []
+    real = payroll_import._Lookups.salary
+    monkeypatch.setattr(payroll_import._Lookups, "salary",
+                        lambda self, *args: calls.append(args) or real(self, *args))
+    path = write_csv(tmp_path, [
+        ("E1", "الغردقة", "", "2025-01-05", "أحمد", "", "5100"),
+        ("E1", "الغردقة", "", "2025-01-05", "محمد", "", ""),
+        ("E2", "الغردقة", "", "2025-01-05", "خالد", "", "abc"),
+    ])
+    report = payroll_import.import_orders(path)
+    assert (report.orders, report.lines) == (1, 2)
+    assert len(calls) == 1
+    assert query("SELECT salary FROM order_employees ORDER BY id") == [(510000,), (540000,)]
+
+
+def test_write_rejects(db, tmp_path):
+    path = write_csv(tmp_path, [("D1", "المريخ", "", "2025-01-05", "أحمد", "", "")])
+    report = payroll_import.import_orders(path)
+    out = tmp_path / "rejects.csv"
+    payroll_import.write_rejects(report, str(out))
+    with open(out, newline="", encoding="utf-8-sig") as f:
+        rows = list(csv.reader(f))
+    assert rows == [["line", "reason"] + list(payroll_import.COLUMNS),
+                    ["2", "منطقة غير معروفة: المريخ", "D1", "المريخ", "", "2025-01-05", "أحمد", "", ""]]
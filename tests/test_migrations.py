@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+"""ترحيل قاعدة بمخطط النسخة الأولى (قبل الفهارس والملخص، والمبالغ REAL بالجنيه) إلى آخر إصدار"""
+import sqlite3
+
+import pytest
+
+import payroll_db
+import payroll_core as core
+from payroll_db import query
+
+BASELINE_SCHEMA = """
+CREATE TABLE employees(id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT NOT NULL UNIQUE);
+CREATE TABLE areas(id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT NOT NULL UNIQUE);
+CREATE TABLE employee_area_salary(id INTEGER PRIMARY KEY AUTOINCREMENT, employee_id INTEGER NOT NULL,
+    area_id INTEGER NOT NULL, salary REAL NOT NULL, UNIQUE(employee_id, area_id),
+    FOREIGN KEY(employee_id) REFERENCES employees(id), FOREIGN KEY(area_id) REFERENCES areas(id));
+CREATE TABLE orders(id INTEGER PRIMARY KEY AUTOINCREMENT, area_id INTEGER NOT NULL, address TEXT,
+    created_at TEXT NOT NULL, FOREIGN KEY(area_id) REFERENCES areas(id));
+CREATE TABLE order_employees(id INTEGER PRIMARY KEY AUTOINCREMENT, order_id INTEGER NOT NULL,
+    employee_id INTEGER NOT NULL, salary REAL NOT NULL, transport REAL NOT NULL DEFAULT 0, total REAL NOT NULL,
+    FOREIGN KEY(order_id) REFERENCES orders(id), FOREIGN KEY(employee_id) REFERENCES employees(id));
+INSERT INTO employees(name) VALUES('أحمد'), ('محمد');
+INSERT INTO areas(name) VALUES('الغردقة');
+INSERT INTO employee_area_salary(employee_id, area_id, salary) VALUES(1, 1, 5000.5), (2, 1, 5400);
+INSERT INTO orders(area_id, address, created_at) VALUES(1, 'شارع النصر', '2025-01-05T09:00:00');
+INSERT INTO order_employees(order_id, employee_id, salary, transport, total)
+    VALUES(1, 1, 5000.5, 12.25, 5012.75), (1, 2, 5400, 0, 5400);
+"""
+
+
+@pytest.fixture
+def baseline(tmp_path):
+    path = str(tmp_path / "baseline.db")
+    conn = sqlite3.connect(path)
+    conn.executescript(BASELINE_SCHEMA)
+    conn.close()
+    old = payroll_db.DB_PATH
+    payroll_db.configure(path)
+    core.init_db()
+    yield payroll_db
+    payroll_db.configure(old)
+
+
+def names(kind):
+    return {name for (name,) in query("SELECT name FROM sqlite_master WHERE type=?", (kind,))}
+
+
+def test_reaches_latest_version(baseline):
+    assert query("PRAGMA user_version") == [(payroll_db.MIGRATIONS[-1][0],)]
+    assert payroll_db.MIGRATIONS[-1][0] == 8
+    assert {"payroll_daily", "salary_adjustments", "salary_adjustment_lines", "salary_history"} <= names("table")
+    assert {"idx_order_employees_order", "idx_orders_area_created", "idx_payroll_daily_employee"} <= names("index")
+    assert {"payroll_daily_line_ai", "payroll_daily_order_bd", "order_total_line_ai"} <= names("trigger")
+    # البيانات التجريبية لا تُضاف لقاعدة بها موظفون
+    assert query("SELECT name FROM employees ORDER BY id") == [("أحمد",), ("محمد",)]
+
+
+def test_migration_is_idempotent(baseline):
+    core.init_db()
+    assert query("PRAGMA user_version") == [(8,)]
+    assert query("SELECT COUNT(*) FROM order_employees") == [(2,)]
+
+
+def test_search_index_covers_old_orders(baseline):
+    if not payroll_db.has_table("orders_fts"):
+        pytest.skip("FTS5 غير متاح")
+    assert query("SELECT rowid FROM orders_fts WHERE orders_fts MATCH 'النصر'") == [(1,)]
+
+
+def test_history_backfilled(baseline):
+    assert query("SELECT area_id, employee_id, effective_from FROM salary_history ORDER BY employee_id") == [
+        (1, 1, payroll_db.HISTORY_START), (1, 2, payroll_db.HISTORY_START)]
+
+
+def column_types(table):
+    return {name: kind for _, name, kind, *_ in query(f"PRAGMA table_info({table})")}
+
+
+def test_money_rebuilt_in_piastres(baseline):
+    assert column_types("order_employees")["salary"] == "INTEGER"
+    assert column_types("order_employees")["total"] == "INTEGER"
+    assert column_types("employee_area_salary")["salary"] == "INTEGER"
+    assert column_types("areas")["default_salary"] == "INTEGER"
+    assert query("SELECT employee_id, salary FROM employee_area_salary ORDER BY employee_id") == [
+        (1, 500050), (2, 540000)]
+    # الإجمالي يُعاد حسابه بالقرش = المرتب + الانتقالات
+    assert query("SELECT employee_id, salary, transport, total, typeof(total) FROM order_employees "
+                 "ORDER BY employee_id") == [(1, 500050, 1225, 501275, "integer"), (2, 540000, 0, 540000, "integer")]
+    assert query("SELECT salary FROM salary_history ORDER BY employee_id") == [(500050,), (540000,)]
+
+
+def test_aggregates_rebuilt_in_piastres(baseline):
+    assert query("SELECT day, employee_id, area_id, lines, salary, transport, total FROM payroll_daily "
+                 "ORDER BY employee_id") == [("2025-01-05", 1, 1, 1, 500050, 1225, 501275),
+                                             ("2025-01-05", 2, 1, 1, 540000, 0, 540000)]
+    assert query("SELECT total_amount FROM orders") == [(1041275,)]
+    # triggers الملخص أُعيد إنشاؤها على الجداول الجديدة
+    core.create_order(1, "", [{'id': 2, 'salary': 540000, 'transport': 100}], "2025-01-05T12:00:00")
+    assert query("SELECT lines, total FROM payroll_daily WHERE employee_id=2") == [(2, 1080100)]
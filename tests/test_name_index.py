@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+"""بحث الأسماء في نافذة اختيار الموظفين: التي تبدأ بالنص أولًا ثم التي تحتويه، بنفس الترتيب دائمًا"""
+import random
+
+import pytest
+
+pytest.importorskip("tkinter")
+import payroll_system
+from payroll_system import NameIndex, _PickerSource
+
+NAMES = ["أحمد علي", "أحمد", "محمد أحمد", "Ahmed Samir", "ahmed", "سارة", "ميار", "مها أحمد", "Mahmoud"]
+
+
+def expected(index, text):
+    """الحساب المباشر: كل الأسماء واحدًا واحدًا"""
+    text = text.strip().casefold()
+    keys = [row[1].casefold() for row in index.rows]
+    prefix = [i for i, key in enumerate(keys) if key.startswith(text)]
+    return prefix + [i for i, key in enumerate(keys) if text in key and not key.startswith(text)]
+
+
+def names(index, positions):
+    return [index.rows[i][1] for i in positions]
+
+
+def make_index(names_list):
+    return NameIndex([(n + 1, name, 100 * n) for n, name in enumerate(names_list)])
+
+
+def test_prefix_then_contains():
+    index = make_index(NAMES)
+    assert names(index, index.search("أحمد")) == ["أحمد", "أحمد علي", "محمد أحمد", "مها أحمد"]
+    assert names(index, index.search("  AHMED ")) == ["ahmed", "Ahmed Samir"]
+    assert names(index, index.search("م")) == ["محمد أحمد", "مها أحمد", "ميار", "أحمد", "أحمد علي"]
+    assert index.search("غير موجود") == []
+    assert index.search("") == list(range(len(NAMES)))
+
+
+@pytest.mark.parametrize("typed", ["أحمد", "ahmed samir", "مها", "ar"])
+def test_typing_matches_fresh_search(typed):
+    index = make_index(NAMES)
+    # كل حرف يُضاف يفلتر النتيجة السابقة، والمسح يعيد البحث من البداية
+    for n in range(1, len(typed) + 1):
+        assert index.search(typed[:n]) == expected(index, typed[:n])
+    for n in range(len(typed), 0, -1):
+        assert index.search(typed[:n]) == expected(index, typed[:n])
+
+
+def test_random_names():
+    rnd = random.Random(3)
+    letters = "abcdeأبتمحس"
+    index = make_index(["".join(rnd.choice(letters) for _ in range(rnd.randrange(1, 8))) for _ in range(2000)])
+    for _ in range(300):
+        text = "".join(rnd.choice(letters) for _ in range(rnd.randrange(1, 4)))
+        assert index.search(text) == expected(index, text)
+
+
+def test_single_and_empty():
+    assert make_index([]).search("a") == []
+    index = make_index(["Ali"])
+    assert index.search("li") == [0]
+    assert index.search("ali") == [0]
+
+
+def test_picker_source_marks_selected():
+    index = make_index(NAMES)
+    matches = index.search("أحمد")
+    selected = {row[0] for row in index.rows if row[1] == "محمد أحمد"}
+    source = _PickerSource(index, matches, selected)
+    assert source.count() == 4
+    rows = source.first(10)
+    assert [(row[0], row[1]) for row in rows] == [("", "أحمد"), ("", "أحمد علي"), ("✓", "محمد أحمد"), ("", "مها أحمد")]
+    assert rows[2][2] == payroll_system.core.format_money(index.rows[matches[2]][2])
+    assert [row[-1] for row in source.slice(1, 2)] == [1, 2]
@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+"""الزيادات الجماعية: رفض تاريخ سريان قبل آخر تعديل، والمعلقة لا تمس مرتبًا عُدل بعد تاريخها،
+وحساب numpy يطابق حساب Python بالقرش"""
+import random
+from datetime import date, timedelta
+
+import pytest
+
+import payroll_core as core
+import payroll_raises as raises
+from payroll_db import HISTORY_START, query, transaction
+from payroll_raises import SalaryMatrix
+
+TODAY = date.today()
+
+
+def salaries():
+    return dict(((emp_id, area_id), salary) for emp_id, area_id, salary
+                in query("SELECT employee_id, area_id, salary FROM employee_area_salary"))
+
+
+def history(employee_id, area_id):
+    return [row[2:] for row in core.salary_history(area_id, employee_id)]
+
+
+def test_backdated_raise(ids):
+    employees, areas = ids
+    ahmed, mahmoud = employees["أحمد"], employees["محمود"]
+    cairo = areas["القاهرة"]
+    since = TODAY - timedelta(days=10)
+    adjustment_id, rows, applied = raises.apply_raise(amount=10000, area_ids=[cairo], effective_from=since)
+    assert (rows, applied) == (2, True)
+    assert salaries()[ahmed, cairo] == 710000
+    assert history(mahmoud, cairo) == [(HISTORY_START, 610000), (since.isoformat(), 620000)]
+    assert query("SELECT rows FROM salary_adjustments WHERE id=?", (adjustment_id,)) == [(2,)]
+
+
+def test_backdated_raise_before_later_change_rejected(ids):
+    employees, areas = ids
+    hurghada = areas["الغردقة"]
+    core.set_salary(employees["أحمد"], hurghada, 520000)
+    before = salaries()
+    with pytest.raises(ValueError):
+        raises.apply_raise(percent=1000, area_ids=[hurghada], effective_from=TODAY - timedelta(days=10))
+    assert salaries() == before
+    assert query("SELECT COUNT(*) FROM salary_adjustments") == [(0,)]
+    # نفس الزيادة من تاريخ آخر تعديل أو بعده مقبولة
+    _, rows, _ = raises.apply_raise(percent=1000, area_ids=[hurghada], effective_from=TODAY)
+    assert rows == 3
+    assert salaries()[employees["أحمد"], hurghada] == 572000
+
+
+def test_pending_raise(ids):
+    employees, areas = ids
+    adjustment_id, rows, applied = raises.apply_raise(percent=500, effective_from=TODAY + timedelta(days=5))
+    assert (rows, applied) == (0, False)
+    assert raises.apply_due() == 0
+    assert raises.apply_due(TODAY + timedelta(days=5)) == 1
+    assert salaries()[employees["سارة"], areas["الإسكندرية"]] == 619500
+    assert raises.apply_due(TODAY + timedelta(days=6)) == 0
+
+
+def test_late_pending_raise_skips_later_salaries(ids):
+    employees, areas = ids
+    ahmed, khaled, hurghada = employees["أحمد"], employees["خالد"], areas["الغردقة"]
+    adjustment_id, _, _ = raises.apply_raise(percent=1000, area_ids=[hurghada],
+                                             effective_from=TODAY + timedelta(days=1))
+    # الزيادة كان موعدها منذ 10 أيام ولم يُشغل البرنامج، وبينها وبين اليوم عُدل مرتب أحمد يدويًا
+    since = (TODAY - timedelta(days=10)).isoformat()
+    with transaction() as c:
+        c.execute("UPDATE salary_adjustments SET effective_from=? WHERE id=?", (since, adjustment_id))
+    core.set_salary(ahmed, hurghada, 600000, TODAY - timedelta(days=5))
+    assert raises.apply_due() == 1
+    assert salaries()[ahmed, hurghada] == 600000
+    assert salaries()[khaled, hurghada] == 528000
+    assert history(khaled, hurghada) == [(HISTORY_START, 480000), (since, 528000)]
+    assert (ahmed, hurghada) not in {(emp_id, area_id) for emp_id, area_id in
+                                     query("SELECT employee_id, area_id FROM salary_adjustment_lines")}
+    assert query("SELECT rows FROM salary_adjustments WHERE id=?", (adjustment_id,)) == [(2,)]
+
+
+def random_matrix(n, seed=7):
+    rnd = random.Random(seed)
+    rows = sorted((rnd.randrange(1, 8), rnd.randrange(1, 60)) for _ in range(n))
+    rows = [row for k, row in enumerate(rows) if k == 0 or row != rows[k - 1]]
+    return SalaryMatrix([(k + 1, emp_id, area_id, rnd.choice([rnd.randrange(0, 2000000), 333350, 50]),
+                          rnd.randrange(0, 40)) for k, (area_id, emp_id) in enumerate(rows)])
+
+
+@pytest.mark.parametrize("percent, amount, area_ids, employee_ids", [
+    (1000, 0, None, None),
+    (333, 0, None, None),
+    (-250, 5000, None, None),
+    (0, 1, [2, 5], None),
+    (75, -50, None, list(range(1, 60, 3))),
+    (-9999, 0, [1], [4, 5, 6]),
+    (500, 0, [99], None),
+])
+def test_numpy_matches_python(percent, amount, area_ids, employee_ids):
+    if not raises.HAS_NUMPY:
+        pytest.skip("numpy غير مثبت")
+    matrix = random_matrix(300)
+    fast = raises._compute_numpy(matrix, percent, amount, area_ids, employee_ids)
+    slow = raises._compute_python(matrix, percent, amount, area_ids, employee_ids)
+    assert fast.areas == slow.areas
+    assert fast.changes == slow.changes
+    assert all(isinstance(value, int) for row in fast.changes for value in row)
+
+
+def test_negative_salary_rejected_on_both_paths():
+    matrix = SalaryMatrix([(1, 1, 1, 1000, 0), (2, 2, 1, 100, 0)])
+    paths = [raises._compute_python] + ([raises._compute_numpy] if raises.HAS_NUMPY else [])
+    for compute_fn in paths:
+        with pytest.raises(ValueError):
+            compute_fn(matrix, 0, -500, None, None)
@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+"""المرتب الساري في تاريخ: حدود bisect، علامة انتهاء الربط، المرتب الافتراضي للمنطقة، وتسجيل المرتبات بتاريخ"""
+from datetime import date, timedelta
+
+import pytest
+
+import payroll_core as core
+import payroll_events as events
+from payroll_core import SalaryHistory
+from payroll_db import HISTORY_START, query
+
+TODAY = date.today()
+
+
+def no_default(area_id):
+    raise AssertionError("لا يُطلب المرتب الافتراضي لمنطقة بها رواتب سارية")
+
+
+# ----------------------------- SalaryHistory -----------------------------
+HISTORY = SalaryHistory([
+    (1, 10, "2025-01-01", 100),
+    (1, 10, "2025-03-01", 200),
+    (1, 10, "2025-06-01", None),
+    (1, 11, "2025-02-01", 300),
+    (2, 10, "2025-05-01", 400),
+])
+
+
+@pytest.mark.parametrize("day, salary", [
+    ("2024-12-31", None),
+    ("2025-01-01", 100),
+    ("2025-02-28T23:59:59", 100),
+    ("2025-03-01", 200),
+    (date(2025, 5, 31), 200),
+    ("2025-06-01", None),
+    ("2030-01-01", None),
+])
+def test_salary_at_boundaries(day, salary):
+    assert HISTORY.salary_at(10, 1, day) == salary
+
+
+def test_unknown_pair():
+    assert HISTORY.salary_at(11, 2, "2025-06-01") is None
+    assert HISTORY.salary_at(99, 1, "2025-06-01") is None
+
+
+def test_default_only_when_nobody_staffed():
+    default = lambda area_id: 5000 + area_id
+    # موظف 11 ساري في المنطقة 1 فلا مرتب افتراضي لغيره
+    assert HISTORY.rate(12, 1, "2025-04-01", no_default) is None
+    assert HISTORY.rate(10, 1, "2025-04-01", no_default) == 200
+    # قبل أول مرتب في المنطقة لا أحد ساري
+    assert HISTORY.rate(12, 1, "2024-06-01", default) == 5001
+    # المنطقة 2 قبل 2025-05-01 وبعده
+    assert HISTORY.rate(11, 2, "2025-04-30", default) == 5002
+    assert HISTORY.rate(11, 2, "2025-05-01", no_default) is None
+    assert HISTORY.staffed(1, "2025-06-01")
+    assert not HISTORY.staffed(3, "2025-06-01")
+
+
+def test_area_salaries_from_history():
+    employees = [(10, "أ"), (11, "ب"), (12, "ج")]
+    assert HISTORY.area_salaries(1, "2025-02-15", employees, 999) == [(10, "أ", 100), (11, "ب", 300)]
+    # انتهاء ربط الموظف 10 لا يغير مرتب 11
+    assert HISTORY.area_salaries(1, "2025-07-01", employees, 999) == [(11, "ب", 300)]
+    assert HISTORY.area_salaries(2, "2025-01-01", employees, 999) == [(10, "أ", 999), (11, "ب", 999), (12, "ج", 999)]
+
+
+# ----------------------------- set_salary / delete_salary -----------------------------
+def history(employee_id, area_id):
+    return [row[2:] for row in core.salary_history(area_id, employee_id)]
+
+
+def current(employee_id, area_id):
+    return query("SELECT salary FROM employee_area_salary WHERE employee_id=? AND area_id=?", (employee_id, area_id))
+
+
+@pytest.fixture
+def published():
+    captured = []
+    handler = lambda **data: captured.append(data)
+    events.subscribe(events.SALARY_HISTORY, handler)
+    yield captured
+    events.unsubscribe(events.SALARY_HISTORY, handler)
+
+
+def test_new_mapping_starts_today(ids):
+    employees, areas = ids
+    khaled, cairo = employees["خالد"], areas["القاهرة"]
+    core.set_salary(khaled, cairo, 450000)
+    assert history(khaled, cairo) == [(TODAY.isoformat(), 450000)]
+    assert khaled not in [row[0] for row in core.area_salaries(cairo, TODAY - timedelta(days=1))]
+    assert (khaled, "خالد", 450000) in core.area_salaries(cairo, TODAY)
+
+
+def test_future_date_rejected(ids):
+    employees, areas = ids
+    ahmed, hurghada = employees["أحمد"], areas["الغردقة"]
+    with pytest.raises(ValueError):
+        core.set_salary(ahmed, hurghada, 999999, TODAY + timedelta(days=1))
+    assert history(ahmed, hurghada) == [(HISTORY_START, 500000)]
+    assert current(ahmed, hurghada) == [(500000,)]
+
+
+def test_backdated_salary_updates_history_only(ids, published):
+    employees, areas = ids
+    ahmed, hurghada = employees["أحمد"], areas["الغردقة"]
+    mapping_id = core.set_salary(ahmed, hurghada, 520000)
+    last_month = TODAY - timedelta(days=30)
+    # أقدم من آخر تعديل: تصحيح فترة سابقة فقط
+    assert core.set_salary(ahmed, hurghada, 510000, last_month) == mapping_id
+    assert current(ahmed, hurghada) == [(520000,)]
+    assert history(ahmed, hurghada) == [(HISTORY_START, 500000), (last_month.isoformat(), 510000),
+                                        (TODAY.isoformat(), 520000)]
+    assert published == [{'employee_id': ahmed, 'area_id': hurghada, 'effective_from': last_month.isoformat()}]
+    assert (ahmed, "أحمد", 510000) in core.area_salaries(hurghada, last_month)
+    # نفس تاريخ آخر تعديل يستبدله ويغير المرتب الحالي
+    core.set_salary(ahmed, hurghada, 530000, TODAY)
+    assert current(ahmed, hurghada) == [(530000,)]
+    assert history(ahmed, hurghada)[-1] == (TODAY.isoformat(), 530000)
+    assert len(published) == 1
+
+
+def test_delete_writes_end_marker(ids):
+    employees, areas = ids
+    mohamed, hurghada = employees["محمد"], areas["الغردقة"]
+    mapping_id = query("SELECT id FROM employee_area_salary WHERE employee_id=? AND area_id=?",
+                       (mohamed, hurghada))[0][0]
+    core.delete_salary(mapping_id)
+    assert current(mohamed, hurghada) == []
+    assert history(mohamed, hurghada) == [(HISTORY_START, 540000), (TODAY.isoformat(), None)]
+    yesterday = TODAY - timedelta(days=1)
+    assert (mohamed, "محمد", 540000) in core.area_salaries(hurghada, yesterday)
+    assert mohamed not in [row[0] for row in core.area_salaries(hurghada, TODAY)]
+    # حذف سطر غير موجود لا يفعل شيئًا
+    core.delete_salary(mapping_id)
+    assert len(history(mohamed, hurghada)) == 2
+
+
+def test_empty_area_uses_default(ids):
+    employees, _ = ids
+    area_id = core.add_area("أسوان")
+    core.set_area_default_salary(area_id, 450000)
+    rows = core.area_salaries(area_id, TODAY)
+    assert sorted(rows) == sorted((emp_id, name, 450000) for name, emp_id in employees.items())
+    # أول مرتب مسجل اليوم: باقي الموظفين لم يعودوا متاحين اليوم، لكن الأمس بلا رواتب سارية
+    core.set_salary(employees["سارة"], area_id, 470000)
+    assert core.area_salaries(area_id, TODAY) == [(employees["سارة"], "سارة", 470000)]
+    assert len(core.area_salaries(area_id, TODAY - timedelta(days=1))) == len(employees)
@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+"""البحث في الأوردرات: فهرس FTS5 trigram وبديله LIKE يرجعان نفس الأوردرات"""
+from datetime import date
+
+import pytest
+
+import payroll_db
+import payroll_core as core
+from payroll_db import transaction
+
+ADDRESSES = ["شارع النصر 12", "برج النصر - الدور 3", "الممشى السياحي", "Nasr City, block 7",
+             'فيلا "الياسمين"', "", "12 شارع الجمهورية", "ميدان التحرير"]
+
+
+@pytest.fixture
+def orders(ids):
+    employees, areas = ids
+    line = [{'id': employees["أحمد"], 'salary': 500000, 'transport': 0}]
+    area_ids = [areas["الغردقة"], areas["القاهرة"]]
+    return [core.create_order(area_ids[n % 2], address, line, f"2025-01-{n + 1:02d}T10:00:00")[0]
+            for n, address in enumerate(ADDRESSES)]
+
+
+def without_fts(monkeypatch):
+    real = payroll_db.has_table
+    monkeypatch.setattr(payroll_db, "has_table", lambda name: name != "orders_fts" and real(name))
+
+
+@pytest.mark.parametrize("text", ["النصر", "شارع", "nasr", "NASR CITY", "block 7", '"الياسمين"',
+                                  "السياحي", "12", "1", "نص", "غير موجود", "  التحرير  "])
+def test_fts_matches_like(orders, monkeypatch, text):
+    if not payroll_db.has_table("orders_fts"):
+        pytest.skip("FTS5 غير متاح")
+    indexed = core.search_orders(text)
+    without_fts(monkeypatch)
+    assert indexed == core.search_orders(text)
+
+
+def test_results(orders):
+    assert [row[0] for row in core.search_orders("النصر")] == [orders[1], orders[0]]
+    # رقم الأوردر أو رقم في العنوان
+    assert [row[0] for row in core.search_orders("12")] == [orders[6], orders[0]]
+    assert [row[0] for row in core.search_orders(str(orders[2]))] == [orders[2], orders[1]]  # "الدور 3"
+    assert len(core.search_orders("")) == len(ADDRESSES)
+    assert len(core.search_orders("", limit=3)) == 3
+
+
+def test_filters(orders, ids):
+    _, areas = ids
+    assert [row[0] for row in core.search_orders("النصر", area_id=areas["القاهرة"])] == [orders[1]]
+    assert [row[0] for row in core.search_orders("", date_from=date(2025, 1, 7), date_to=date(2025, 1, 7))] == [
+        orders[6]]
+
+
+def test_index_follows_address_changes(orders, monkeypatch):
+    with transaction() as c:
+        c.execute("UPDATE orders SET address='شارع البحر' WHERE id=?", (orders[0],))
+        c.execute("DELETE FROM orders WHERE id=?", (orders[1],))
+    indexed = core.search_orders("البحر"), core.search_orders("النصر")
+    without_fts(monkeypatch)
+    assert indexed == (core.search_orders("البحر"), core.search_orders("النصر"))
+    assert [row[0] for row in indexed[0]] == [orders[0]]
+    assert indexed[1] == []
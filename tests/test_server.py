@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+"""الخادم: التوجيه عبر العميل، رمز الدخول، شرط الرمز للاستماع على الشبكة، ورفض الطلبات التالفة"""
+import socket
+import asyncio
+import sqlite3
+import threading
+
+import pytest
+
+import payroll_server as server
+from payroll_client import Client, ServerError, TOKEN_ENV
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class Running:
+    """PayrollServer على حلقة asyncio في خيط آخر"""
+    def __init__(self, token=None):
+        self.port = free_port()
+        self.url = f"http://127.0.0.1:{self.port}"
+        self.loop = asyncio.new_event_loop()
+        self.task = self.loop.create_task(server.PayrollServer(token, read_threads=2).serve("127.0.0.1", self.port))
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+        for _ in range(200):
+            try:
+                socket.create_connection(("127.0.0.1", self.port), timeout=1).close()
+                return
+            except OSError:
+                self.thread.join(0.01)
+        raise RuntimeError("الخادم لم يبدأ")
+
+    def _run(self):
+        try:
+            self.loop.run_until_complete(self.task)
+        except asyncio.CancelledError:
+            pass
+        finally:
+            self.loop.close()
+
+    def stop(self):
+        self.loop.call_soon_threadsafe(self.task.cancel)
+        self.thread.join(5)
+
+    def raw(self, request):
+        """إرسال طلب كما هو وإرجاع سطر الحالة"""
+        with socket.create_connection(("127.0.0.1", self.port), timeout=5) as s:
+            s.sendall(request)
+            return s.makefile("rb").readline().decode("latin-1").strip()
+
+
+@pytest.fixture
+def running(db):
+    instance = Running()
+    yield instance
+    instance.stop()
+
+
+@pytest.fixture
+def secured(db):
+    instance = Running("سر")
+    yield instance
+    instance.stop()
+
+
+def test_routes(running):
+    client = Client(running.url)
+    assert client.info()["schema"] == 8
+    names = [name for _, name in client.list_employees()]
+    assert "أحمد" in names
+    new_id = client.add_employee("ياسر")
+    assert (new_id, "ياسر") in client.list_employees()
+    # التكرار 409 = IntegrityError، والمسار المجهول 404 = ValueError كما في القاعدة المحلية
+    with pytest.raises(sqlite3.IntegrityError):
+        client.add_employee("ياسر")
+    with pytest.raises(ValueError):
+        client.request("GET", "/nothing")
+    with pytest.raises(ValueError):
+        client.request("POST", "/employees", body={})
+    client.delete_employee(new_id)
+    assert (new_id, "ياسر") not in client.list_employees()
+
+
+def test_token(secured):
+    with pytest.raises(ServerError):
+        Client(secured.url).list_employees()
+    with pytest.raises(ServerError):
+        Client(secured.url, "خطأ").list_employees()
+    assert Client(secured.url, "سر").list_employees()
+
+
+@pytest.mark.parametrize("length", [b"abc", b"-1", b"1.5"])
+def test_bad_content_length(running, length):
+    status = running.raw(b"POST /employees HTTP/1.1\r\nContent-Length: " + length + b"\r\n\r\n")
+    assert status.startswith("HTTP/1.1 400")
+    # الخادم ما زال يعمل
+    assert Client(running.url).list_employees()
+
+
+def test_body_too_large(running):
+    status = running.raw(b"POST /employees HTTP/1.1\r\nContent-Length: %d\r\n\r\n" % (server.MAX_BODY + 1))
+    assert status.startswith("HTTP/1.1 413")
+
+
+@pytest.mark.parametrize("host", ["127.0.0.1", "127.0.0.2", "::1", "localhost"])
+def test_loopback_needs_no_token(host):
+    server.check_host(host, None)
+
+
+@pytest.mark.parametrize("host", ["0.0.0.0", "", "192.168.1.10", "::", "example.com"])
+def test_network_needs_token(host):
+    with pytest.raises(ValueError):
+        server.check_host(host, None)
+    server.check_host(host, "سر")
+
+
+def test_serve_and_main_refuse_network_without_token(db, monkeypatch):
+    with pytest.raises(ValueError):
+        asyncio.run(server.PayrollServer().serve("0.0.0.0", free_port()))
+    monkeypatch.delenv(TOKEN_ENV, raising=False)
+    assert server.main(["--host", "0.0.0.0", "--port", str(free_port())]) == 1
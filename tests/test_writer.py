@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+"""طابور الكتابة الجماعية: عملية فاشلة داخل دفعة تُلغى وحدها وتُحفظ باقي عمليات الدفعة"""
+import sqlite3
+import threading
+
+import pytest
+
+import payroll_core as core
+import payroll_events as events
+from payroll_db import query
+from payroll_writer import GroupCommitQueue
+
+
+class Boom(Exception):
+    pass
+
+
+def order_then_fail(area_id, employee_id):
+    core.create_order(area_id, "يُلغى", [{'id': employee_id, 'salary': 500000, 'transport': 0}],
+                      "2025-01-05T10:00:00")
+    raise Boom("فشل بعد الكتابة")
+
+
+@pytest.fixture
+def writer(db):
+    published = []
+    queue = GroupCommitQueue(window=0.05, publish=published.extend)
+    queue.published = published
+    yield queue
+    queue.stop()
+
+
+def submit_batch(writer, jobs):
+    """عملية أولى تشغل خيط الكتابة حتى تُضاف الباقية للطابور فتُنفذ كلها معًا في الدفعة التالية"""
+    started, release = threading.Event(), threading.Event()
+    first = writer.submit(lambda: started.set() or release.wait(5))
+    started.wait(5)
+    futures = [writer.submit(fn, *args) for fn, *args in jobs]
+    release.set()
+    first.result(5)
+    for future in futures:
+        future.exception(5)
+    return futures
+
+
+def test_failed_job_rolls_back_alone(writer, ids):
+    employees, areas = ids
+    ahmed, hurghada = employees["أحمد"], areas["الغردقة"]
+    line = [{'id': ahmed, 'salary': 500000, 'transport': 250}]
+    good1, bad, good2 = submit_batch(writer, [
+        (core.create_order, hurghada, "قبل", line, "2025-01-05T09:00:00"),
+        (order_then_fail, hurghada, ahmed),
+        (core.create_order, hurghada, "بعد", line, "2025-01-05T11:00:00"),
+    ])
+    # الإحصاءات تُسجل بعد إقرار العمليات: تُقرأ بعد انتهاء الخيط
+    writer.stop()
+    stats = writer.stats()
+    assert (stats["commits"], stats["max_batch"], stats["failed"]) == (2, 3, 1)
+    assert isinstance(bad.exception(), Boom)
+    assert good1.result()[1] == good2.result()[1] == 500250
+    assert query("SELECT address FROM orders ORDER BY id") == [("قبل",), ("بعد",)]
+    assert query("SELECT COUNT(*) FROM order_employees") == [(2,)]
+    assert query("SELECT lines, total FROM payroll_daily") == [(2, 1000500)]
+    # أحداث العملية الملغاة لا تُنشر
+    added = [data["address"] for topic, data in writer.published if topic == events.ORDER_ADDED]
+    assert added == ["قبل", "بعد"]
+
+
+def test_constraint_error_keeps_neighbours(writer):
+    first, duplicate, last = submit_batch(writer, [
+        (core.add_employee, "ياسر"),
+        (core.add_employee, "أحمد"),
+        (core.add_employee, "منى"),
+    ])
+    assert isinstance(duplicate.exception(), sqlite3.IntegrityError)
+    assert first.result() and last.result()
+    assert {name for (name,) in query("SELECT name FROM employees")} >= {"ياسر", "منى"}
+    writer.stop()
+    assert writer.stats()["failed"] == 1